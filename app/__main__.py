@@ -0,0 +1,328 @@
+"""Línea de comandos: ``python -m app <comando>``.
+
+    kiosk       solo la pantalla de consulta (sin login, dashboard, matplotlib ni pandas)
+    servicio    servicio de kiosco para otras terminales (HTTP/JSON)
+    estado      estado de uno o más DNI
+    backup      crear / listar / restaurar backups, recuperar a un momento dado
+    exportar    socios, pagos o ingresos a Excel
+    importar    pagos desde Excel
+    rollups     reconstruir datos derivados
+    mantenimiento  última/próxima ejecución de las tareas periódicas, o correrlas ya
+    bench       mediciones sin interfaz gráfica (import, consultas de kiosco, listados)
+
+Sin comando abre la aplicación completa, igual que ``run.py``.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from .config import DB_PATH, KIOSK_SERVICE
+
+
+def _db(args, auto_backup: bool = False):
+    from .db import DatabaseManager
+    return DatabaseManager(args.db, auto_backup=auto_backup)
+
+
+def _imprimir_estado(dni: int, resultado: dict):
+    venc = resultado.get('fecha_vencimiento') or '-'
+    print(f"{dni}\t{resultado['estado']}\t{resultado.get('nombre') or '-'}\t{venc}")
+
+
+# ── Comandos ──────────────────────────────────────────────────────────────
+def cmd_kiosk(args):
+    cliente, db_manager = None, None
+    if args.cliente:
+        from .kiosk_service import KioskClient
+        cliente = KioskClient(args.cliente)
+    else:
+        db_manager = _db(args, auto_backup=True)
+        if args.servidor:
+            from .kiosk_service import KioskService, LoopbackKioskClient
+            cliente = LoopbackKioskClient(KioskService(db_manager, host="0.0.0.0").iniciar())
+
+    if args.consola:
+        return _kiosk_consola(db_manager, cliente)
+    from .kiosk import ejecutar_kiosco
+    ejecutar_kiosco(db_manager, cliente)
+    return 0
+
+
+def _kiosk_consola(db_manager, cliente):
+    """Kiosco por entrada estándar: un DNI por línea (útil sin pantalla y para medir)."""
+    reingresos = None
+    if cliente is None:
+        from .checkin_guard import AntiPassback
+        reingresos = AntiPassback(db_manager.registrar_repeticiones)
+    for linea in sys.stdin:
+        texto = linea.strip()
+        if not texto:
+            continue
+        if not texto.isdigit():
+            print(f"{texto}\tDNI inválido")
+            continue
+        dni = int(texto)
+        try:
+            if cliente is not None:
+                resultado = cliente.consultar(dni)
+            else:
+                resultado = reingresos.repetido(dni)
+                if resultado is None:
+                    resultado = db_manager.consultar_estado_socio(dni)
+                    db_manager.registrar_ingreso(dni if resultado['estado'] != 'No registrado' else None,
+                                                 resultado['nombre'], resultado['estado'])
+                    reingresos.recordar(dni, resultado)
+        except ConnectionError as e:
+            print(f"{dni}\tSin conexión: {e}")
+            continue
+        _imprimir_estado(dni, resultado)
+    if reingresos is not None:
+        reingresos.vaciar()
+    if cliente is not None and hasattr(cliente, 'service'):
+        cliente.service.detener()
+    return 0
+
+
+def cmd_servicio(args):
+    from .kiosk_service import KioskService
+    KioskService(_db(args, auto_backup=True), args.host, args.port).servir()
+    return 0
+
+
+def cmd_estado(args):
+    db_manager = _db(args)
+    for dni in args.dni:
+        _imprimir_estado(dni, db_manager.consultar_estado_socio(dni))
+    return 0
+
+
+def cmd_backup(args):
+    db_manager = _db(args)
+    if args.listar:
+        for b in db_manager.get_backup_list():
+            print(f"{b.get('filename')}\t{b.get('created_at', '')}\t{b.get('description', '')}")
+        return 0
+    if args.restaurar:
+        resultado = db_manager.restore_from_backup(args.restaurar)
+    elif args.recuperar:
+        resultado = db_manager.recuperar_hasta(args.recuperar, aplicar=args.aplicar)
+    else:
+        resultado = db_manager.create_incremental_backup(args.descripcion)
+    print(json.dumps(resultado, ensure_ascii=False, default=str))
+    return 0 if resultado.get('success') else 1
+
+
+def cmd_exportar(args):
+    db_manager = _db(args)
+    rango = (args.desde, args.hasta) if args.desde and args.hasta else None
+    if args.tabla == 'socios':
+        db_manager.exportar_socios_excel(args.archivo)
+    elif args.tabla == 'pagos':
+        db_manager.exportar_pagos_excel(args.archivo, rango)
+    else:
+        db_manager.exportar_ingresos_excel(args.archivo, rango)
+    print(f"Exportado: {args.archivo}")
+    return 0
+
+
+def cmd_importar(args):
+    resultado = _db(args).importar_pagos_excel(args.archivo)
+    print(f"Importados: {resultado['importados']} de {resultado['total_filas']}")
+    for error in resultado['errores']:
+        print(f"  {error}")
+    return 0 if not resultado['errores'] else 1
+
+
+def cmd_rollups(args):
+    db_manager = _db(args)
+    if args.listar:
+        print("\n".join(db_manager.listar_rollups()))
+        return 0
+    for nombre, segundos in db_manager.reconstruir_rollups(args.nombres or None).items():
+        print(f"{nombre}\t{segundos:.3f}s")
+    return 0
+
+
+def cmd_mantenimiento(args):
+    db_manager = _db(args)
+    planificador = db_manager.programar_mantenimiento()
+    if not args.tareas:
+        diag = db_manager.diagnostico()
+        print(f"{diag['tamano']} bytes, {diag['libres']} páginas libres, auto_vacuum {diag['auto_vacuum']}")
+        for tarea in diag['tareas']:
+            detalle = tarea['error'] or json.dumps(tarea['resultado'], ensure_ascii=False)
+            print(f"{tarea['tarea']}\t{tarea['ultimo'] or '-'}\t{tarea['proxima']}\t{detalle}")
+        return 0
+    for nombre in args.tareas:
+        if nombre not in planificador.listar():
+            print(f"Tarea desconocida: {nombre} (hay: {', '.join(planificador.listar())})")
+            return 1
+        inicio = time.perf_counter()
+        planificador.ejecutar(nombre)
+        print(f"{nombre}\t{time.perf_counter() - inicio:.3f}s")
+    return 0
+
+
+_PESADOS = ('matplotlib', 'pandas', 'numpy')
+
+
+def cmd_bench(args):
+    if args.caso == 'import':
+        # Cada import en un proceso nuevo para medir el arranque en frío
+        raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        codigo = (
+            "import sys, time, json\n"
+            "t = time.perf_counter()\n"
+            "import {modulo}\n"
+            "print(json.dumps({{'segundos': time.perf_counter() - t,"
+            " 'pesados': [m for m in {pesados!r} if m in sys.modules]}}))\n"
+        )
+        for modulo in ('app.kiosk', 'app.kiosk_service', 'app.main'):
+            salida = subprocess.run([sys.executable, '-c', codigo.format(modulo=modulo, pesados=_PESADOS)],
+                                    cwd=raiz, capture_output=True, text=True)
+            if salida.returncode != 0:
+                print(f"{modulo}\terror: {salida.stderr.strip().splitlines()[-1:]}")
+                continue
+            datos = json.loads(salida.stdout.strip().splitlines()[-1])
+            print(f"{modulo}\t{datos['segundos'] * 1000:.0f} ms\t{', '.join(datos['pesados']) or '-'}")
+        return 0
+
+    if args.caso == 'listas':
+        return _bench_listas(_db(args))
+
+    # kiosco: N consultas de estado directas a la base vs. índice en memoria del servicio
+    from .kiosk_service import KioskService
+    db_manager = _db(args)
+    dnis = [s['dni'] for s in db_manager.socios_con_estado()] or [1]
+    muestra = [random.choice(dnis) for _ in range(args.n)]
+
+    inicio = time.perf_counter()
+    for dni in muestra:
+        db_manager.consultar_estado_socio(dni)
+    directo = time.perf_counter() - inicio
+
+    servicio = KioskService(db_manager)
+    inicio = time.perf_counter()
+    servicio.cargar_indice()
+    carga = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    for dni in muestra:
+        servicio.estado(dni)
+    indice = time.perf_counter() - inicio
+
+    print(f"socios: {len(dnis)}  consultas: {args.n}")
+    print(f"base directa\t{directo * 1e6 / args.n:.1f} µs/consulta")
+    print(f"índice\t{indice * 1e6 / args.n:.1f} µs/consulta  (carga {carga * 1000:.1f} ms)")
+    return 0
+
+
+def _bench_listas(db_manager):
+    """Listados completos como dicts vs. registros compactos (rows.py): tiempo y
+    memoria pico de leer las filas y armar las tuplas de la tabla."""
+    casos = [
+        ('socios', db_manager.socios_con_estado, db_manager.registros_socios_con_estado,
+         ('dni', 'nombre', 'estado', 'fecha_vencimiento')),
+        ('pagos', db_manager.obtener_todos_los_pagos, db_manager.registros_pagos,
+         ('id', 'dni', 'monto', 'fecha_pago')),
+        ('ingresos', db_manager.listar_ingresos, db_manager.registros_ingresos,
+         ('fecha', 'dni', 'nombre', 'estado')),
+    ]
+    for nombre, como_dicts, como_registros, campos in casos:
+        for forma, leer in (('dicts', como_dicts), ('registros', como_registros)):
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            tabla = [tuple(fila[c] for c in campos) for fila in leer()]
+            segundos = time.perf_counter() - inicio
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{nombre}\t{forma}\t{len(tabla)} filas\t{segundos * 1000:.1f} ms\t{pico / 1024:.0f} KiB pico")
+    return 0
+
+
+# ── Parser ────────────────────────────────────────────────────────────────
+def crear_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app", description="Soma Entrenamientos")
+    parser.add_argument('--db', default=DB_PATH, help="ruta de la base (por defecto %(default)s)")
+    sub = parser.add_subparsers(dest='comando')
+
+    p = sub.add_parser('kiosk', help="solo la pantalla de consulta")
+    p.add_argument('--cliente', metavar='URL', help="consultar a un servicio de kiosco en la red")
+    p.add_argument('--servidor', action='store_true', help="además atender a otras terminales")
+    p.add_argument('--consola', action='store_true', help="leer DNIs de la entrada estándar, sin ventana")
+    p.set_defaults(func=cmd_kiosk)
+
+    p = sub.add_parser('servicio', help="servicio de kiosco (HTTP/JSON)")
+    p.add_argument('--host', default=KIOSK_SERVICE["host"])
+    p.add_argument('--port', type=int, default=KIOSK_SERVICE["port"])
+    p.set_defaults(func=cmd_servicio)
+
+    p = sub.add_parser('estado', help="estado de uno o más DNI")
+    p.add_argument('dni', type=int, nargs='+')
+    p.set_defaults(func=cmd_estado)
+
+    p = sub.add_parser('backup', help="crear, listar o restaurar backups")
+    p.add_argument('--listar', action='store_true')
+    p.add_argument('--restaurar', metavar='ARCHIVO')
+    p.add_argument('--recuperar', metavar='MOMENTO',
+                   help="reconstruir la base a 'YYYY-MM-DD HH:MM' (último backup + diario de cambios)")
+    p.add_argument('--aplicar', action='store_true', help="con --recuperar: restaurarla sobre la base en uso")
+    p.add_argument('--descripcion', default="Backup desde línea de comandos")
+    p.set_defaults(func=cmd_backup)
+
+    p = sub.add_parser('exportar', help="exportar a Excel")
+    p.add_argument('tabla', choices=['socios', 'pagos', 'ingresos'])
+    p.add_argument('archivo')
+    p.add_argument('--desde', help="YYYY-MM-DD")
+    p.add_argument('--hasta', help="YYYY-MM-DD")
+    p.set_defaults(func=cmd_exportar)
+
+    p = sub.add_parser('importar', help="importar pagos desde Excel")
+    p.add_argument('archivo')
+    p.set_defaults(func=cmd_importar)
+
+    p = sub.add_parser('rollups', help="reconstruir datos derivados")
+    p.add_argument('nombres', nargs='*', help="por defecto, todos")
+    p.add_argument('--listar', action='store_true')
+    p.set_defaults(func=cmd_rollups)
+
+    p = sub.add_parser('mantenimiento', help="tareas periódicas (backup, vacuum, analyze, quick_check...)")
+    p.add_argument('tareas', nargs='*', help="correr ya estas tareas; sin tareas, listar última/próxima")
+    p.set_defaults(func=cmd_mantenimiento)
+
+    p = sub.add_parser('bench', help="mediciones sin interfaz gráfica")
+    p.add_argument('caso', choices=['import', 'kiosco', 'listas'])
+    p.add_argument('--n', type=int, default=1000, help="consultas para 'kiosco'")
+    p.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = crear_parser().parse_args(argv)
+    if not args.comando:
+        from .main import main as main_gui
+        main_gui()
+        return 0
+
+    from .log_manager import iniciar_logging
+    iniciar_logging(args.db)
+    try:
+        return args.func(args) or 0
+    except BrokenPipeError:
+        # Salida cortada por el lector (p. ej. ``| head``): no es un error de la aplicación
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    except (ValueError, OSError) as e:
+        logging.error(f"{args.comando}: {e}")
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
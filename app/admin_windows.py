@@ -741,16 +741,17 @@ class GrupoFamiliarWindow:
             else:
                 grupo_id = self.grupo_id
                 self.db_manager.editar_grupo(grupo_id, nombre, precio_especial)
-                # Limpiar asignaciones previas del grupo
-                for s in self.db_manager.obtener_miembros_grupo(grupo_id):
-                    self.db_manager.remover_socio_de_grupo(s['dni'])
 
-            # Asignar miembros actuales
-            for mem in self._miembros:
-                self.db_manager.asignar_socio_a_grupo(mem['dni'], grupo_id)
+            # Solo se tocan los socios que entran o salen del grupo
+            resultados = self.db_manager.actualizar_miembros_grupo(
+                grupo_id, [mem['dni'] for mem in self._miembros])
+            movidos = [r['dni'] for r in resultados if r['resultado'] == 'movido']
 
             accion = "creado" if self.grupo_id is None else "actualizado"
-            messagebox.showinfo("Éxito", f"Grupo '{nombre}' {accion} con {len(self._miembros)} miembro(s)")
+            mensaje = f"Grupo '{nombre}' {accion} con {len(self._miembros)} miembro(s)"
+            if movidos:
+                mensaje += f"\n{len(movidos)} socio(s) se movieron desde otro grupo"
+            messagebox.showinfo("Éxito", mensaje)
             if self.callback:
                 self.callback()
             self.window.destroy()
@@ -880,12 +881,13 @@ class RegistrarPagoGrupalWindow:
             return
         meses = self.meses_var.get()
         try:
-            cantidad = self.db_manager.registrar_pago_grupal(self.grupo_id, monto, fecha, metodo, meses)
+            resultados = self.db_manager.registrar_pago_grupal(self.grupo_id, monto, fecha, metodo, meses)
             duracion_txt = f"{meses} mes" if meses == 1 else f"{meses} meses"
+            detalle = "\n".join(f"• {r['nombre']} (DNI {r['dni']})" for r in resultados)
             messagebox.showinfo(
                 "Éxito",
                 f"Pago grupal registrado para '{self.grupo['nombre']}'\n"
-                f"{cantidad} pago(s) de ${monto} — {duracion_txt} — {metodo}"
+                f"{len(resultados)} pago(s) de ${monto} — {duracion_txt} — {metodo}\n\n{detalle}"
             )
             if self.callback:
                 self.callback()
@@ -0,0 +1,201 @@
+"""Retención por cohortes, churn, pagos en fecha y valor de vida (LTV).
+
+Cada pago cubre su intervalo acumulado (``expiry.intervalos``: si se paga
+antes de vencer, empieza a correr desde el vencimiento anterior). Un socio está activo en un mes calendario si algún pago
+cubre al menos un día de ese mes, y su cohorte es el mes de su primer pago.
+Los intervalos de todos los pagos se expanden a meses en una sola pasada
+vectorizada (NumPy/pandas).
+
+Los meses cerrados se guardan en ``analitica_mensual`` y no se vuelven a
+calcular; en cada consulta solo se procesa el mes en curso (y los meses que
+un pago con fecha atrasada haya invalidado). ``calcular_en_segundo_plano``
+corre el cálculo en un hilo aparte para no bloquear la interfaz.
+"""
+import json
+import logging
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import ANALYTICS_CONFIG
+from .expiry import intervalos
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analitica")
+        return _pool
+
+
+def _mes_indice(fechas: pd.Series) -> np.ndarray:
+    """Meses como enteros consecutivos (año * 12 + mes - 1)"""
+    return (fechas.dt.year * 12 + fechas.dt.month - 1).to_numpy()
+
+
+def _mes_texto(indice: int) -> str:
+    return f"{indice // 12:04d}-{indice % 12 + 1:02d}"
+
+
+def _inicio_mes(indice: int) -> datetime:
+    return datetime(indice // 12, indice % 12 + 1, 1)
+
+
+def con_intervalos(pagos: pd.DataFrame) -> pd.DataFrame:
+    """Agrega inicio, hasta y hasta_previo (vencimiento antes del pago) a ``pagos``,
+    que debe tener todo el historial de cada socio ordenado por dni y fecha"""
+    inicio, hasta = intervalos(pagos['dni'].to_numpy(), pagos['fecha'].to_numpy(), pagos['meses'].to_numpy())
+    pagos = pagos.assign(inicio=pd.to_datetime(inicio), hasta=pd.to_datetime(hasta))
+    pagos['hasta_previo'] = pagos.groupby('dni')['hasta'].shift()
+    return pagos
+
+
+def meses_activos(pagos: pd.DataFrame) -> pd.DataFrame:
+    """Un registro (dni, mes) por cada mes calendario cubierto por algún pago"""
+    if pagos.empty:
+        return pd.DataFrame({'dni': pd.Series(dtype='int64'), 'mes': pd.Series(dtype='int64')})
+    inicio = _mes_indice(pagos['inicio'])
+    cantidad = _mes_indice(pagos['hasta']) - inicio + 1
+    desplazamiento = np.arange(cantidad.sum()) - np.repeat(np.cumsum(cantidad) - cantidad, cantidad)
+    return pd.DataFrame({
+        'dni': np.repeat(pagos['dni'].to_numpy(), cantidad),
+        'mes': np.repeat(inicio, cantidad) + desplazamiento,
+    }).drop_duplicates()
+
+
+def _resumir(pagos: pd.DataFrame, primeros: pd.Series, meses: Iterable[int], tolerancia_dias: int) -> Dict[int, Dict]:
+    """Métricas de los meses pedidos. ``pagos`` (con ``con_intervalos``) debe incluir
+    todos los pagos que cubren esos meses y el anterior; ``primeros`` es el primer
+    pago de cada socio."""
+    cohorte_de = _mes_indice(primeros).astype(int)
+    cohorte_de = pd.Series(cohorte_de, index=primeros.index)
+
+    activos = meses_activos(pagos)
+    activos_por_mes = activos.groupby('mes').size()
+    # Bajas: activos el mes anterior que no siguen activos
+    siguiente = activos.assign(mes=activos['mes'] + 1)
+    cruce = siguiente.merge(activos, on=['dni', 'mes'], how='left', indicator=True)
+    bajas_por_mes = cruce[cruce['_merge'] == 'left_only'].groupby('mes').size()
+    activos['cohorte'] = activos['dni'].map(cohorte_de)
+    por_cohorte = activos.groupby(['mes', 'cohorte']).size()
+
+    mes_pago = _mes_indice(pagos['fecha'])
+    renovacion = (pagos['fecha'] > pagos['dni'].map(primeros)).to_numpy()
+    en_fecha = renovacion & (pagos['fecha'] <= pagos['hasta_previo'] + timedelta(days=tolerancia_dias)).to_numpy()
+    por_pago = pd.DataFrame({'mes': mes_pago, 'monto': pagos['monto'].to_numpy(),
+                             'renovacion': renovacion, 'en_fecha': en_fecha})
+    por_pago = por_pago.groupby('mes').agg(ingresos=('monto', 'sum'), renovaciones=('renovacion', 'sum'),
+                                           en_fecha=('en_fecha', 'sum'))
+    nuevos_por_mes = cohorte_de.value_counts()
+
+    resultado = {}
+    for mes in meses:
+        activos_prev = int(activos_por_mes.get(mes - 1, 0))
+        bajas = int(bajas_por_mes.get(mes, 0))
+        fila = por_pago.loc[mes] if mes in por_pago.index else None
+        cohortes = por_cohorte.loc[mes] if mes in por_cohorte.index.get_level_values(0) else pd.Series(dtype='int64')
+        resultado[mes] = {
+            'mes': _mes_texto(mes),
+            'activos': int(activos_por_mes.get(mes, 0)),
+            'nuevos': int(nuevos_por_mes.get(mes, 0)),
+            'bajas': bajas,
+            'churn': round(bajas / activos_prev * 100, 1) if activos_prev else 0.0,
+            'renovaciones': int(fila['renovaciones']) if fila is not None else 0,
+            'renovaciones_en_fecha': int(fila['en_fecha']) if fila is not None else 0,
+            'ingresos': float(fila['ingresos']) if fila is not None else 0.0,
+            'cohortes': {_mes_texto(int(c)): int(n) for c, n in cohortes.items()},
+        }
+    return resultado
+
+
+class AnalyticsEngine:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def meses(self, conn: sqlite3.Connection) -> List[Dict]:
+        """Métricas de cada mes desde el primer pago hasta el mes en curso (parcial)"""
+        primeros = pd.read_sql_query('SELECT dni, MIN(fecha_pago) AS primero FROM pagos GROUP BY dni', conn)
+        if primeros.empty:
+            return []
+        primeros = pd.to_datetime(primeros.set_index('dni')['primero'])
+        actual = datetime.now().year * 12 + datetime.now().month - 1
+        primer_mes = int(_mes_indice(primeros).min())
+
+        cacheados = {mes: json.loads(datos) for mes, datos in
+                     conn.execute('SELECT mes, datos FROM analitica_mensual')}
+        faltantes = [m for m in range(primer_mes, actual) if _mes_texto(m) not in cacheados]
+        calcular = faltantes + [actual]
+
+        # La acumulación necesita todo el historial; después solo se procesan
+        # los pagos que cubren los meses a calcular o el anterior
+        pagos = pd.read_sql_query('''
+            SELECT dni, fecha_pago AS fecha, COALESCE(meses, 1) AS meses, monto
+            FROM pagos ORDER BY dni, fecha_pago, id
+        ''', conn)
+        pagos['fecha'] = pd.to_datetime(pagos['fecha'])
+        pagos = con_intervalos(pagos)
+        pagos = pagos[pagos['hasta'] >= _inicio_mes(min(calcular) - 1)]
+        nuevos = _resumir(pagos, primeros, calcular, ANALYTICS_CONFIG['tolerancia_pago_dias'])
+
+        if faltantes:
+            ahora = datetime.now().isoformat()
+            conn.executemany('INSERT OR REPLACE INTO analitica_mensual (mes, datos, calculado) VALUES (?, ?, ?)',
+                             [(_mes_texto(m), json.dumps(nuevos[m]), ahora) for m in faltantes])
+            conn.commit()
+            logging.info(f"Analítica: {len(faltantes)} mes(es) cerrados calculados")
+
+        resultado = []
+        for m in range(primer_mes, actual + 1):
+            datos = nuevos[m] if m in nuevos else cacheados[_mes_texto(m)]
+            resultado.append({**datos, 'parcial': m == actual})
+        return resultado
+
+    def resumen(self, desde: Optional[str] = None, hasta: Optional[str] = None) -> Dict:
+        """Métricas agregadas. ``desde``/``hasta`` (YYYY-MM-DD) limitan churn y pagos
+        en fecha; LTV, permanencia y cohortes usan todo el historial."""
+        with sqlite3.connect(self.db_path) as conn:
+            meses = self.meses(conn)
+        return resumir_meses(meses, desde, hasta)
+
+
+def resumir_meses(meses: List[Dict], desde: Optional[str] = None, hasta: Optional[str] = None) -> Dict:
+    en_rango = [m for m in meses
+                if (not desde or m['mes'] >= desde[:7]) and (not hasta or m['mes'] <= hasta[:7])]
+    cerrados = [m for m in en_rango if not m['parcial']][-ANALYTICS_CONFIG['meses_promedio_churn']:]
+    renovaciones = sum(m['renovaciones'] for m in en_rango)
+    en_fecha = sum(m['renovaciones_en_fecha'] for m in en_rango)
+    socios = sum(m['nuevos'] for m in meses)
+
+    retencion = []
+    primera = max(len(meses) - ANALYTICS_CONFIG['cohortes_visibles'], 0)
+    for inicio in range(primera, len(meses)):
+        m = meses[inicio]
+        if not m['nuevos']:
+            continue
+        valores = [round(meses[j]['cohortes'].get(m['mes'], 0) / m['nuevos'] * 100, 1)
+                   for j in range(inicio, min(inicio + ANALYTICS_CONFIG['meses_retencion'], len(meses)))]
+        retencion.append({'cohorte': m['mes'], 'socios': m['nuevos'], 'retencion': valores})
+
+    return {
+        'permanencia_promedio_meses': round(sum(m['activos'] for m in meses) / socios, 2) if socios else 0,
+        'churn_mensual': round(sum(m['churn'] for m in cerrados) / len(cerrados), 1) if cerrados else 0,
+        'porcentaje_pagos_en_fecha': round(en_fecha / renovaciones * 100, 1) if renovaciones else 0,
+        'ltv': round(sum(m['ingresos'] for m in meses) / socios, 2) if socios else 0,
+        'meses': en_rango,
+        'retencion': retencion,
+    }
+
+
+def calcular_en_segundo_plano(db_path: str, desde: Optional[str] = None,
+                              hasta: Optional[str] = None) -> "Future[Dict]":
+    """Calcula el resumen en el hilo de analítica; la interfaz consulta el Future"""
+    return _get_pool().submit(AnalyticsEngine(db_path).resumen, desde, hasta)
@@ -0,0 +1,235 @@
+"""Sonidos del kiosco sin bloquear la interfaz.
+
+Los tonos de ``SOUNDS`` se sintetizan una sola vez como WAV en memoria y se
+reproducen en un hilo propio, así la pantalla de resultado se dibuja sin
+esperar a que termine el sonido. La salida pasa por un backend:
+
+- ``WinsoundBackend``: ``winsound.PlaySound`` (Windows).
+- ``ComandoBackend``: un reproductor de línea de comandos (``aplay`` de ALSA,
+  ``paplay``, ``afplay``) con los WAV guardados en un directorio temporal.
+- ``NullBackend``: no suena; registra lo pedido (pruebas, PCs sin audio).
+
+``reproducir`` descarta lo que estaba sonando o en espera: una pasada nueva
+corta el sonido de la anterior. El motor le pasa al backend ``vigente()``,
+que el backend consulta justo antes de empezar a sonar (con el mismo lock que
+``detener``), así una cancelación que llega en ese instante no se pierde. Solo biblioteca estándar (el kiosco arranca
+sin NumPy).
+"""
+import atexit
+import io
+import logging
+import math
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import wave
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from .config import AUDIO_CONFIG, SOUNDS
+
+Tono = Tuple[int, int]  # (frecuencia Hz, duración ms)
+Vigente = Optional[Callable[[], bool]]  # False si el pedido ya se canceló
+
+
+# ── Síntesis ───────────────────────────────────────────────────────────────
+def sintetizar(tonos: Union[Tono, Sequence[Tono]], muestreo: Optional[int] = None,
+               pausa_ms: Optional[int] = None, volumen: Optional[float] = None) -> bytes:
+    """WAV mono de 16 bits con los tonos seguidos (separados por ``pausa_ms``)"""
+    muestreo = muestreo or AUDIO_CONFIG["frecuencia_muestreo"]
+    pausa_ms = AUDIO_CONFIG["pausa_ms"] if pausa_ms is None else pausa_ms
+    volumen = AUDIO_CONFIG["volumen"] if volumen is None else volumen
+    if tonos and isinstance(tonos[0], int):
+        tonos = [tonos]
+    amplitud = int(32767 * max(0.0, min(volumen, 1.0)))
+    rampa = max(1, int(muestreo * 0.005))  # 5 ms de entrada/salida para evitar clics
+    silencio = bytes(2 * int(muestreo * pausa_ms / 1000))
+
+    datos = bytearray()
+    for i, (frecuencia, duracion_ms) in enumerate(tonos):
+        if i:
+            datos += silencio
+        n = int(muestreo * duracion_ms / 1000)
+        paso = 2 * math.pi * frecuencia / muestreo
+        muestras = [int(amplitud * min(1.0, k / rampa, (n - k) / rampa) * math.sin(paso * k))
+                    for k in range(n)]
+        datos += struct.pack(f"<{n}h", *muestras)
+
+    salida = io.BytesIO()
+    with wave.open(salida, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(muestreo)
+        wav.writeframes(bytes(datos))
+    return salida.getvalue()
+
+
+# ── Backends ───────────────────────────────────────────────────────────────
+class NullBackend:
+    """No reproduce nada; guarda los nombres pedidos"""
+
+    def __init__(self):
+        self.reproducidos: List[str] = []
+
+    def preparar(self, sonidos: Dict[str, bytes]) -> None:
+        pass
+
+    def reproducir(self, nombre: str, wav: bytes, vigente: Vigente = None) -> None:
+        if vigente is not None and not vigente():
+            return
+        self.reproducidos.append(nombre)
+
+    def detener(self) -> None:
+        pass
+
+
+class WinsoundBackend:
+    def __init__(self):
+        import winsound
+        self._winsound = winsound
+
+    def preparar(self, sonidos: Dict[str, bytes]) -> None:
+        pass
+
+    def reproducir(self, nombre: str, wav: bytes, vigente: Vigente = None) -> None:
+        # SND_MEMORY es sincrónico (no admite SND_ASYNC): bloquea el hilo de audio,
+        # no la interfaz. Se vuelve a mirar si sigue vigente justo antes de sonar.
+        if vigente is not None and not vigente():
+            return
+        self._winsound.PlaySound(wav, self._winsound.SND_MEMORY | self._winsound.SND_NODEFAULT)
+
+    def detener(self) -> None:
+        self._winsound.PlaySound(None, 0)  # corta el sonido en curso
+
+
+class ComandoBackend:
+    """Reproduce archivos WAV con un comando externo (``aplay -q`` por defecto)"""
+
+    REPRODUCTORES = (['aplay', '-q'], ['paplay'], ['afplay'])
+
+    def __init__(self, comando: Optional[Sequence[str]] = None):
+        self.comando = list(comando) if comando else self.detectar()
+        if not self.comando:
+            raise OSError("No se encontró un reproductor de audio (aplay, paplay, afplay)")
+        self._directorio = tempfile.mkdtemp(prefix="soma_audio_")
+        atexit.register(shutil.rmtree, self._directorio, True)
+        self._archivos: Dict[str, str] = {}
+        self._proceso: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def detectar(cls) -> Optional[List[str]]:
+        for comando in cls.REPRODUCTORES:
+            if shutil.which(comando[0]):
+                return list(comando)
+        return None
+
+    def preparar(self, sonidos: Dict[str, bytes]) -> None:
+        for nombre, wav in sonidos.items():
+            ruta = os.path.join(self._directorio, f"{nombre.lower()}.wav")
+            with open(ruta, 'wb') as f:
+                f.write(wav)
+            self._archivos[nombre] = ruta
+
+    def reproducir(self, nombre: str, wav: bytes, vigente: Vigente = None) -> None:
+        with self._lock:
+            # Con el lock de detener: o se cancela antes y no arranca, o arranca y detener lo corta
+            if vigente is not None and not vigente():
+                return
+            self._proceso = subprocess.Popen(self.comando + [self._archivos[nombre]],
+                                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            proceso = self._proceso
+        proceso.wait()
+
+    def detener(self) -> None:
+        with self._lock:
+            if self._proceso is not None and self._proceso.poll() is None:
+                self._proceso.terminate()
+
+
+def crear_backend(nombre: Optional[str] = None):
+    """Backend según ``AUDIO_CONFIG['backend']``: auto | winsound | comando | null"""
+    nombre = nombre or AUDIO_CONFIG["backend"]
+    if nombre == "null":
+        return NullBackend()
+    if nombre == "winsound" or (nombre == "auto" and sys.platform.startswith("win")):
+        return WinsoundBackend()
+    if nombre in ("comando", "auto"):
+        try:
+            return ComandoBackend(AUDIO_CONFIG["comando"])
+        except OSError as e:
+            if nombre == "comando":
+                raise
+            logging.warning(f"Audio: {e} - sonidos deshabilitados")
+            return NullBackend()
+    raise ValueError(f"Backend de audio desconocido: {nombre}")
+
+
+# ── Motor ──────────────────────────────────────────────────────────────────
+class AudioEngine:
+    def __init__(self, backend=None, sonidos: Optional[Dict] = None):
+        self.backend = backend if backend is not None else crear_backend()
+        self._wav = {nombre: sintetizar(tonos) for nombre, tonos in (sonidos or SOUNDS).items()}
+        self.backend.preparar(self._wav)
+        self._cola: "queue.Queue[Optional[Tuple[int, str]]]" = queue.Queue()
+        self._generacion = 0  # se incrementa al cancelar: lo encolado antes se descarta
+        self._lock = threading.Lock()
+        self._hilo = threading.Thread(target=self._trabajar, name="kiosco-audio", daemon=True)
+        self._hilo.start()
+
+    def reproducir(self, nombre: str) -> None:
+        """Corta lo que esté sonando o en espera y reproduce ``nombre``"""
+        if nombre not in self._wav:
+            logging.warning(f"Audio: sonido desconocido {nombre}")
+            return
+        self._cola.put((self.cancelar(), nombre))
+
+    def cancelar(self) -> int:
+        """Descarta los sonidos en espera y detiene el actual"""
+        with self._lock:
+            self._generacion += 1
+            generacion = self._generacion
+        try:
+            self.backend.detener()
+        except Exception as e:
+            logging.warning(f"Audio: error deteniendo sonido: {e}")
+        return generacion
+
+    def cerrar(self) -> None:
+        self.cancelar()
+        self._cola.put(None)
+
+    def _vigente(self, generacion: int) -> bool:
+        with self._lock:
+            return generacion == self._generacion
+
+    def _trabajar(self):
+        while True:
+            pedido = self._cola.get()
+            if pedido is None:
+                return
+            generacion, nombre = pedido
+            if not self._vigente(generacion):
+                continue  # una pasada posterior lo canceló
+            try:
+                self.backend.reproducir(nombre, self._wav[nombre],
+                                        vigente=lambda: self._vigente(generacion))
+            except Exception as e:
+                logging.warning(f"Error reproduciendo sonido: {e}")
+
+
+_motor: Optional[AudioEngine] = None
+_motor_lock = threading.Lock()
+
+
+def motor_audio() -> AudioEngine:
+    """Motor compartido del proceso (se crea al primer uso)"""
+    global _motor
+    with _motor_lock:
+        if _motor is None:
+            _motor = AudioEngine()
+        return _motor
@@ -8,6 +8,7 @@ from pathlib import Path
 from typing import List, Dict, Optional
 import threading
 import time
+import logging
 from .config import get_backup_path, get_data_path, BACKUP_CONFIG, generate_backup_filename
 
 class BackupManager:
@@ -15,14 +16,20 @@ class BackupManager:
         self.db_path = db_path
         self.backup_path = get_backup_path()
         self.backup_path.mkdir(exist_ok=True)
-        self.auto_backup_thread = None
-        self.stop_auto_backup = False
+        # Un backup (automático o manual) y una restauración nunca corren a la vez
+        self._lock = threading.RLock()
         
     def create_backup(self, description: str = "") -> Dict[str, any]:
         """Crea un backup incremental de la base de datos"""
+        with self._lock:
+            return self._create_backup(description)
+
+    def _create_backup(self, description: str) -> Dict[str, any]:
         try:
             backup_filename = generate_backup_filename()
             backup_file_path = self.backup_path / backup_filename
+            # Desde acá el diario de cambios completa este backup (ver journal.py)
+            started_at = datetime.now().isoformat()
             
             # Crear backup de la base de datos
             source_conn = sqlite3.connect(self.db_path)
@@ -32,21 +39,7 @@ class BackupManager:
             source_conn.close()
             backup_conn.close()
             
-            # Calcular hash para verificación de integridad
-            file_hash = self._calculate_file_hash(backup_file_path)
-            
-            # Crear metadata del backup
-            metadata = {
-                "filename": backup_filename,
-                "created_at": datetime.now().isoformat(),
-                "description": description,
-                "file_size": backup_file_path.stat().st_size,
-                "hash": file_hash,
-                "compressed": False
-            }
-            
-            # Guardar metadata
-            self._save_backup_metadata(backup_filename, metadata)
+            metadata = self.registrar_archivo(backup_filename, description, started_at=started_at)
             
             # Limpiar backups antiguos
             self._cleanup_old_backups()
@@ -65,8 +58,13 @@ class BackupManager:
             }
     
     def restore_backup(self, backup_filename: str) -> Dict[str, any]:
-        """Restaura la base de datos desde un backup"""
+        """Restaura la base de datos desde un backup, sin cerrar la base en uso"""
+        with self._lock:
+            return self._restore_backup(backup_filename)
+
+    def _restore_backup(self, backup_filename: str) -> Dict[str, any]:
         try:
+            tiempos = {}
             backup_file_path = self.backup_path / backup_filename
             
             if not backup_file_path.exists():
@@ -82,29 +80,87 @@ class BackupManager:
                 return {"success": False, "error": "El backup está corrupto"}
             
             # Crear backup de seguridad de la DB actual
+            inicio = time.perf_counter()
             current_backup = self.create_backup("Backup antes de restauración")
+            tiempos["seguridad"] = time.perf_counter() - inicio
             
             # Descomprimir si es necesario
             restore_file = backup_file_path
             if backup_filename.endswith('.gz') or str(backup_file_path).endswith('.gz'):
                 restore_file = self._decompress_backup(backup_file_path)
             
-            # Restaurar base de datos
-            shutil.copy2(restore_file, self.db_path)
-            
-            # Limpiar archivo temporal si se descomprimió
-            if restore_file != backup_file_path:
-                restore_file.unlink()
+            # Restaurar base de datos sobre la base abierta
+            inicio = time.perf_counter()
+            try:
+                self._copiar_sobre_base(restore_file)
+            finally:
+                # Limpiar archivo temporal si se descomprimió
+                if restore_file != backup_file_path:
+                    restore_file.unlink()
+            tiempos["copia"] = time.perf_counter() - inicio
+            logging.info(f"Backup restaurado: {backup_filename} (copia {tiempos['copia']:.3f}s)")
             
             return {
                 "success": True,
                 "message": "Base de datos restaurada exitosamente",
-                "safety_backup": current_backup.get("filename") if current_backup.get("success") else None
+                "safety_backup": current_backup.get("filename") if current_backup.get("success") else None,
+                "tiempos": tiempos
             }
             
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    def registrar_archivo(self, backup_filename: str, description: str = "", **extra) -> Dict:
+        """Agrega a la lista de backups un archivo ya escrito en la carpeta de backups"""
+        backup_file_path = self.backup_path / backup_filename
+        metadata = {
+            "filename": backup_filename,
+            "created_at": datetime.now().isoformat(),
+            "description": description,
+            "file_size": backup_file_path.stat().st_size,
+            # Hash para verificación de integridad
+            "hash": self._calculate_file_hash(backup_file_path),
+            "compressed": False,
+            **extra
+        }
+        self._save_backup_metadata(backup_filename, metadata)
+        return metadata
+
+    def ruta_backup(self, backup_filename: str) -> Optional[Path]:
+        """Archivo del backup (comprimido o no), None si ya no está"""
+        for ruta in (self.backup_path / backup_filename, self.backup_path / f"{backup_filename}.gz"):
+            if ruta.exists():
+                return ruta
+        return None
+
+    def extraer_backup(self, backup_filename: str, destino: Path) -> None:
+        """Copia el backup a ``destino``, descomprimido y verificado"""
+        ruta = self.ruta_backup(backup_filename)
+        if ruta is None:
+            raise ValueError(f"Archivo de backup no encontrado: {backup_filename}")
+        if not self._verify_backup_integrity(backup_filename):
+            raise ValueError(f"El backup está corrupto: {backup_filename}")
+        if ruta.suffix == '.gz':
+            with gzip.open(ruta, 'rb') as f_in, open(destino, 'wb') as f_out:
+                shutil.copyfileobj(f_in, f_out)
+        else:
+            shutil.copyfile(ruta, destino)
+
+    def _copiar_sobre_base(self, origen: Path) -> None:
+        """Copia ``origen`` sobre la base en uso con la API de backup de SQLite.
+
+        La copia se hace en un solo paso con la base bloqueada: las demás
+        conexiones esperan y después ven la base restaurada, sin tener que
+        cerrarse. Un archivo que no es una base falla antes de escribir.
+        """
+        fuente = sqlite3.connect(str(origen))
+        destino = sqlite3.connect(self.db_path, timeout=BACKUP_CONFIG["restore_timeout"])
+        try:
+            fuente.backup(destino)
+        finally:
+            fuente.close()
+            destino.close()
+
     def get_backup_list(self) -> List[Dict]:
         """Obtiene lista de backups disponibles"""
         backups = []
@@ -129,43 +185,10 @@ class BackupManager:
         
         return backups
     
-    def start_auto_backup(self):
-        """Inicia el sistema de backup automático"""
-        if self.auto_backup_thread and self.auto_backup_thread.is_alive():
-            return
-        
-        self.stop_auto_backup = False
-        self.auto_backup_thread = threading.Thread(target=self._auto_backup_worker, daemon=True)
-        self.auto_backup_thread.start()
-    
-    def stop_auto_backup_system(self):
-        """Detiene el sistema de backup automático"""
-        self.stop_auto_backup = True
-        if self.auto_backup_thread:
-            self.auto_backup_thread.join(timeout=5)
-    
-    def _auto_backup_worker(self):
-        """Worker thread para backups automáticos"""
-        backup_interval = BACKUP_CONFIG["auto_backup_hours"] * 3600  # Convertir a segundos
-        
-        while not self.stop_auto_backup:
-            try:
-                # Esperar el intervalo de backup
-                for _ in range(backup_interval):
-                    if self.stop_auto_backup:
-                        return
-                    time.sleep(1)
-                
-                # Crear backup automático
-                result = self.create_backup("Backup automático")
-                if result["success"]:
-                    print(f"Backup automático creado: {result['filename']}")
-                else:
-                    print(f"Error en backup automático: {result['error']}")
-                    
-            except Exception as e:
-                print(f"Error en worker de backup automático: {e}")
-                time.sleep(60)  # Esperar 1 minuto antes de reintentar
+    def archivar(self) -> None:
+        """Comprime los backups viejos y borra los que exceden ``max_backups``"""
+        with self._lock:
+            self._cleanup_old_backups()
     
     def _calculate_file_hash(self, file_path: Path) -> str:
         """Calcula hash SHA256 de un archivo"""
@@ -0,0 +1,233 @@
+"""Gráficos del dashboard con artistas persistentes.
+
+Cada panel crea sus artistas de matplotlib una sola vez y en cada refresco
+solo actualiza sus datos. Si los datos no cambiaron, no se redibuja. Por
+defecto el render se hace con Agg en un hilo aparte y el bitmap resultante se
+intercambia en un CTkLabel; si se desactiva, se usa FigureCanvasTkAgg con
+draw_idle.
+"""
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+try:
+    import customtkinter as ctk
+except ImportError:
+    ctk = None
+
+try:
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.patches import Circle
+    MATPLOTLIB_DISPONIBLE = True
+except ImportError:
+    MATPLOTLIB_DISPONIBLE = False
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from .config import CHART_CONFIG
+
+_render_pool: Optional[ThreadPoolExecutor] = None
+_render_pool_lock = threading.Lock()
+
+
+def _get_render_pool() -> ThreadPoolExecutor:
+    """Único hilo de render compartido por todos los paneles."""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chart-render")
+        return _render_pool
+
+
+def hash_datos(*datos) -> bytes:
+    """Hash corto y estable de los datos de entrada de un gráfico."""
+    return hashlib.blake2b(repr(datos).encode('utf-8'), digest_size=8).digest()
+
+
+class ChartPanel(ABC):
+    """Panel base: figura persistente + render diferido."""
+
+    def __init__(self, holder, figsize=(3.2, 3.2), dpi=100, pack_kwargs=None):
+        self.holder = holder
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.figure.patch.set_facecolor('#FFFFFF')
+        self._hash: Optional[bytes] = None
+        self._offthread = bool(CHART_CONFIG.get("prerender_offthread")) and Image is not None
+        self._resultados: "queue.Queue" = queue.Queue()
+        self._pendientes = 0
+        self._poll_id = None
+        self._ctk_image = None
+        self.renders = 0
+        self.omitidos = 0
+
+        if self._offthread:
+            self.canvas = FigureCanvasAgg(self.figure)
+            self.widget = ctk.CTkLabel(holder, text="")
+        else:
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            self.canvas = FigureCanvasTkAgg(self.figure, master=holder)
+            self.widget = self.canvas.get_tk_widget()
+        self.widget.pack(**(pack_kwargs or {}))
+
+        self._construir()
+
+    # ── API ────────────────────────────────────────────────────────────────
+    def actualizar(self, *datos) -> bool:
+        """Aplica nuevos datos. Retorna False si se omitió por no haber cambios."""
+        clave = hash_datos(*datos)
+        if clave == self._hash:
+            self.omitidos += 1
+            return False
+        self._hash = clave
+
+        if not self._offthread:
+            self._aplicar(*datos)
+            self.canvas.draw_idle()
+            self.renders += 1
+            return True
+
+        self._pendientes += 1
+        _get_render_pool().submit(self._render_en_hilo, datos)
+        if self._poll_id is None:
+            self._poll_id = self.widget.after(CHART_CONFIG.get("poll_ms", 15), self._recoger)
+        return True
+
+    def invalidar(self):
+        """Fuerza el próximo redibujado aunque los datos no cambien."""
+        self._hash = None
+
+    # ── Render ─────────────────────────────────────────────────────────────
+    def _render_en_hilo(self, datos):
+        try:
+            self._aplicar(*datos)
+            self.canvas.draw()
+            width, height = self.canvas.get_width_height()
+            imagen = Image.frombuffer("RGBA", (width, height), self.canvas.buffer_rgba(), "raw", "RGBA", 0, 1)
+            self._resultados.put((imagen.copy(), (width, height)))
+        except Exception as e:
+            logging.warning(f"Error renderizando gráfico: {e}")
+            self._resultados.put(None)
+
+    def _recoger(self):
+        """Corre en el hilo de Tk: intercambia el último bitmap terminado."""
+        self._poll_id = None
+        ultimo = None
+        while True:
+            try:
+                resultado = self._resultados.get_nowait()
+            except queue.Empty:
+                break
+            self._pendientes -= 1
+            if resultado is not None:
+                ultimo = resultado
+        if ultimo is not None:
+            imagen, size = ultimo
+            try:
+                if self._ctk_image is None:
+                    self._ctk_image = ctk.CTkImage(light_image=imagen, size=size)
+                    self.widget.configure(image=self._ctk_image)
+                else:
+                    self._ctk_image.configure(light_image=imagen, size=size)
+                self.renders += 1
+            except Exception as e:
+                logging.warning(f"Error mostrando gráfico: {e}")
+        if self._pendientes > 0:
+            self._poll_id = self.widget.after(CHART_CONFIG.get("poll_ms", 15), self._recoger)
+
+    # ── A implementar por cada gráfico ─────────────────────────────────────
+    @abstractmethod
+    def _construir(self):
+        """Crea los artistas persistentes de la figura"""
+
+    @abstractmethod
+    def _aplicar(self, *datos):
+        """Actualiza los artistas con los datos nuevos (sin recrearlos)"""
+
+
+class DonutChart(ChartPanel):
+    """Dona con cuñas persistentes; solo se actualizan ángulos y leyenda."""
+
+    def __init__(self, holder, colors: Sequence[str], texto_vacio: str = "Sin datos",
+                 legend_ncol: int = 2, **kwargs):
+        self.colors = list(colors)
+        self.texto_vacio = texto_vacio
+        self.legend_ncol = legend_ncol
+        super().__init__(holder, **kwargs)
+
+    def _construir(self):
+        ax = self.figure.add_subplot(111)
+        ax.axis('equal')
+        self.ax = ax
+        self.wedges, _ = ax.pie([1] * len(self.colors), colors=self.colors, startangle=90,
+                                wedgeprops=dict(width=0.35))
+        ax.add_artist(Circle((0, 0), 0.55, fc='white'))
+        self.legend = ax.legend(self.wedges, [""] * len(self.wedges), loc='lower center',
+                                bbox_to_anchor=(0.5, -0.2), ncol=self.legend_ncol, frameon=False)
+        self.texto = ax.text(0, 0, self.texto_vacio, ha='center', va='center', visible=False)
+
+    def _aplicar(self, valores: List[float], etiquetas: List[str]):
+        # El total es siempre el de las cuñas dibujadas: si no, el anillo queda con un hueco
+        total = sum(valores)
+        vacio = total <= 0
+        self.texto.set_visible(vacio)
+        self.legend.set_visible(not vacio)
+        angulo = 90.0
+        for wedge, valor in zip(self.wedges, valores):
+            wedge.set_visible(not vacio)
+            if vacio:
+                continue
+            fin = angulo + 360.0 * (valor / total)
+            wedge.set_theta1(angulo)
+            wedge.set_theta2(fin)
+            angulo = fin
+        for texto, etiqueta in zip(self.legend.get_texts(), etiquetas):
+            texto.set_text(etiqueta)
+
+
+class LineChart(ChartPanel):
+    """Serie temporal con línea persistente; el relleno se regenera."""
+
+    def __init__(self, holder, color: str, ylabel: str = "", **kwargs):
+        self.color = color
+        self.ylabel = ylabel
+        self._layout_key = None
+        super().__init__(holder, **kwargs)
+
+    def _construir(self):
+        ax = self.figure.add_subplot(111)
+        self.ax = ax
+        self.line, = ax.plot([], [], marker='o', color=self.color, linewidth=2, markersize=5)
+        self.fill = None
+        ax.set_ylabel(self.ylabel, fontsize=9)
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        ax.grid(True, linestyle='--', alpha=0.2)
+        ax.tick_params(axis='both', labelsize=8)
+
+    def _aplicar(self, etiquetas: List[str], valores: List[float]):
+        ax = self.ax
+        xs = list(range(len(valores)))
+        self.line.set_data(xs, valores)
+        if self.fill is not None:
+            self.fill.remove()
+            self.fill = None
+        if xs:
+            self.fill = ax.fill_between(xs, valores, alpha=0.12, color=self.color)
+        ax.set_xticks(xs)
+        ax.set_xticklabels(etiquetas, rotation=45, ha='right', fontsize=8)
+        ax.relim()
+        ax.autoscale_view()
+        # tight_layout solo cuando cambia lo que afecta a los márgenes
+        ancho_y = len(f"{max(valores):.0f}") if valores else 0
+        layout_key = (bool(xs), ancho_y)
+        if layout_key != self._layout_key:
+            self._layout_key = layout_key
+            self.figure.tight_layout(pad=1.5)
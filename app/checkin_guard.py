@@ -0,0 +1,103 @@
+"""Anti-passback del kiosco: pasadas repetidas del mismo DNI.
+
+Si un socio pasa el DNI varias veces seguidas, solo la primera consulta va a
+la base y queda en ``ingresos``; las siguientes dentro de
+``ANTIPASSBACK_CONFIG['ventana_segundos']`` se responden con el mismo
+resultado desde memoria. Según ``modo``:
+
+- "omitir": las repeticiones no se registran.
+- "contar": se suman en ``ingresos.repeticiones`` de la primera pasada, en una
+  sola escritura cuando vence la ventana (o al cerrar el kiosco).
+
+Un pago o una edición del socio descarta su entrada (``olvidar``), así quien
+paga en recepción y vuelve a pasar ve el estado nuevo.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .config import ANTIPASSBACK_CONFIG
+
+
+class AntiPassback:
+    def __init__(self, registrar_repeticiones: Optional[Callable[[Dict[int, int]], None]] = None,
+                 ventana_segundos: Optional[float] = None, modo: Optional[str] = None,
+                 max_dnis: Optional[int] = None):
+        """``registrar_repeticiones({dni: n})`` recibe las repeticiones a guardar en modo "contar"."""
+        self.ventana = ANTIPASSBACK_CONFIG["ventana_segundos"] if ventana_segundos is None else ventana_segundos
+        self.modo = modo or ANTIPASSBACK_CONFIG["modo"]
+        self.max_dnis = max_dnis or ANTIPASSBACK_CONFIG["max_dnis"]
+        self.registrar_repeticiones = registrar_repeticiones
+        self._lock = threading.Lock()
+        # dni -> [instante de la pasada registrada, resultado, repeticiones],
+        # en orden de llegada: las vencidas quedan al principio
+        self._recientes: "OrderedDict[int, list]" = OrderedDict()
+        self.repeticiones = 0
+
+    def repetido(self, dni: int, ahora: Optional[float] = None) -> Optional[Dict]:
+        """Resultado de la pasada anterior si ``dni`` pasó dentro de la ventana (y la cuenta)"""
+        if self.ventana <= 0:
+            return None
+        ahora = time.monotonic() if ahora is None else ahora
+        with self._lock:
+            vencidas = self._purgar(ahora)
+            entrada = self._recientes.get(dni)
+            if entrada is not None:
+                entrada[2] += 1
+                self.repeticiones += 1
+        self._volcar(vencidas)
+        return entrada[1] if entrada is not None else None
+
+    def recordar(self, dni: int, resultado: Dict, ahora: Optional[float] = None) -> None:
+        """Anota una pasada que sí se registró en ``ingresos``"""
+        if self.ventana <= 0:
+            return
+        ahora = time.monotonic() if ahora is None else ahora
+        with self._lock:
+            vencidas = [(dni, self._recientes.pop(dni))] if dni in self._recientes else []
+            self._recientes[dni] = [ahora, resultado, 0]
+            while len(self._recientes) > self.max_dnis:
+                vencidas.append(self._recientes.popitem(last=False))
+        self._volcar(vencidas)
+
+    def olvidar(self, dni: Optional[int]) -> None:
+        """Descarta la entrada de ``dni`` (cambió su estado)"""
+        with self._lock:
+            entrada = self._recientes.pop(dni, None)
+        if entrada is not None:
+            self._volcar([(dni, entrada)])
+
+    def vaciar(self) -> None:
+        """Guarda las repeticiones pendientes y vacía el caché (al cerrar)"""
+        with self._lock:
+            vencidas = list(self._recientes.items())
+            self._recientes.clear()
+        self._volcar(vencidas)
+
+    def descartar(self) -> None:
+        """Vacía el caché sin guardar repeticiones (se restauró otra base: los
+        ingresos a los que se sumarían ya no están)"""
+        with self._lock:
+            self._recientes.clear()
+
+    def _purgar(self, ahora: float) -> List[Tuple[int, list]]:
+        vencidas = []
+        while self._recientes:
+            if ahora - next(iter(self._recientes.values()))[0] < self.ventana:
+                break
+            vencidas.append(self._recientes.popitem(last=False))
+        return vencidas
+
+    def _volcar(self, vencidas: List[Tuple[int, list]]) -> None:
+        if self.modo != "contar" or self.registrar_repeticiones is None:
+            return
+        conteos = {dni: entrada[2] for dni, entrada in vencidas
+                   if entrada[2] and entrada[1].get('estado') != 'No registrado'}
+        if not conteos:
+            return
+        try:
+            self.registrar_repeticiones(conteos)
+        except Exception as e:
+            logging.error(f"Anti-passback: no se pudieron guardar {sum(conteos.values())} repetición(es): {e}")
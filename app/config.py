@@ -2,6 +2,7 @@ import os
 import sys
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
 
 # Colores oficiales
 COLORS = {
@@ -53,23 +54,147 @@ FONTS = {
 }
 
 # Configuración
+DB_PATH = "data/sistema_gym.db"
 DIAS_CUOTA = 30
 DIAS_ALERTA = 7
+
+# Reglas de vencimiento (ver expiry.py). Al cambiarlas, reconstruir los
+# datos guardados: python -m app rollups pagado_hasta analitica
+VENCIMIENTO_CONFIG = {
+    "modo": "dias",            # "dias": meses de DIAS_CUOTA días | "meses": meses calendario
+    "dias_por_mes": DIAS_CUOTA,
+    "dias_gracia": 0           # Días de vigencia extra después del vencimiento
+}
 # Duración por defecto de los popups (segundos)
 POPUP_AUTOCLOSE_SECONDS = 2 
 
 BACKUP_CONFIG = {
-    "auto_backup_hours": 24,  # Backup automático cada 6 horas
+    "auto_backup_hours": 24,  # Backup automático cada 24 horas (ver MANTENIMIENTO_CONFIG)
     "max_backups": 30,       # Máximo 30 backups
     "compress_after_days": 7, # Comprimir backups después de 7 días
-    "verify_integrity": True  # Verificar integridad de backups
+    "verify_integrity": True,  # Verificar integridad de backups
+    "restore_timeout": 30,    # Segundos de espera a que se liberen los bloqueos al restaurar
+    "restore_poll_ms": 100    # La interfaz consulta el resultado de la restauración
+}
+
+# Tareas periódicas (ver maintenance.py). La última ejecución de cada una se
+# guarda en mantenimiento.json junto a la base.
+#   cada_horas: intervalo desde la última ejecución
+#   ventana:    solo arranca en ese horario (salvo un intervalo entero de atraso)
+#   escrituras: adelantarla tras N cambios de socios/pagos/grupos (min_minutos entre corridas)
+MANTENIMIENTO_CONFIG = {
+    "horas_pico": [("07:00", "10:00"), ("18:00", "21:30")],  # kiosco lleno: no arrancar tareas
+    "demora_inicio_minutos": 5,   # al abrir la app, dejarla cargar antes de la primera tarea
+    "reintento_minutos": 15,      # tras un error
+    "espera_max_minutos": 60,
+    # Tareas por tramos (vacuum incremental, ANALYZE, quick_check)
+    "ocio_segundos": 30,          # sin cambios en la base este tiempo antes de cada tramo
+    "max_segundos": 20,           # trabajo por corrida; lo que falta sigue en la próxima
+    "paginas_por_tramo": 256,     # PRAGMA incremental_vacuum(N)
+    "tareas": {
+        "backup":      {"cada_horas": BACKUP_CONFIG["auto_backup_hours"], "ventana": ("13:00", "17:00"),
+                        "escrituras": 500, "min_minutos": 30},
+        "analyze":     {"cada_horas": 24},                                  # por tabla
+        "optimize":    {"cada_horas": 24},                                  # PRAGMA optimize
+        "incremental": {"cada_horas": 24, "escrituras": 2000, "min_minutos": 60},  # páginas libres
+        "quick_check": {"cada_horas": 24 * 7},                              # por tabla
+        "archivo":     {"cada_horas": 24},                                  # comprimir/podar backups
+        "rollups":     {"cada_horas": 24 * 7, "ventana": ("13:00", "17:00")},  # datos derivados completos
+        "vacuum":      {"cada_horas": 24 * 30, "ventana": ("13:00", "17:00")},  # también activa auto_vacuum
+        "kpis":        {"cada_horas": 4}                                    # foto del día (kpi_snapshots)
+    }
+}
+
+# Historial diario de KPIs (ver kpi_snapshots.py). "vs prev." compara contra
+# el mismo día del mes anterior.
+KPI_CONFIG = {
+    "dias_historial": 90,    # días sin foto que la tarea diaria reconstruye como máximo
+    "dias_tendencia": 30     # mini-tendencia de las tarjetas del dashboard
+}
+
+# Diario de cambios entre backups (ver journal.py): permite reconstruir la base
+# a cualquier momento con python -m app backup --recuperar "YYYY-MM-DD HH:MM"
+JOURNAL_CONFIG = {
+    "activo": True,
+    "directorio": "diario",  # dentro de backups/
+    "fsync": True,           # cada lote llega al disco (un fsync por lote)
+    "lote_ms": 50,           # espera del escritor para juntar los cambios de una operación
+    "reintentos": 8,         # un lote que no se puede escribir se reintenta con espera creciente...
+    "reintento_max_segundos": 30,  # ...hasta este máximo; agotados, queda un hueco en el diario
+    "retencion_dias": 60
 }
 
 ALERT_CONFIG = {
     "vencimiento_dias": [1, 3, 7],  # Alertas de vencimiento
     "inactividad_dias": 15,         # Días sin visitas para considerar inactivo
     "max_alertas_dashboard": 5,     # Máximo alertas en dashboard
-    "refresh_interval_minutes": 5   # Actualizar dashboard cada 5 minutos
+    "refresh_interval_minutes": 5,  # Actualizar dashboard cada 5 minutos
+    "ingresos_refresh_segundos": 30 # Ingresos del kiosco: a lo sumo un recálculo cada N segundos
+}
+
+ANALYTICS_CONFIG = {
+    "tolerancia_pago_dias": 5,   # Renovación "en fecha" hasta N días después del vencimiento
+    "meses_promedio_churn": 3,   # Churn mensual = promedio de los últimos N meses cerrados
+    "cohortes_visibles": 12,
+    "meses_retencion": 6,        # Columnas M0..M5 de la tabla de cohortes
+    "poll_ms": 100               # Recogida del resultado calculado en segundo plano
+}
+
+LOG_CONFIG = {
+    "level": "INFO",
+    "format": "%(asctime)s - %(levelname)s - %(message)s",
+    "datefmt": "%Y-%m-%d %H:%M:%S",
+    "max_bytes": 5 * 1024 * 1024,  # Tamaño máximo por archivo antes de rotar
+    "backup_count": 5,             # Rotaciones por día (sistema_YYYYMMDD.log.1 ...)
+    "retencion_dias": 60,          # Borrar archivos de log más antiguos
+    "sqlite_sink": False,          # Copia estructurada (JSON) en la tabla logs
+    "sqlite_level": "WARNING",
+    "sqlite_batch": 50,            # Registros por INSERT en lote
+    "sqlite_flush_segundos": 5,
+    "sqlite_retencion_dias": 90
+}
+
+CHART_CONFIG = {
+    "prerender_offthread": True,  # Renderizar con Agg en un hilo y mostrar el bitmap
+    "poll_ms": 15                 # Intervalo para recoger bitmaps terminados
+}
+
+EVENT_CONFIG = {
+    "poll_ms": 200  # Recogida de eventos publicados fuera del hilo de Tk
+}
+
+# Servicio de kiosco para varias terminales (ver kiosk_service.py)
+# modo: "local" (esta terminal usa la base directamente), "servidor" (además
+# atiende a otras terminales) o "cliente" (consulta al servidor por la red).
+# Solo en modo "servidor" se escucha en la red, y ahí hace falta SOMA_KIOSK_TOKEN
+# (el mismo en servidor y clientes; viaja en la cabecera X-Kiosk-Token).
+_KIOSK_MODO = os.getenv('SOMA_KIOSK_MODO', 'local')
+KIOSK_SERVICE = {
+    "modo": _KIOSK_MODO,
+    "host": os.getenv('SOMA_KIOSK_HOST', '0.0.0.0' if _KIOSK_MODO == 'servidor' else '127.0.0.1'),
+    "port": 8765,
+    "url": os.getenv('SOMA_KIOSK_URL', 'http://127.0.0.1:8765'),
+    "token": os.getenv('SOMA_KIOSK_TOKEN', ''),
+    "max_cuerpo": 1024,  # Bytes aceptados en el cuerpo de un pedido
+    "timeout": 2,      # Segundos de espera del cliente
+    "batch_ms": 200,   # Ventana para agrupar ingresos en una sola escritura
+    "batch_max": 50,
+    "reintento_max_segundos": 5  # Espera máxima entre reintentos de un lote que no se pudo escribir
+}
+
+# Pantalla del kiosco: se registra la latencia pasada -> resultado en pantalla
+# (debug por consulta, resumen p50/p95 en info cada N consultas)
+KIOSK_UI_CONFIG = {
+    "muestras_latencia": 100
+}
+
+# Anti-passback del kiosco (ver checkin_guard.py): el mismo DNI dentro de la
+# ventana se responde desde memoria. modo: "omitir" (no se registra) o
+# "contar" (se suma en ingresos.repeticiones). ventana_segundos 0 = desactivado.
+ANTIPASSBACK_CONFIG = {
+    "ventana_segundos": 60,
+    "modo": "contar",
+    "max_dnis": 512    # DNIs recordados a la vez
 }
 
 # Sonidos (frecuencia Hz, duración ms)
@@ -79,6 +204,30 @@ SOUNDS = {
     'NOT_REGISTERED': (600, 300)
 }
 
+# Audio del kiosco (ver audio.py). backend: "auto" (winsound en Windows, si no
+# el primer reproductor disponible: aplay/paplay/afplay), "winsound",
+# "comando" (usa "comando" si se indica, ej. ["aplay", "-q"]) o "null".
+AUDIO_CONFIG = {
+    "backend": os.getenv('SOMA_AUDIO', 'auto'),
+    "comando": None,
+    "frecuencia_muestreo": 22050,
+    "volumen": 0.5,
+    "pausa_ms": 100    # Silencio entre tonos de un mismo sonido (doble beep)
+}
+
+# Pestañas de la ventana principal (ver lazy_tabs.py): cada una se arma y carga
+# al elegirla por primera vez. Con la app sin uso se precargan de a una.
+TABS_CONFIG = {
+    "precarga": True,
+    "inactividad_ms": 2000,   # Sin teclado ni mouse este tiempo antes de precargar
+    "pausa_ms": 300           # Entre una pestaña precargada y la siguiente
+}
+
+# Listados filtrables: espera desde la última tecla antes de volver a consultar
+LISTADOS_CONFIG = {
+    "debounce_ms": 250
+}
+
 # Autenticación y roles
 # PIN del dueño para acceder a funcionalidades restringidas (p. ej., Dashboard).
 # Puede sobreescribirse con variable de entorno SOMA_OWNER_PIN.
@@ -110,9 +259,9 @@ def get_backup_path() -> Path:
     """Retorna el path de la carpeta backups"""
     return Path("backups")
 
-def get_log_filename():
-    """Retorna el nombre del archivo de log del día actual"""
-    today = datetime.now().strftime("%Y%m%d")
+def get_log_filename(fecha: Optional[datetime] = None):
+    """Retorna el nombre del archivo de log del día indicado (por defecto hoy)"""
+    today = (fecha or datetime.now()).strftime("%Y%m%d")
     return f"logs/sistema_{today}.log"
 
 def get_backup_filename():
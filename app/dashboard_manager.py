@@ -1,37 +1,93 @@
 import sqlite3
-from datetime import datetime, timedelta
-from typing import List, Dict, Tuple, Optional
-from .config import ALERT_CONFIG, DIAS_CUOTA
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Dict, Tuple, Optional
+from . import kpi_snapshots
+from .config import ALERT_CONFIG, KPI_CONFIG
+from .expiry import vigente_desde
+from .events import CambioDatos, SOCIOS, PAGOS, INGRESOS
+from .expiry_calendar import CalendarioVencimientos
+
+# Tablas de las que depende cada sección del dashboard. kpis_prev y
+# kpi_history salen de kpi_snapshots (días pasados): se renuevan al cambiar el día.
+_DEPENDENCIAS = {
+    "kpis": {SOCIOS, PAGOS, INGRESOS},
+    "alerts": {SOCIOS, PAGOS, INGRESOS},
+    "quick_actions": {SOCIOS, PAGOS, INGRESOS},
+    "recent_activity": {SOCIOS, PAGOS, INGRESOS},
+    "trends": {INGRESOS},
+    "income_series": {PAGOS},
+    "payment_methods": {PAGOS},
+}
 
 class DashboardManager:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, vencimientos: CalendarioVencimientos):
         self.db_path = db_path
+        self.vencimientos = vencimientos
+        # Secciones ya calculadas; se descartan por eventos de cambio o al cambiar el día
+        self._cache: Dict[str, object] = {}
+        self._cache_dia: Optional[str] = None
     
     def get_dashboard_data(self, range_key: Optional[str] = None) -> Dict:
         """Obtiene todos los datos para el dashboard inteligente.
         range_key puede ser: '1d','7d','30d','90d','all'.
+        Solo se recalculan las secciones invalidadas desde la última llamada.
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
+            hoy = datetime.now().strftime('%Y-%m-%d')
+            if self._cache_dia != hoy:
+                self._cache.clear()
+                self._cache_dia = hoy
             date_from, date_to = self._get_range_bounds(range_key)
-            
-            dashboard_data = {
-                "kpis": self._get_kpis(conn),
-                "alerts": self._get_alerts(conn),
-                "quick_actions": self._get_quick_actions(conn),
-                "recent_activity": self._get_recent_activity(conn),
-                "trends": self._get_trends(conn),
-                "income_series": self._get_income_series(conn, date_from, date_to),
-                "payment_methods": self._get_payment_methods_split(conn)
+            if self._cache.get("income_range") != (date_from, date_to):
+                self._cache.pop("income_series", None)
+
+            secciones = {
+                "kpis": self._get_kpis,
+                "kpis_prev": self._get_kpis_prev,
+                "kpi_history": self._get_kpi_history,
+                "alerts": self._get_alerts,
+                "quick_actions": self._get_quick_actions,
+                "recent_activity": self._get_recent_activity,
+                "trends": self._get_trends,
+                "income_series": lambda c: self._get_income_series(c, date_from, date_to),
+                "payment_methods": self._get_payment_methods_split,
             }
-            
-            conn.close()
-            return dashboard_data
+            faltantes = [nombre for nombre in secciones if nombre not in self._cache]
+            if faltantes:
+                conn = sqlite3.connect(self.db_path)
+                conn.row_factory = sqlite3.Row
+                try:
+                    for nombre in faltantes:
+                        self._cache[nombre] = secciones[nombre](conn)
+                finally:
+                    conn.close()
+                self._cache["income_range"] = (date_from, date_to)
+
+            return {nombre: self._cache[nombre] for nombre in secciones}
             
         except Exception as e:
             print(f"Error obteniendo datos del dashboard: {e}")
             return self._get_empty_dashboard()
+
+    def invalidar(self, eventos: Iterable[CambioDatos]) -> None:
+        """Descarta las secciones afectadas por los cambios recibidos"""
+        mes_actual = datetime.now().strftime('%Y-%m')
+        desde, hasta = self._cache.get("income_range", (None, None))
+        for evento in eventos:
+            for seccion, tablas in _DEPENDENCIAS.items():
+                if evento.entidad not in tablas or seccion not in self._cache:
+                    continue
+                # Secciones por fecha: solo si el cambio cae dentro de su período
+                if seccion == "payment_methods" and evento.fechas:
+                    if not any(f.startswith(mes_actual) for f in evento.fechas):
+                        continue
+                if seccion == "income_series" and evento.fechas and desde and hasta:
+                    if not any(desde <= f <= hasta for f in evento.fechas):
+                        continue
+                del self._cache[seccion]
+
+    def invalidar_todo(self) -> None:
+        self._cache.clear()
     
     def _get_range_bounds(self, range_key: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
         if not range_key or range_key == 'all':
@@ -57,18 +113,9 @@ class DashboardManager:
         cursor.execute("SELECT COUNT(*) FROM socios")
         total_socios = cursor.fetchone()[0]
         
-        # Socios activos (cuota vigente según duración real de cada pago)
-        cursor.execute("""
-            SELECT COUNT(DISTINCT s.dni)
-            FROM socios s
-            JOIN pagos p ON p.id = (
-                SELECT id FROM pagos p2
-                WHERE p2.dni = s.dni
-                ORDER BY fecha_pago DESC
-                LIMIT 1
-            )
-            WHERE date(p.fecha_pago, '+' || (COALESCE(p.meses, 1) * 30) || ' days') >= date('now')
-        """)
+        # Socios activos (vencimiento acumulado de todos sus pagos)
+        cursor.execute("SELECT COUNT(*) FROM socios WHERE pagado_hasta >= ?",
+                       (vigente_desde().isoformat(),))
         socios_activos = cursor.fetchone()[0]
         
         # Ingresos del mes actual
@@ -128,33 +175,23 @@ class DashboardManager:
             "promedio_visitas_diarias": promedio_visitas
         }
     
+    def _get_kpis_prev(self, conn: sqlite3.Connection) -> Dict:
+        """KPIs del mismo día del mes anterior, para los "vs prev." (lectura por clave)"""
+        return kpi_snapshots.obtener(conn, kpi_snapshots.dia_comparable(date.today())) or {}
+
+    def _get_kpi_history(self, conn: sqlite3.Connection) -> Dict[str, List[float]]:
+        """Valores diarios de cada KPI hasta ayer, para las mini-tendencias"""
+        ayer = date.today() - timedelta(days=1)
+        return kpi_snapshots.serie(conn, ayer - timedelta(days=KPI_CONFIG["dias_tendencia"] - 1), ayer)
+
     def _get_alerts(self, conn: sqlite3.Connection) -> List[Dict]:
         """Obtiene alertas inteligentes para el dashboard"""
         alerts = []
         cursor = conn.cursor()
         
-        # Alertas de vencimientos próximos (usa duración real de cada último pago)
+        # Alertas de vencimientos próximos (calendario de vencimientos, sin SQL)
         for dias in ALERT_CONFIG["vencimiento_dias"]:
-            sql = f"""
-                SELECT nombre, dni, fecha_vencimiento, ultima_cuota
-                FROM (
-                    SELECT s.nombre, s.dni,
-                           date(p.fecha_pago, '+' || (COALESCE(p.meses, 1) * 30) || ' days') AS fecha_vencimiento,
-                           p.fecha_pago AS ultima_cuota
-                    FROM socios s
-                    JOIN pagos p ON p.id = (
-                        SELECT id FROM pagos p2
-                        WHERE p2.dni = s.dni
-                        ORDER BY fecha_pago DESC
-                        LIMIT 1
-                    )
-                ) sub
-                WHERE fecha_vencimiento = DATE('now', '+{dias} days')
-                ORDER BY fecha_vencimiento ASC
-                LIMIT 5
-            """
-            cursor.execute(sql)
-            vencimientos = cursor.fetchall()
+            vencimientos = self.vencimientos.vencen_en(dias)
             if vencimientos:
                 alerts.append({
                     "type": "warning" if dias > 3 else "danger",
@@ -162,38 +199,32 @@ class DashboardManager:
                     "message": f"{len(vencimientos)} socio{'s' if len(vencimientos) > 1 else ''} vence{'n' if len(vencimientos) > 1 else ''} en {dias} día{'s' if dias > 1 else ''}",
                     "count": len(vencimientos),
                     "action": "view_expiring",
-                    "data": {"dias": dias, "socios": [dict(row) for row in vencimientos]}
+                    "data": {"dias": dias, "socios": vencimientos[:5]}
                 })
         
         # Alertas de socios inactivos (sin visitas, pero con cuota vigente)
         hace_x_dias = (datetime.now() - timedelta(days=ALERT_CONFIG["inactividad_dias"])).strftime('%Y-%m-%d')
+        # COUNT(*) OVER () da el total antes del LIMIT: el mensaje no se corta en 10
         cursor.execute("""
-            SELECT s.nombre, s.dni,
-                   MAX(i.fecha) as ultima_visita,
-                   p.fecha_pago as ultima_cuota
+            SELECT s.nombre, s.dni, s.ultima_visita,
+                   (SELECT MAX(fecha_pago) FROM pagos p WHERE p.dni = s.dni) as ultima_cuota,
+                   COUNT(*) OVER () as total
             FROM socios s
-            LEFT JOIN ingresos i ON s.dni = i.dni
-            JOIN pagos p ON p.id = (
-                SELECT id FROM pagos p2
-                WHERE p2.dni = s.dni
-                ORDER BY fecha_pago DESC
-                LIMIT 1
-            )
-            WHERE (i.fecha IS NULL OR i.fecha < ?)
-            AND date(p.fecha_pago, '+' || (COALESCE(p.meses, 1) * 30) || ' days') >= date('now')
-            GROUP BY s.dni
+            WHERE (s.ultima_visita IS NULL OR s.ultima_visita < ?)
+            AND s.pagado_hasta >= ?
             LIMIT 10
-        """, (hace_x_dias,))
+        """, (hace_x_dias, vigente_desde().isoformat()))
         
         inactivos = cursor.fetchall()
         if inactivos:
+            total = inactivos[0]['total']
             alerts.append({
                 "type": "info",
                 "title": "Socios inactivos",
-                "message": f"{len(inactivos)} socio{'s' if len(inactivos) > 1 else ''} activo{'s' if len(inactivos) > 1 else ''} sin visitas en {ALERT_CONFIG['inactividad_dias']} días",
-                "count": len(inactivos),
+                "message": f"{total} socio{'s' if total > 1 else ''} activo{'s' if total > 1 else ''} sin visitas en {ALERT_CONFIG['inactividad_dias']} días",
+                "count": total,
                 "action": "view_inactive",
-                "data": {"socios": [dict(row) for row in inactivos]}
+                "data": {"socios": [{k: row[k] for k in row.keys() if k != 'total'} for row in inactivos]}
             })
         
         # Limitar número de alertas
@@ -205,18 +236,7 @@ class DashboardManager:
         cursor = conn.cursor()
         
         # Acción: Renovar vencimientos próximos (en los próximos 3 días)
-        cursor.execute("""
-            SELECT COUNT(DISTINCT s.dni)
-            FROM socios s
-            JOIN pagos p ON p.id = (
-                SELECT id FROM pagos p2 WHERE p2.dni = s.dni
-                ORDER BY fecha_pago DESC LIMIT 1
-            )
-            WHERE date(p.fecha_pago, '+' || (COALESCE(p.meses, 1) * 30) || ' days')
-                  BETWEEN date('now') AND date('now', '+3 days')
-        """)
-
-        vencimientos_3_dias = cursor.fetchone()[0]
+        vencimientos_3_dias = self.vencimientos.contar_proximos(3)
         if vencimientos_3_dias > 0:
             actions.append({
                 "title": "Renovar cuotas",
@@ -229,16 +249,11 @@ class DashboardManager:
         # Acción: Contactar inactivos (activos sin visitas en 15 días)
         hace_15_dias = (datetime.now() - timedelta(days=15)).strftime('%Y-%m-%d')
         cursor.execute("""
-            SELECT COUNT(DISTINCT s.dni)
+            SELECT COUNT(*)
             FROM socios s
-            LEFT JOIN ingresos i ON s.dni = i.dni
-            JOIN pagos p ON p.id = (
-                SELECT id FROM pagos p2 WHERE p2.dni = s.dni
-                ORDER BY fecha_pago DESC LIMIT 1
-            )
-            WHERE (i.fecha IS NULL OR i.fecha < ?)
-            AND date(p.fecha_pago, '+' || (COALESCE(p.meses, 1) * 30) || ' days') >= date('now')
-        """, (hace_15_dias,))
+            WHERE (s.ultima_visita IS NULL OR s.ultima_visita < ?)
+            AND s.pagado_hasta >= ?
+        """, (hace_15_dias, vigente_desde().isoformat()))
         
         inactivos_15_dias = cursor.fetchone()[0]
         if inactivos_15_dias > 0:
@@ -377,6 +392,8 @@ class DashboardManager:
                 "visitas_hoy": 0,
                 "promedio_visitas_diarias": 0
             },
+            "kpis_prev": {},
+            "kpi_history": {},
             "alerts": [],
             "quick_actions": [],
             "recent_activity": [],
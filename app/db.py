@@ -2,25 +2,258 @@ import sqlite3
 import os
 import shutil
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-import pandas as pd
-from .config import DIAS_CUOTA, get_backup_filename, ensure_directories
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from typing import Callable, Dict, Generator, Iterable, Iterator, List, Optional, Tuple
+from .config import (DB_PATH, DIAS_CUOTA, JOURNAL_CONFIG, MANTENIMIENTO_CONFIG, get_backup_filename,
+                     ensure_directories)
 from .backup_manager import BackupManager
+from .events import (CambioDatos, EventBus, SOCIOS, PAGOS, INGRESOS, GRUPOS, BASE,
+                     INSERT, UPDATE, DELETE, RESTAURANDO, RESTAURADA)
+from .expiry import acumular, vigente, vigente_desde
+from .expiry_calendar import CalendarioVencimientos
+from .journal import DiarioCambios, leer_momento
+from . import kpi_snapshots
+from .dashboard_manager import DashboardManager
+from .maintenance import MaintenanceScheduler
+from .rows import iterar
+
+_SQL_SOCIOS_CON_ESTADO = '''
+    SELECT s.dni, s.nombre, s.email, s.telefono, s.fecha_alta,
+           s.grupo_id, s.ultima_visita, s.visitas, s.pagado_hasta,
+           g.nombre AS grupo_nombre,
+           (SELECT MAX(fecha_pago) FROM pagos p WHERE p.dni = s.dni) AS ultimo_pago,
+           s.pagado_hasta AS fecha_vencimiento,
+           CASE WHEN s.pagado_hasta >= :vigente_desde THEN 'Activo' ELSE 'Vencido' END AS estado
+    FROM socios s
+    LEFT JOIN grupos_familiares g ON s.grupo_id = g.id
+'''
+
+def estado_kiosco(nombre: Optional[str], vencimiento_cuota: Optional[date], registrado: bool = True,
+                  ahora: Optional[datetime] = None) -> Dict:
+    """Resultado de una consulta de kiosco con la forma de consultar_estado_socio"""
+    if not registrado:
+        return {'estado': 'No registrado', 'nombre': None, 'fecha_vencimiento': None}
+    if vencimiento_cuota is None:
+        return {'estado': 'Vencido', 'nombre': nombre, 'fecha_vencimiento': None}
+    estado = 'Activo' if vigente(vencimiento_cuota, (ahora or datetime.now()).date()) else 'Vencido'
+    return {'estado': estado, 'nombre': nombre, 'fecha_vencimiento': vencimiento_cuota.isoformat()}
+
+
+def _params_estado(**extra) -> Dict:
+    """Parámetros de _SQL_SOCIOS_CON_ESTADO (el estado se resuelve en la consulta)"""
+    return {'vigente_desde': vigente_desde().isoformat(), **extra}
+
+
+def _recalcular_pagado_hasta(conn: sqlite3.Connection, dnis: Optional[Iterable[int]] = None) -> None:
+    """Recalcula socios.pagado_hasta acumulando todos los pagos de ``dnis`` (o de todos)"""
+    if dnis is None:
+        conn.execute('UPDATE socios SET pagado_hasta = NULL')
+        pagos = conn.execute('SELECT dni, fecha_pago, meses FROM pagos ORDER BY dni, fecha_pago, id')
+    else:
+        dnis = list(dnis)
+        conn.executemany('UPDATE socios SET pagado_hasta = NULL WHERE dni = ?', [(d,) for d in dnis])
+        pagos = conn.execute(f'''
+            SELECT dni, fecha_pago, meses FROM pagos
+            WHERE dni IN ({",".join("?" * len(dnis))})
+            ORDER BY dni, fecha_pago, id
+        ''', dnis)
+    conn.executemany('UPDATE socios SET pagado_hasta = ? WHERE dni = ?', [
+        (acumular((fecha, meses) for _, fecha, meses in filas).isoformat(), dni)
+        for dni, filas in groupby(pagos.fetchall(), key=lambda fila: fila[0])
+    ])
+
+
+def _sumar_pago(conn: sqlite3.Connection, dni: int, fecha_pago: str, meses: int) -> None:
+    """Acumula un pago recién insertado en socios.pagado_hasta. Si el socio ya
+    tiene pagos con fecha posterior (carga atrasada) se recalcula su historial."""
+    row = conn.execute('''
+        SELECT pagado_hasta, EXISTS(SELECT 1 FROM pagos WHERE dni = ? AND fecha_pago > ?)
+        FROM socios WHERE dni = ?
+    ''', (dni, fecha_pago, dni)).fetchone()
+    if row is None:
+        return
+    if row[1]:
+        _recalcular_pagado_hasta(conn, [dni])
+        return
+    conn.execute('UPDATE socios SET pagado_hasta = ? WHERE dni = ?',
+                 (acumular([(fecha_pago, meses)], desde=row[0]).isoformat(), dni))
+
+
+def _recalcular_visitas(conn: sqlite3.Connection) -> None:
+    """Recalcula ultima_visita y visitas de todos los socios desde la tabla ingresos"""
+    conn.execute('''
+        UPDATE socios SET
+            ultima_visita = (SELECT MAX(fecha) FROM ingresos i WHERE i.dni = socios.dni),
+            visitas = (SELECT COUNT(*) FROM ingresos i WHERE i.dni = socios.dni)
+    ''')
+
+
+_SQL_SUMAR_VISITA = '''
+    UPDATE socios SET ultima_visita = MAX(COALESCE(ultima_visita, ''), ?), visitas = visitas + 1
+    WHERE dni = ?
+'''
+
+# Índice de búsqueda por nombre de socio (FTS5, contenido externo en socios);
+# los triggers lo mantienen al día con altas, bajas, cambios de nombre o de DNI
+_SQL_BUSQUEDA_SOCIOS = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS socios_busqueda
+       USING fts5(nombre, content='socios', content_rowid='dni')''',
+    '''CREATE TRIGGER IF NOT EXISTS socios_busqueda_ai AFTER INSERT ON socios BEGIN
+           INSERT INTO socios_busqueda(rowid, nombre) VALUES (new.dni, new.nombre);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS socios_busqueda_ad AFTER DELETE ON socios BEGIN
+           INSERT INTO socios_busqueda(socios_busqueda, rowid, nombre) VALUES ('delete', old.dni, old.nombre);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS socios_busqueda_au AFTER UPDATE OF dni, nombre ON socios BEGIN
+           INSERT INTO socios_busqueda(socios_busqueda, rowid, nombre) VALUES ('delete', old.dni, old.nombre);
+           INSERT INTO socios_busqueda(rowid, nombre) VALUES (new.dni, new.nombre);
+       END''',
+]
+
+
+def _reconstruir_busqueda(conn: sqlite3.Connection) -> None:
+    conn.execute("INSERT INTO socios_busqueda(socios_busqueda) VALUES ('rebuild')")
+
+
+def _consulta_fts(texto: str) -> str:
+    """Texto libre -> consulta FTS5: cada palabra como prefijo ("juan"* "per"*)"""
+    return " ".join('"' + palabra.replace('"', '""') + '"*' for palabra in texto.split())
+
+
+_DIGITOS_DNI = 9
+
+
+def _rangos_dni(prefijo: str) -> List[Tuple[int, int]]:
+    """Rangos [desde, hasta) de los DNI cuyo número empieza con ``prefijo``.
+
+    Un DNI es INTEGER: en lugar de ``dni LIKE '123%'`` (que recorre toda la tabla)
+    se busca por rangos del índice, uno por cada largo posible del número.
+    """
+    if prefijo.startswith('0'):
+        return []
+    base = int(prefijo)
+    return [(base * 10 ** e, (base + 1) * 10 ** e) for e in range(_DIGITOS_DNI - len(prefijo) + 1)]
+
+
+# Columnas por las que puede ordenar consultar_pagos (nombre público -> SQL)
+_ORDEN_PAGOS = {
+    'id': 'p.id',
+    'dni': 'p.dni',
+    'nombre': 's.nombre',
+    'monto': 'p.monto',
+    'meses': 'p.meses',
+    'fecha_pago': 'p.fecha_pago',
+    'metodo_pago': 'p.metodo_pago',
+}
+
+
+@dataclass(frozen=True)
+class FiltroPagos:
+    """Criterios de consultar_pagos. Todos se resuelven en SQL (índices
+    idx_pagos_dni_fecha e idx_pagos_fecha); ``cumple`` evalúa los mismos sobre
+    un pago suelto, p. ej. uno que llega por un evento de cambio."""
+    dni: Optional[int] = None
+    desde: Optional[str] = None        # YYYY-MM-DD, inclusive
+    hasta: Optional[str] = None        # YYYY-MM-DD, inclusive
+    metodo: Optional[str] = None       # 'efectivo' | 'transferencia'
+    monto_min: Optional[float] = None
+    monto_max: Optional[float] = None
+    orden: str = 'fecha_pago'          # clave de _ORDEN_PAGOS (desempate por id)
+    descendente: bool = True
+    limite: Optional[int] = None
+
+    def __post_init__(self):
+        if self.orden not in _ORDEN_PAGOS:
+            raise ValueError(f"No se puede ordenar pagos por '{self.orden}'")
+        for fecha in (self.desde, self.hasta):
+            if fecha:
+                date.fromisoformat(fecha)  # ValueError si el formato no es YYYY-MM-DD
+
+    @property
+    def filtra(self) -> bool:
+        """True si algún criterio deja pagos afuera"""
+        return any(v is not None and v != '' for v in (self.dni, self.desde, self.hasta, self.metodo,
+                                                        self.monto_min, self.monto_max))
+
+    def sql(self) -> Tuple[str, List]:
+        condiciones, params = [], []
+        if self.dni is not None:
+            condiciones.append('p.dni = ?')
+            params.append(self.dni)
+        if self.desde:
+            condiciones.append('p.fecha_pago >= ?')
+            params.append(self.desde)
+        if self.hasta:
+            # Comparación directa sobre la columna (usa el índice, sin date())
+            condiciones.append('p.fecha_pago < ?')
+            params.append((date.fromisoformat(self.hasta) + timedelta(days=1)).isoformat())
+        if self.metodo:
+            condiciones.append('p.metodo_pago = ?')
+            params.append(self.metodo)
+        if self.monto_min is not None:
+            condiciones.append('p.monto >= ?')
+            params.append(self.monto_min)
+        if self.monto_max is not None:
+            condiciones.append('p.monto <= ?')
+            params.append(self.monto_max)
+
+        direccion = 'DESC' if self.descendente else 'ASC'
+        query = 'SELECT p.*, s.nombre FROM pagos p LEFT JOIN socios s ON p.dni = s.dni'
+        if condiciones:
+            query += ' WHERE ' + ' AND '.join(condiciones)
+        query += f' ORDER BY {_ORDEN_PAGOS[self.orden]} {direccion}, p.id {direccion}'
+        if self.limite:
+            query += ' LIMIT ?'
+            params.append(self.limite)
+        return query, params
+
+    def cumple(self, pago) -> bool:
+        fecha = pago['fecha_pago'][:10]
+        return ((self.dni is None or pago['dni'] == self.dni)
+                and (not self.desde or fecha >= self.desde)
+                and (not self.hasta or fecha <= self.hasta)
+                and (not self.metodo or pago['metodo_pago'] == self.metodo)
+                and (self.monto_min is None or pago['monto'] >= self.monto_min)
+                and (self.monto_max is None or pago['monto'] <= self.monto_max))
+
 
 class DatabaseManager:
-    def __init__(self, db_path="data/sistema_gym.db"):
+    def __init__(self, db_path=DB_PATH, auto_backup: bool = True, diario: bool = True):
+        """auto_backup=False para usos de línea de comandos que no deben dejar hilos ni copias;
+        diario=False para copias que no son la base en uso (p. ej. una recuperación)"""
         ensure_directories()
         self.db_path = db_path
+        self.eventos = EventBus()
+        self.vencimientos = CalendarioVencimientos(self)  # se arma al primer uso
+        self._rollups: Dict[str, Callable[[sqlite3.Connection], None]] = {}
         self.init_database()
+        self.registrar_rollup('estadisticas', lambda conn: conn.execute('ANALYZE'))
+        self.registrar_rollup('vencimientos', lambda conn: self.vencimientos.construir())
+        self.registrar_rollup('visitas', _recalcular_visitas)
+        self.registrar_rollup('pagado_hasta', _recalcular_pagado_hasta)
+        self.registrar_rollup('analitica', self._reconstruir_analitica)
+        self.registrar_rollup('busqueda', _reconstruir_busqueda)
+        self.registrar_rollup('kpis', lambda conn: kpi_snapshots.reconstruir(conn))
+        self.suscribir(self._invalidar_analitica, entidades=(PAGOS,))
         self.backup_manager = BackupManager(self.db_path)
-        self.backup_manager.start_auto_backup()
-        self.backup_automatico()
+        self.diario: Optional[DiarioCambios] = None
+        if diario and JOURNAL_CONFIG["activo"]:
+            self.diario = DiarioCambios(self.db_path)
+            self.suscribir(self.diario.registrar, entidades=(SOCIOS, PAGOS, GRUPOS, BASE))
+        self.mantenimiento: Optional[MaintenanceScheduler] = None
+        if auto_backup:
+            self.programar_mantenimiento().iniciar()
+            self.backup_automatico()
     
     def init_database(self):
         """Inicializa la base de datos con las tablas necesarias"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
+            # Solo tiene efecto en una base nueva; las existentes lo toman en el próximo VACUUM
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
             
             # Tabla socios
             cursor.execute('''
@@ -76,20 +309,71 @@ class DatabaseManager:
                 )
             ''')
 
+            # Analítica por mes cerrado (ver analytics.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS analitica_mensual (
+                    mes       TEXT PRIMARY KEY,
+                    datos     TEXT NOT NULL,
+                    calculado DATETIME
+                )
+            ''')
+
+            # KPIs del dashboard al cierre de cada día (ver kpi_snapshots.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS kpi_snapshots (
+                    fecha     TEXT PRIMARY KEY,
+                    datos     TEXT NOT NULL,
+                    origen    TEXT NOT NULL,
+                    calculado DATETIME
+                )
+            ''')
+
             # Índices
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_pagos_dni_fecha ON pagos(dni, fecha_pago)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_pagos_fecha ON pagos(fecha_pago)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_ingresos_fecha ON ingresos(fecha)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_logs_fecha ON logs(fecha)')
 
             # Migraciones de columnas (compatibilidad con DBs anteriores)
             for migration in [
                 'ALTER TABLE pagos ADD COLUMN meses INTEGER NOT NULL DEFAULT 1',
                 'ALTER TABLE socios ADD COLUMN grupo_id INTEGER REFERENCES grupos_familiares(id)',
+                'ALTER TABLE socios ADD COLUMN visitas INTEGER NOT NULL DEFAULT 0',
+                'ALTER TABLE ingresos ADD COLUMN repeticiones INTEGER NOT NULL DEFAULT 0',
             ]:
                 try:
                     cursor.execute(migration)
                 except sqlite3.OperationalError:
                     pass  # La columna ya existe
 
+            # Última visita por socio: se mantiene al registrar ingresos
+            try:
+                cursor.execute('ALTER TABLE socios ADD COLUMN ultima_visita DATETIME')
+                _recalcular_visitas(conn)  # primera vez: completar desde el historial
+            except sqlite3.OperationalError:
+                pass
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_socios_ultima_visita ON socios(ultima_visita)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_ingresos_dni_fecha ON ingresos(dni, fecha)')
+
+            # Vencimiento acumulado de todos los pagos: se mantiene al modificar pagos
+            try:
+                cursor.execute('ALTER TABLE socios ADD COLUMN pagado_hasta DATE')
+                _recalcular_pagado_hasta(conn)  # primera vez: completar desde el historial
+            except sqlite3.OperationalError:
+                pass
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_socios_pagado_hasta ON socios(pagado_hasta)')
+
+            # Búsqueda por nombre (FTS5); sin FTS5 las búsquedas usan LIKE
+            try:
+                nuevo = cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'socios_busqueda'").fetchone() is None
+                for sql in _SQL_BUSQUEDA_SOCIOS:
+                    cursor.execute(sql)
+                if nuevo:
+                    _reconstruir_busqueda(conn)  # primera vez: indexar los socios existentes
+            except sqlite3.OperationalError as e:
+                logging.warning(f"Índice de búsqueda no disponible (FTS5): {e}")
+
             conn.commit()
     
     def backup_automatico(self):
@@ -123,13 +407,237 @@ class DatabaseManager:
         return self.backup_manager.get_backup_list()
     
     def restore_from_backup(self, backup_filename: str) -> Dict:
-        """Restaura desde backup usando BackupManager"""
-        return self.backup_manager.restore_backup(backup_filename)
+        """Restaura desde backup usando BackupManager, con la aplicación abierta.
+
+        Antes de copiar se publica BASE/RESTAURANDO: los suscriptores directos
+        escriben lo pendiente y retienen las escrituras nuevas (servicio de
+        kiosco, anti-passback). Después se migra el esquema (el backup puede ser
+        de una versión anterior) y se publica BASE/RESTAURADA para que cachés y
+        pantallas se recarguen. El resultado incluye los segundos de cada etapa.
+        """
+        inicio = time.perf_counter()
+        self._emitir(BASE, RESTAURANDO, backup_filename)
+        tiempos = {'pausa': time.perf_counter() - inicio}
+        try:
+            resultado = self.backup_manager.restore_backup(backup_filename)
+            if resultado['success']:
+                tiempos.update(resultado['tiempos'])
+                if self.diario is not None:
+                    self.diario.marcar_base(backup_filename)
+                paso = time.perf_counter()
+                self.init_database()
+                tiempos['migracion'] = time.perf_counter() - paso
+        finally:
+            paso = time.perf_counter()
+            self._emitir(BASE, RESTAURADA, backup_filename)
+            tiempos['recarga'] = time.perf_counter() - paso
+        tiempos['total'] = time.perf_counter() - inicio
+        resultado['tiempos'] = tiempos
+        detalle = ", ".join(f"{etapa} {s:.3f}s" for etapa, s in tiempos.items())
+        if resultado['success']:
+            logging.info(f"Restauración de {backup_filename} completa: {detalle}")
+        else:
+            logging.error(f"Restauración de {backup_filename} fallida: {resultado['error']} ({detalle})")
+        return resultado
     
+    def recuperar_hasta(self, momento: str, aplicar: bool = False) -> Dict:
+        """Reconstruye la base como estaba en ``momento`` (último backup anterior +
+        diario de cambios) y la guarda como un backup más; con ``aplicar`` además
+        la restaura sobre la base en uso (ver restore_from_backup)"""
+        try:
+            if self.diario is None:
+                raise ValueError("El diario de cambios está desactivado (JOURNAL_CONFIG)")
+            self.diario.vaciar()  # hasta el último cambio confirmado
+            inicio = time.perf_counter()
+            cuando = leer_momento(momento)
+            backup_filename = f"sistema_recuperada_{cuando:%Y%m%d_%H%M%S}.db"
+            n = 1
+            while self.backup_manager.ruta_backup(backup_filename) is not None:
+                n += 1  # el mismo momento ya se recuperó: no pisar esa copia
+                backup_filename = f"sistema_recuperada_{cuando:%Y%m%d_%H%M%S}_{n}.db"
+            destino = self.backup_manager.backup_path / backup_filename
+            detalle = self.diario.reconstruir(self.backup_manager, cuando, destino)
+            self.backup_manager.registrar_archivo(
+                backup_filename, f"Recuperación al {cuando:%Y-%m-%d %H:%M:%S}",
+                recuperado_al=cuando.isoformat(), base=detalle['base'])
+            resultado = {"success": True, "filename": backup_filename, **detalle,
+                         "segundos": time.perf_counter() - inicio}
+            logging.info(f"Base recuperada al {cuando}: {backup_filename} "
+                         f"({detalle['base']} + {detalle['cambios']} cambios, {resultado['segundos']:.2f}s)")
+        except Exception as e:
+            logging.error(f"Error recuperando la base al {momento}: {e}")
+            return {"success": False, "error": str(e)}
+        if aplicar:
+            resultado['restauracion'] = self.restore_from_backup(backup_filename)
+            resultado['success'] = resultado['restauracion']['success']
+        return resultado
+
     def stop_auto_backup(self):
-        """Detiene el sistema de backup automático"""
-        if hasattr(self, 'backup_manager'):
-            self.backup_manager.stop_auto_backup_system()
+        """Detiene las tareas de mantenimiento (incluido el backup automático)"""
+        if self.mantenimiento is not None:
+            self.mantenimiento.detener()
+
+    # MANTENIMIENTO
+    def programar_mantenimiento(self) -> MaintenanceScheduler:
+        """Arma el planificador con las tareas de MANTENIMIENTO_CONFIG (una vez), sin arrancar su hilo"""
+        if self.mantenimiento is not None:
+            return self.mantenimiento
+        tareas = {
+            'backup': self._backup_programado,
+            'analyze': self.analizar,
+            'optimize': self.optimizar,
+            'incremental': self.vacuum_incremental,
+            'quick_check': self.verificar_integridad,
+            'archivo': self.backup_manager.archivar,
+            'rollups': lambda: self.reconstruir_rollups(['pagado_hasta', 'visitas', 'analitica', 'busqueda']),
+            'vacuum': self.vacuum,
+            'kpis': self.capturar_kpis,
+        }
+        planificador = MaintenanceScheduler(os.path.join(os.path.dirname(self.db_path) or '.', 'mantenimiento.json'))
+        for nombre, reglas in MANTENIMIENTO_CONFIG["tareas"].items():
+            planificador.agregar(nombre, tareas[nombre], **reglas)
+        self.suscribir(planificador.contar_escritura, entidades=(SOCIOS, PAGOS, GRUPOS))
+        self.suscribir(planificador.registrar_actividad)
+        self.mantenimiento = planificador
+        return planificador
+
+    def _backup_programado(self) -> Dict:
+        resultado = self.backup_manager.create_backup("Backup automático")
+        if not resultado["success"]:
+            raise RuntimeError(resultado["error"])
+        logging.info(f"Backup automático creado: {resultado['filename']}")
+        return resultado
+
+    def capturar_kpis(self) -> Dict:
+        """Guarda los KPIs de hoy en kpi_snapshots y reconstruye los días que falten"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            kpis = DashboardManager(self.db_path, self.vencimientos)._get_kpis(conn)
+            resultado = kpi_snapshots.completar(conn, date.today(), kpis)
+            conn.commit()
+        return resultado
+
+    def _conectar_autocommit(self) -> sqlite3.Connection:
+        # Sin transacción implícita: VACUUM y cada tramo confirman por su cuenta
+        return sqlite3.connect(self.db_path, isolation_level=None)
+
+    def _tablas(self, conn: sqlite3.Connection) -> List[str]:
+        """Tablas comunes (las virtuales de FTS no se analizan ni verifican por separado)"""
+        return [fila[0] for fila in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+            "AND sql NOT LIKE 'CREATE VIRTUAL TABLE%' ORDER BY name")]
+
+    def vacuum(self) -> Dict[str, int]:
+        """Compacta el archivo de la base; retorna el tamaño antes y después.
+        Una base creada antes de auto_vacuum=INCREMENTAL pasa a tenerlo aquí."""
+        antes = os.path.getsize(self.db_path)
+        conn = self._conectar_autocommit()
+        try:
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+        finally:
+            conn.close()
+        return {'antes': antes, 'despues': os.path.getsize(self.db_path)}
+
+    def vacuum_incremental(self) -> Generator[Dict, None, Dict]:
+        """Devuelve al sistema las páginas libres, de a ``paginas_por_tramo`` por tramo"""
+        paginas = MANTENIMIENTO_CONFIG["paginas_por_tramo"]
+        liberadas = 0
+        while True:
+            conn = self._conectar_autocommit()
+            try:
+                if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                    return {'auto_vacuum': False, 'libres': conn.execute('PRAGMA freelist_count').fetchone()[0]}
+                libres = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                if libres == 0:
+                    return {'liberadas': liberadas, 'libres': 0}
+                # No devuelve columnas: execute() daría un solo paso (una página); executescript la completa
+                conn.executescript(f'PRAGMA incremental_vacuum({paginas});')
+                quedan = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            finally:
+                conn.close()
+            liberadas += libres - quedan
+            yield {'liberadas': liberadas, 'libres': quedan}
+
+    def analizar(self) -> Generator[Dict, None, None]:
+        """ANALYZE de a una tabla por tramo"""
+        with sqlite3.connect(self.db_path) as conn:
+            tablas = self._tablas(conn)
+        for i, tabla in enumerate(tablas, 1):
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute(f'ANALYZE "{tabla}"')
+                conn.commit()
+            yield {'tablas': i, 'total': len(tablas)}
+
+    def optimizar(self) -> Dict[str, int]:
+        """PRAGMA optimize: SQLite decide qué estadísticas vale la pena actualizar"""
+        conn = self._conectar_autocommit()
+        try:
+            conn.execute('PRAGMA optimize')
+        finally:
+            conn.close()
+        return {}
+
+    def verificar_integridad(self) -> Generator[Dict, None, None]:
+        """PRAGMA quick_check de a una tabla (con sus índices) por tramo"""
+        with sqlite3.connect(self.db_path) as conn:
+            tablas = self._tablas(conn)
+        errores: List[str] = []
+        for i, tabla in enumerate(tablas, 1):
+            with sqlite3.connect(self.db_path) as conn:
+                filas = [fila[0] for fila in conn.execute(f'PRAGMA quick_check("{tabla}")')]
+            if filas != ['ok']:
+                logging.error(f"quick_check {tabla}: {'; '.join(filas[:5])}")
+                errores.extend(f"{tabla}: {fila}" for fila in filas[:5])
+            yield {'tablas': i, 'total': len(tablas), 'errores': errores[:20]}
+
+    def diagnostico(self) -> Dict:
+        """Tamaño, páginas libres y estado de las tareas de mantenimiento (panel de diagnóstico)"""
+        with sqlite3.connect(self.db_path) as conn:
+            pragma = {nombre: conn.execute(f'PRAGMA {nombre}').fetchone()[0]
+                      for nombre in ('page_size', 'page_count', 'freelist_count', 'auto_vacuum')}
+        return {
+            'tamano': os.path.getsize(self.db_path),
+            'paginas': pragma['page_count'],
+            'libres': pragma['freelist_count'],
+            'bytes_libres': pragma['freelist_count'] * pragma['page_size'],
+            'auto_vacuum': {0: 'ninguno', 1: 'completo', 2: 'incremental'}[pragma['auto_vacuum']],
+            'tareas': self.programar_mantenimiento().resumen(),
+        }
+
+    # ROLLUPS (datos derivados que se pueden reconstruir desde las tablas base)
+    def registrar_rollup(self, nombre: str, reconstruir: Callable[[sqlite3.Connection], None]) -> None:
+        """Registra una función que recalcula por completo un dato derivado"""
+        self._rollups[nombre] = reconstruir
+
+    def listar_rollups(self) -> List[str]:
+        return list(self._rollups)
+
+    def reconstruir_rollups(self, nombres: Optional[List[str]] = None) -> Dict[str, float]:
+        """Reconstruye los rollups indicados (todos por defecto), cada uno en su transacción.
+        Retorna los segundos que tardó cada uno."""
+        tiempos = {}
+        for nombre in nombres or list(self._rollups):
+            if nombre not in self._rollups:
+                raise ValueError(f"Rollup desconocido: {nombre}")
+            inicio = time.perf_counter()
+            with sqlite3.connect(self.db_path) as conn:
+                self._rollups[nombre](conn)
+                conn.commit()
+            tiempos[nombre] = time.perf_counter() - inicio
+            logging.info(f"Rollup reconstruido: {nombre} ({tiempos[nombre]:.3f}s)")
+        return tiempos
+
+    # EVENTOS DE CAMBIO
+    def suscribir(self, callback: Callable[[CambioDatos], None], entidades=None) -> None:
+        """Registra un callback que recibe un CambioDatos por cada fila modificada"""
+        self.eventos.suscribir(callback, entidades)
+
+    def desuscribir(self, callback: Callable[[CambioDatos], None]) -> None:
+        self.eventos.desuscribir(callback)
+
+    def _emitir(self, entidad: str, accion: str, clave, **extra) -> None:
+        self.eventos.publicar(CambioDatos(entidad, accion, clave, **extra))
 
     # SOCIOS
     def agregar_socio(self, dni: int, nombre: str, email: Optional[str], telefono: Optional[str], fecha_alta: str) -> None:
@@ -142,6 +650,7 @@ class DatabaseManager:
             ''', (dni, nombre, email, telefono, fecha_alta))
             conn.commit()
             logging.info(f"Socio agregado: DNI {dni}, {nombre}")
+        self._emitir(SOCIOS, INSERT, dni, fechas=(fecha_alta[:10],) if fecha_alta else ())
     
     def editar_socio(self, dni: int, nombre: str, email: Optional[str], telefono: Optional[str]) -> None:
         """Edita un socio existente"""
@@ -153,15 +662,26 @@ class DatabaseManager:
             ''', (nombre, email, telefono, dni))
             conn.commit()
             logging.info(f"Socio editado: DNI {dni}")
+        self._emitir(SOCIOS, UPDATE, dni)
     
     def eliminar_socio_y_pagos(self, dni: int) -> None:
         """Elimina un socio y todos sus pagos"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
+            cursor.execute('SELECT id, fecha_pago FROM pagos WHERE dni=?', (dni,))
+            pagos = cursor.fetchall()
+            cursor.execute('SELECT grupo_id FROM socios WHERE dni=?', (dni,))
+            row = cursor.fetchone()
+            grupo_id = row[0] if row else None
             cursor.execute('DELETE FROM pagos WHERE dni=?', (dni,))
             cursor.execute('DELETE FROM socios WHERE dni=?', (dni,))
             conn.commit()
             logging.info(f"Socio eliminado: DNI {dni}")
+        for pago_id, fecha_pago in pagos:
+            self._emitir(PAGOS, DELETE, pago_id, dni=dni, fechas=(fecha_pago,))
+        self._emitir(SOCIOS, DELETE, dni)
+        if grupo_id is not None:
+            self._emitir(GRUPOS, UPDATE, grupo_id)
     
     def cambiar_dni_socio(self, dni_actual: int, nuevo_dni: int) -> None:
         """Cambia el DNI de un socio y actualiza referencias en pagos/ingresos.
@@ -180,6 +700,9 @@ class DatabaseManager:
             if cursor.fetchone() is not None:
                 raise ValueError(f"Ya existe un socio con DNI {nuevo_dni}")
 
+            cursor.execute('SELECT id, fecha_pago FROM pagos WHERE dni=?', (dni_actual,))
+            pagos = cursor.fetchall()
+
             try:
                 cursor.execute('BEGIN')
                 # Actualizar pagos e ingresos primero (no hay FK ON UPDATE)
@@ -193,6 +716,9 @@ class DatabaseManager:
                 conn.rollback()
                 logging.error(f"Error cambiando DNI {dni_actual} -> {nuevo_dni}: {e}")
                 raise
+        self._emitir(SOCIOS, UPDATE, nuevo_dni, clave_anterior=dni_actual)
+        for pago_id, fecha_pago in pagos:
+            self._emitir(PAGOS, UPDATE, pago_id, dni=nuevo_dni, fechas=(fecha_pago,))
     
     def obtener_socio(self, dni: int) -> Optional[Dict]:
         """Obtiene un socio por DNI"""
@@ -232,9 +758,26 @@ class DatabaseManager:
                 INSERT INTO pagos (dni, monto, fecha_pago, metodo_pago, meses)
                 VALUES (?, ?, ?, ?, ?)
             ''', (dni, monto, fecha_pago, metodo, meses))
+            pago_id = cursor.lastrowid
+            _sumar_pago(conn, dni, fecha_pago, meses)
             conn.commit()
             logging.info(f"Pago registrado: DNI {dni}, ${monto}, {meses} mes(es), {metodo}")
+        self._emitir(PAGOS, INSERT, pago_id, dni=dni, fechas=(fecha_pago,))
     
+    def obtener_pago_con_socio(self, pago_id: int) -> Optional[Dict]:
+        """Obtiene un pago por ID junto con el nombre del socio"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT p.*, s.nombre
+                FROM pagos p
+                LEFT JOIN socios s ON p.dni = s.dni
+                WHERE p.id = ?
+            ''', (pago_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
     def obtener_pago(self, pago_id: int) -> Optional[Dict]:
         """Obtiene un pago por ID"""
         with sqlite3.connect(self.db_path) as conn:
@@ -252,6 +795,9 @@ class DatabaseManager:
             cursor.execute('SELECT 1 FROM socios WHERE dni=?', (dni,))
             if cursor.fetchone() is None:
                 raise ValueError(f"No existe socio con DNI {dni}")
+            cursor.execute('SELECT dni, fecha_pago FROM pagos WHERE id=?', (pago_id,))
+            row = cursor.fetchone()
+            dni_anterior, fecha_anterior = row if row else (None, None)
             cursor.execute('''
                 UPDATE pagos
                 SET dni = ?, monto = ?, fecha_pago = ?, metodo_pago = ?, meses = ?
@@ -259,18 +805,27 @@ class DatabaseManager:
             ''', (dni, monto, fecha_pago, metodo, meses, pago_id))
             if cursor.rowcount == 0:
                 raise ValueError(f"Pago id {pago_id} no encontrado")
+            _recalcular_pagado_hasta(conn, {dni, dni_anterior} - {None})
             conn.commit()
             logging.info(f"Pago editado: ID {pago_id} (DNI {dni}, ${monto}, {meses} mes(es), {metodo})")
+        self._emitir(PAGOS, UPDATE, pago_id, dni=dni,
+                     clave_anterior=dni_anterior if dni_anterior != dni else None,
+                     fechas=tuple(sorted({fecha_pago, fecha_anterior} - {None})))
 
     def eliminar_pago(self, pago_id: int) -> None:
         """Elimina un pago por ID"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
+            cursor.execute('SELECT dni, fecha_pago FROM pagos WHERE id = ?', (pago_id,))
+            row = cursor.fetchone()
             cursor.execute('DELETE FROM pagos WHERE id = ?', (pago_id,))
             if cursor.rowcount == 0:
                 raise ValueError(f"Pago id {pago_id} no encontrado")
+            _recalcular_pagado_hasta(conn, [row[0]])
             conn.commit()
             logging.info(f"Pago eliminado: ID {pago_id}")
+        self._emitir(PAGOS, DELETE, pago_id, dni=row[0] if row else None,
+                     fechas=(row[1],) if row else ())
     
     def obtener_pagos_por_dni(self, dni: int) -> List[Dict]:
         """Obtiene todos los pagos de un socio"""
@@ -291,115 +846,191 @@ class DatabaseManager:
                 SELECT * FROM pagos ORDER BY fecha_pago DESC
             ''')
             return [dict(row) for row in cursor.fetchall()]
-    
+
+    def registros_pagos(self, dni: Optional[int] = None) -> Iterator[tuple]:
+        """Pagos (de un socio o todos) por fecha descendente, como registros compactos"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            if dni is None:
+                cursor = conn.execute('SELECT * FROM pagos ORDER BY fecha_pago DESC')
+            else:
+                cursor = conn.execute('SELECT * FROM pagos WHERE dni=? ORDER BY fecha_pago DESC', (dni,))
+            yield from iterar(cursor)
+        finally:
+            conn.close()
+
+    def consultar_pagos(self, filtro: Optional[FiltroPagos] = None, **criterios) -> Iterator[tuple]:
+        """Pagos con el nombre del socio, filtrados y ordenados en SQL.
+
+        Recibe un ``FiltroPagos`` o sus campos sueltos:
+        ``consultar_pagos(dni=..., desde='2024-01-01', orden='monto', limite=50)``.
+        """
+        filtro = filtro or FiltroPagos(**criterios)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield from iterar(conn.execute(*filtro.sql()))
+        finally:
+            conn.close()
+
     # LISTADOS Y ESTADOS
     def socios_con_estado(self) -> List[Dict]:
         """Obtiene todos los socios con su estado calculado usando la duración real de cada pago"""
         with sqlite3.connect(self.db_path) as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT s.dni, s.nombre, s.email, s.telefono, s.fecha_alta,
-                       s.grupo_id,
-                       g.nombre AS grupo_nombre,
-                       p.fecha_pago AS ultimo_pago,
-                       COALESCE(p.meses, 1) AS meses_ultimo_pago,
-                       CASE
-                           WHEN p.fecha_pago IS NULL THEN 'Vencido'
-                           WHEN date(p.fecha_pago, '+' || (COALESCE(p.meses, 1) * 30) || ' days') >= date('now') THEN 'Activo'
-                           ELSE 'Vencido'
-                       END AS estado,
-                       CASE
-                           WHEN p.fecha_pago IS NOT NULL
-                           THEN date(p.fecha_pago, '+' || (COALESCE(p.meses, 1) * 30) || ' days')
-                           ELSE NULL
-                       END AS fecha_vencimiento
-                FROM socios s
-                LEFT JOIN grupos_familiares g ON s.grupo_id = g.id
-                LEFT JOIN pagos p ON p.id = (
-                    SELECT id FROM pagos p2
-                    WHERE p2.dni = s.dni
-                    ORDER BY fecha_pago DESC
-                    LIMIT 1
-                )
-                ORDER BY s.nombre
-            ''')
+            cursor.execute(_SQL_SOCIOS_CON_ESTADO + ' ORDER BY s.nombre', _params_estado())
             return [dict(row) for row in cursor.fetchall()]
-    
+
+    def registros_socios_con_estado(self) -> Iterator[tuple]:
+        """Como socios_con_estado, pero como registros compactos leídos a demanda (rows.py)"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield from iterar(conn.execute(_SQL_SOCIOS_CON_ESTADO + ' ORDER BY s.nombre', _params_estado()))
+        finally:
+            conn.close()
+
+    def socio_con_estado(self, dni: int) -> Optional[Dict]:
+        """Igual que socios_con_estado pero para un único socio"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute(_SQL_SOCIOS_CON_ESTADO + ' WHERE s.dni = :dni', _params_estado(dni=dni))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
     def socios_vencidos(self) -> List[Dict]:
         """Obtiene solo los socios vencidos"""
-        socios = self.socios_con_estado()
-        return [s for s in socios if s['estado'] == 'Vencido']
+        return [dict(s) for s in self.registros_socios_con_estado() if s.estado == 'Vencido']
     
     def consultar_estado_socio(self, dni: int) -> Dict:
         """Consulta el estado de un socio específico para el kiosco"""
-        socio = self.obtener_socio(dni)
-        if not socio:
-            return {
-                'estado': 'No registrado',
-                'nombre': None,
-                'fecha_vencimiento': None
-            }
-        
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT fecha_pago, COALESCE(meses, 1) as meses
-                FROM pagos WHERE dni=?
-                ORDER BY fecha_pago DESC LIMIT 1
-            ''', (dni,))
-            result = cursor.fetchone()
-
-            if result and result[0]:
-                ultimo_pago, meses = result
-                dias = meses * 30
-                fecha_vencimiento = datetime.strptime(ultimo_pago, '%Y-%m-%d') + timedelta(days=dias)
-                estado = 'Activo' if fecha_vencimiento >= datetime.now() else 'Vencido'
-                return {
-                    'estado': estado,
-                    'nombre': socio['nombre'],
-                    'fecha_vencimiento': fecha_vencimiento.strftime('%Y-%m-%d')
-                }
-            else:
-                return {
-                    'estado': 'Vencido',
-                    'nombre': socio['nombre'],
-                    'fecha_vencimiento': None
-                }
+            cursor.execute('SELECT nombre, pagado_hasta FROM socios WHERE dni=?', (dni,))
+            row = cursor.fetchone()
+        if not row:
+            return estado_kiosco(None, None, registrado=False)
+        return estado_kiosco(row[0], date.fromisoformat(row[1]) if row[1] else None)
     
     # INGRESOS
     def registrar_ingreso(self, dni: Optional[int], nombre: Optional[str], estado: str) -> None:
         """Registra una consulta de ingreso"""
+        ahora = datetime.now()
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO ingresos (dni, nombre, estado, fecha)
                 VALUES (?, ?, ?, ?)
-            ''', (dni, nombre, estado, datetime.now().isoformat()))
+            ''', (dni, nombre, estado, ahora.isoformat()))
+            ingreso_id = cursor.lastrowid
+            if dni is not None:
+                cursor.execute(_SQL_SUMAR_VISITA, (ahora.isoformat(), dni))
             conn.commit()
+        self._emitir(INGRESOS, INSERT, ingreso_id, dni=dni, fechas=(ahora.strftime('%Y-%m-%d'),))
     
+    def registrar_ingresos_lote(self, filas: List[Tuple[Optional[int], Optional[str], str, str]]) -> List[int]:
+        """Registra varias consultas (dni, nombre, estado, fecha ISO) en una sola transacción"""
+        if not filas:
+            return []
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM ingresos')
+            ultimo_id = cursor.fetchone()[0]
+            cursor.executemany('''
+                INSERT INTO ingresos (dni, nombre, estado, fecha)
+                VALUES (?, ?, ?, ?)
+            ''', filas)
+            cursor.executemany(_SQL_SUMAR_VISITA,
+                               [(fecha, dni) for dni, _, _, fecha in filas if dni is not None])
+            cursor.execute('SELECT id FROM ingresos WHERE id > ? ORDER BY id', (ultimo_id,))
+            ids = [r[0] for r in cursor.fetchall()]
+            conn.commit()
+        for ingreso_id, (dni, _, _, fecha) in zip(ids, filas):
+            self._emitir(INGRESOS, INSERT, ingreso_id, dni=dni, fechas=(fecha[:10],))
+        return ids
+
+    def registrar_repeticiones(self, conteos: Dict[int, int]) -> None:
+        """Suma pasadas repetidas (anti-passback, ver checkin_guard.py) al último
+        ingreso de cada DNI, sin crear filas ni contar visitas"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany('''
+                UPDATE ingresos SET repeticiones = repeticiones + ?
+                WHERE id = (SELECT MAX(id) FROM ingresos WHERE dni = ?)
+            ''', [(n, dni) for dni, n in conteos.items()])
+            conn.commit()
+
+    @staticmethod
+    def _consulta_ingresos(desde: Optional[str], hasta: Optional[str], filtro: Optional[str],
+                           formatear: bool = False, fts: bool = True) -> Tuple[str, List]:
+        """Consulta de ingresos. Todos los filtros usan índices:
+
+        - desde/hasta (YYYY-MM-DD): rango directo sobre ``fecha`` (idx_ingresos_fecha).
+        - filtro numérico: DNI exacto o por prefijo (rangos en idx_ingresos_dni_fecha).
+        - filtro con texto: socios cuyo nombre contiene esas palabras (socios_busqueda);
+          con ``fts=False``, LIKE sobre el nombre guardado en el ingreso.
+
+        ``formatear`` agrega ``fecha_hora`` ('YYYY-MM-DD HH:MM:SS') armada en SQL.
+        """
+        columnas = "i.*, replace(substr(i.fecha, 1, 19), 'T', ' ') AS fecha_hora" if formatear else 'i.*'
+        condiciones, params = [], []
+
+        if desde:
+            condiciones.append('i.fecha >= ?')
+            params.append(desde)
+        if hasta:
+            condiciones.append('i.fecha < ?')
+            params.append((date.fromisoformat(hasta) + timedelta(days=1)).isoformat())
+        filtro = (filtro or '').strip()
+        if filtro.isdigit():
+            rangos = _rangos_dni(filtro)
+            if rangos:
+                condiciones.append('(' + ' OR '.join(['(i.dni >= ? AND i.dni < ?)'] * len(rangos)) + ')')
+                params.extend(v for rango in rangos for v in rango)
+            else:
+                condiciones.append('0')
+        elif filtro:
+            if fts:
+                condiciones.append('i.dni IN (SELECT rowid FROM socios_busqueda WHERE socios_busqueda MATCH ?)')
+                params.append(_consulta_fts(filtro))
+            else:
+                condiciones.append('i.nombre LIKE ?')
+                params.append(f'%{filtro}%')
+
+        query = f'SELECT {columnas} FROM ingresos i'
+        if condiciones:
+            query += ' WHERE ' + ' AND '.join(condiciones)
+        # Con DNI o nombre conviene buscar por el índice de dni y ordenar las pocas filas
+        # halladas; el "+" evita que SQLite prefiera recorrer todo idx_ingresos_fecha
+        # solo para no ordenar
+        return query + (' ORDER BY +i.fecha DESC' if filtro else ' ORDER BY i.fecha DESC'), params
+
+    def _ejecutar_ingresos(self, conn: sqlite3.Connection, *args, **kwargs) -> sqlite3.Cursor:
+        try:
+            return conn.execute(*self._consulta_ingresos(*args, **kwargs))
+        except sqlite3.OperationalError as e:
+            # Sin socios_busqueda (p. ej. SQLite sin FTS5 o base restaurada de un backup viejo)
+            if 'socios_busqueda' not in str(e) and 'fts5' not in str(e):
+                raise
+            logging.warning(f"Búsqueda de ingresos sin índice de nombres: {e}")
+            return conn.execute(*self._consulta_ingresos(*args, fts=False, **kwargs))
+
     def listar_ingresos(self, desde: Optional[str] = None, hasta: Optional[str] = None, filtro: Optional[str] = None) -> List[Dict]:
         """Lista los ingresos con filtros opcionales"""
         with sqlite3.connect(self.db_path) as conn:
             conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            query = 'SELECT * FROM ingresos WHERE 1=1'
-            params = []
-            
-            if desde:
-                query += ' AND date(fecha) >= ?'
-                params.append(desde)
-            if hasta:
-                query += ' AND date(fecha) <= ?'
-                params.append(hasta)
-            if filtro:
-                query += ' AND (dni LIKE ? OR nombre LIKE ?)'
-                params.extend([f'%{filtro}%', f'%{filtro}%'])
-            
-            query += ' ORDER BY fecha DESC'
-            cursor.execute(query, params)
+            cursor = self._ejecutar_ingresos(conn, desde, hasta, filtro)
             return [dict(row) for row in cursor.fetchall()]
+
+    def registros_ingresos(self, desde: Optional[str] = None, hasta: Optional[str] = None,
+                           filtro: Optional[str] = None) -> Iterator[tuple]:
+        """Como listar_ingresos, pero como registros compactos leídos a demanda
+        y con ``fecha_hora`` ya formateada para mostrar"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield from iterar(self._ejecutar_ingresos(conn, desde, hasta, filtro, formatear=True))
+        finally:
+            conn.close()
     
     # KPIS Y MÉTRICAS
     def kpis_basicos(self) -> Dict:
@@ -412,9 +1043,9 @@ class DatabaseManager:
             total_socios = cursor.fetchone()[0]
             
             # Socios activos y vencidos
-            socios = self.socios_con_estado()
-            activos = len([s for s in socios if s['estado'] == 'Activo'])
-            vencidos = len([s for s in socios if s['estado'] == 'Vencido'])
+            cursor.execute('SELECT COUNT(*) FROM socios WHERE pagado_hasta >= ?', (vigente_desde().isoformat(),))
+            activos = cursor.fetchone()[0]
+            vencidos = total_socios - activos
             
             # Pagos del mes
             cursor.execute('''
@@ -433,11 +1064,7 @@ class DatabaseManager:
             consultas_mes = cursor.fetchone()[0]
             
             # Próximos vencimientos
-            proximos_vencimientos = len([
-                s for s in socios 
-                if s['estado'] == 'Activo' and s['fecha_vencimiento'] and
-                datetime.strptime(s['fecha_vencimiento'], '%Y-%m-%d') <= datetime.now() + timedelta(days=7)
-            ])
+            proximos_vencimientos = self.vencimientos.contar_proximos(7)
             
             return {
                 'total_socios': total_socios,
@@ -449,45 +1076,40 @@ class DatabaseManager:
                 'proximos_vencimientos': proximos_vencimientos
             }
     
+    def analitica(self, desde: Optional[str] = None, hasta: Optional[str] = None) -> Dict:
+        """Retención por cohortes, churn, pagos en fecha y LTV (ver analytics.py)"""
+        from .analytics import AnalyticsEngine  # diferido: usa pandas/numpy
+        return AnalyticsEngine(self.db_path).resumen(desde, hasta)
+
     def metricas_avanzadas(self, desde: Optional[str] = None, hasta: Optional[str] = None) -> Dict:
         """Calcula métricas avanzadas"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Permanencia promedio (meses)
-            cursor.execute('''
-                SELECT AVG(
-                    CASE 
-                        WHEN MAX(fecha_pago) IS NOT NULL AND MIN(fecha_pago) IS NOT NULL
-                        THEN (julianday(MAX(fecha_pago)) - julianday(MIN(fecha_pago))) / 30.0
-                        ELSE 0
-                    END
-                ) as permanencia_promedio
-                FROM pagos
-                GROUP BY dni
-            ''')
-            result = cursor.fetchone()
-            permanencia_promedio = result[0] if result and result[0] else 0
-            
-            # Porcentaje de pagos en fecha (simplificado)
-            cursor.execute('''
-                SELECT COUNT(*) as total_pagos
-                FROM pagos
-            ''')
-            total_pagos = cursor.fetchone()[0]
-            
-            # Para simplificar, asumimos que todos los pagos son "en fecha"
-            porcentaje_pagos_en_fecha = 100.0 if total_pagos > 0 else 0
-            
-            return {
-                'permanencia_promedio_meses': round(permanencia_promedio, 2),
-                'churn_mensual': 0,  # Simplificado para MVP
-                'porcentaje_pagos_en_fecha': porcentaje_pagos_en_fecha
-            }
+        analitica = self.analitica(desde, hasta)
+        return {
+            'permanencia_promedio_meses': analitica['permanencia_promedio_meses'],
+            'churn_mensual': analitica['churn_mensual'],
+            'porcentaje_pagos_en_fecha': analitica['porcentaje_pagos_en_fecha'],
+            'ltv': analitica['ltv'],
+        }
+
+    def _invalidar_analitica(self, evento: CambioDatos) -> None:
+        """Un pago con fecha de un mes cerrado invalida ese mes y los siguientes"""
+        if not evento.fechas:
+            return
+        mes = min(evento.fechas)[:7]
+        if mes < datetime.now().strftime('%Y-%m'):
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute('DELETE FROM analitica_mensual WHERE mes >= ?', (mes,))
+                conn.commit()
+
+    def _reconstruir_analitica(self, conn: sqlite3.Connection) -> None:
+        from .analytics import AnalyticsEngine
+        conn.execute('DELETE FROM analitica_mensual')
+        AnalyticsEngine(self.db_path).meses(conn)
     
     # EXPORT/IMPORT
     def exportar_socios_excel(self, path_xlsx: str) -> None:
         """Exporta socios a Excel"""
+        import pandas as pd  # diferido: el kiosco y la CLI no necesitan pandas
         socios = self.socios_con_estado()
         df = pd.DataFrame(socios)
         df.to_excel(path_xlsx, index=False, sheet_name='Socios')
@@ -495,6 +1117,7 @@ class DatabaseManager:
     
     def exportar_pagos_excel(self, path_xlsx: str, rango: Optional[Tuple[str, str]] = None) -> None:
         """Exporta pagos a Excel"""
+        import pandas as pd
         with sqlite3.connect(self.db_path) as conn:
             query = '''
                 SELECT p.*, s.nombre
@@ -514,6 +1137,7 @@ class DatabaseManager:
     
     def exportar_ingresos_excel(self, path_xlsx: str, rango: Optional[Tuple[str, str]] = None) -> None:
         """Exporta ingresos a Excel"""
+        import pandas as pd
         ingresos = self.listar_ingresos(
             desde=rango[0] if rango else None,
             hasta=rango[1] if rango else None
@@ -524,6 +1148,7 @@ class DatabaseManager:
     
     def importar_pagos_excel(self, path_xlsx: str) -> Dict:
         """Importa pagos desde Excel"""
+        import pandas as pd
         try:
             df = pd.read_excel(path_xlsx)
             errores = []
@@ -586,7 +1211,8 @@ class DatabaseManager:
             conn.commit()
             grupo_id = cursor.lastrowid
             logging.info(f"Grupo creado: ID {grupo_id}, '{nombre}'")
-            return grupo_id
+        self._emitir(GRUPOS, INSERT, grupo_id)
+        return grupo_id
 
     def editar_grupo(self, grupo_id: int, nombre: str, precio_especial: Optional[float] = None) -> None:
         """Edita un grupo familiar existente"""
@@ -599,15 +1225,26 @@ class DatabaseManager:
                 raise ValueError(f"Grupo ID {grupo_id} no encontrado")
             conn.commit()
             logging.info(f"Grupo editado: ID {grupo_id}")
+            cursor.execute('SELECT dni FROM socios WHERE grupo_id=?', (grupo_id,))
+            miembros = [r[0] for r in cursor.fetchall()]
+        self._emitir(GRUPOS, UPDATE, grupo_id)
+        # El nombre del grupo se muestra en la fila de cada miembro
+        for dni in miembros:
+            self._emitir(SOCIOS, UPDATE, dni)
 
     def eliminar_grupo(self, grupo_id: int) -> None:
         """Elimina un grupo y desvincula a sus miembros (no los elimina)"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
+            cursor.execute('SELECT dni FROM socios WHERE grupo_id=?', (grupo_id,))
+            miembros = [r[0] for r in cursor.fetchall()]
             cursor.execute('UPDATE socios SET grupo_id=NULL WHERE grupo_id=?', (grupo_id,))
             cursor.execute('DELETE FROM grupos_familiares WHERE id=?', (grupo_id,))
             conn.commit()
             logging.info(f"Grupo eliminado: ID {grupo_id}")
+        for dni in miembros:
+            self._emitir(SOCIOS, UPDATE, dni)
+        self._emitir(GRUPOS, DELETE, grupo_id)
 
     def obtener_grupo(self, grupo_id: int) -> Optional[Dict]:
         """Obtiene un grupo por ID"""
@@ -618,6 +1255,22 @@ class DatabaseManager:
             row = cursor.fetchone()
             return dict(row) if row else None
 
+    def obtener_grupo_resumen(self, grupo_id: int) -> Optional[Dict]:
+        """Obtiene un grupo con el conteo de miembros (misma forma que listar_grupos)"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT g.id, g.nombre, g.precio_especial, g.fecha_alta,
+                       COUNT(s.dni) AS cantidad_miembros
+                FROM grupos_familiares g
+                LEFT JOIN socios s ON s.grupo_id = g.id
+                WHERE g.id = ?
+                GROUP BY g.id
+            ''', (grupo_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
     def listar_grupos(self) -> List[Dict]:
         """Lista todos los grupos con el conteo de miembros"""
         with sqlite3.connect(self.db_path) as conn:
@@ -648,26 +1301,125 @@ class DatabaseManager:
         """Asigna un socio a un grupo familiar"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
+            cursor.execute('SELECT grupo_id FROM socios WHERE dni=?', (dni,))
+            row = cursor.fetchone()
+            grupo_anterior = row[0] if row else None
             cursor.execute('UPDATE socios SET grupo_id=? WHERE dni=?', (grupo_id, dni))
             conn.commit()
             logging.info(f"Socio DNI {dni} asignado al grupo {grupo_id}")
+        self._emitir(SOCIOS, UPDATE, dni)
+        self._emitir(GRUPOS, UPDATE, grupo_id)
+        if grupo_anterior is not None and grupo_anterior != grupo_id:
+            self._emitir(GRUPOS, UPDATE, grupo_anterior)
 
     def remover_socio_de_grupo(self, dni: int) -> None:
         """Remueve un socio de su grupo familiar"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
+            cursor.execute('SELECT grupo_id FROM socios WHERE dni=?', (dni,))
+            row = cursor.fetchone()
+            grupo_anterior = row[0] if row else None
             cursor.execute('UPDATE socios SET grupo_id=NULL WHERE dni=?', (dni,))
             conn.commit()
             logging.info(f"Socio DNI {dni} removido de su grupo")
+        self._emitir(SOCIOS, UPDATE, dni)
+        if grupo_anterior is not None:
+            self._emitir(GRUPOS, UPDATE, grupo_anterior)
+
+    def actualizar_miembros_grupo(self, grupo_id: int, dnis: List[int]) -> List[Dict]:
+        """Deja en el grupo exactamente los socios indicados, en una sola transacción.
+
+        Solo se modifican los socios que entran o salen. Retorna un resultado por
+        socio: {'dni', 'resultado'} con 'agregado', 'movido' (venía de otro
+        grupo, ver 'grupo_anterior'), 'quitado' o 'sin_cambios'.
+        """
+        deseados = list(dict.fromkeys(int(d) for d in dnis))
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                cursor.execute('SELECT 1 FROM grupos_familiares WHERE id=?', (grupo_id,))
+                if cursor.fetchone() is None:
+                    raise ValueError(f"Grupo ID {grupo_id} no encontrado")
+                cursor.execute('SELECT dni FROM socios WHERE grupo_id=?', (grupo_id,))
+                actuales = {r[0] for r in cursor.fetchall()}
+
+                grupo_de = {}
+                if deseados:
+                    marcas = ','.join('?' * len(deseados))
+                    cursor.execute(f'SELECT dni, grupo_id FROM socios WHERE dni IN ({marcas})', deseados)
+                    grupo_de = dict(cursor.fetchall())
+                inexistentes = [d for d in deseados if d not in grupo_de]
+                if inexistentes:
+                    raise ValueError(f"No existe socio con DNI {inexistentes[0]}")
+
+                agregar = [d for d in deseados if d not in actuales]
+                quitar = sorted(actuales - set(deseados))
+                cursor.executemany('UPDATE socios SET grupo_id=NULL WHERE dni=?',
+                                   [(d,) for d in quitar])
+                cursor.executemany('UPDATE socios SET grupo_id=? WHERE dni=?',
+                                   [(grupo_id, d) for d in agregar])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        resultados = []
+        otros_grupos = set()
+        for dni in deseados:
+            if dni in actuales:
+                resultados.append({'dni': dni, 'resultado': 'sin_cambios'})
+            elif grupo_de[dni] is not None:
+                otros_grupos.add(grupo_de[dni])
+                resultados.append({'dni': dni, 'resultado': 'movido', 'grupo_anterior': grupo_de[dni]})
+            else:
+                resultados.append({'dni': dni, 'resultado': 'agregado'})
+        resultados.extend({'dni': dni, 'resultado': 'quitado'} for dni in quitar)
+        logging.info(f"Miembros del grupo {grupo_id}: +{len(agregar)} / -{len(quitar)}")
+
+        for dni in agregar + quitar:
+            self._emitir(SOCIOS, UPDATE, dni)
+        if agregar or quitar:
+            self._emitir(GRUPOS, UPDATE, grupo_id)
+        for otro in otros_grupos:
+            self._emitir(GRUPOS, UPDATE, otro)
+        return resultados
 
     def registrar_pago_grupal(self, grupo_id: int, monto: float, fecha_pago: str,
-                               metodo: str, meses: int = 1) -> int:
-        """Registra un pago individual para cada miembro del grupo.
-        Retorna la cantidad de pagos creados."""
-        miembros = self.obtener_miembros_grupo(grupo_id)
-        if not miembros:
-            raise ValueError("El grupo no tiene miembros")
-        for socio in miembros:
-            self.registrar_pago(socio['dni'], monto, fecha_pago, metodo, meses)
-        logging.info(f"Pago grupal: grupo {grupo_id}, {len(miembros)} pagos, ${monto}, {meses} mes(es)")
-        return len(miembros)
+                               metodo: str, meses: int = 1) -> List[Dict]:
+        """Registra un pago individual para cada miembro del grupo en una sola
+        transacción (INSERT ... SELECT sobre los miembros).
+        Retorna un resultado por miembro: {'dni', 'nombre', 'pago_id'}."""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                # Con el lock de escritura tomado, los ids nuevos son los mayores a este
+                cursor.execute('SELECT COALESCE(MAX(id), 0) FROM pagos')
+                ultimo_id = cursor.fetchone()[0]
+                cursor.execute('''
+                    INSERT INTO pagos (dni, monto, fecha_pago, metodo_pago, meses)
+                    SELECT dni, ?, ?, ?, ? FROM socios
+                    WHERE grupo_id = ?
+                    ORDER BY nombre
+                ''', (monto, fecha_pago, metodo, meses, grupo_id))
+                if cursor.rowcount <= 0:
+                    raise ValueError("El grupo no tiene miembros")
+                cursor.execute('''
+                    SELECT p.dni, s.nombre, p.id
+                    FROM pagos p JOIN socios s ON s.dni = p.dni
+                    WHERE p.id > ?
+                    ORDER BY p.id
+                ''', (ultimo_id,))
+                resultados = [{'dni': r[0], 'nombre': r[1], 'pago_id': r[2]} for r in cursor.fetchall()]
+                for r in resultados:
+                    _sumar_pago(conn, r['dni'], fecha_pago, meses)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        logging.info(f"Pago grupal: grupo {grupo_id}, {len(resultados)} pagos, ${monto}, {meses} mes(es)")
+        for r in resultados:
+            self._emitir(PAGOS, INSERT, r['pago_id'], dni=r['dni'], fechas=(fecha_pago,))
+        return resultados
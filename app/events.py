@@ -0,0 +1,162 @@
+"""Eventos de cambio emitidos por DatabaseManager.
+
+``EventBus`` es un publicador/suscriptor en proceso: cada método que modifica
+la base publica un ``CambioDatos`` después del commit. Los suscriptores
+directos (cachés) se llaman en el hilo que publica. Las ventanas usan
+``TkDispatcher``, que acumula los eventos y los entrega en lote, ya
+combinados, en el próximo ciclo idle de Tk.
+"""
+import logging
+import queue
+import threading
+import tkinter as tk
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .config import EVENT_CONFIG
+
+# Entidades
+SOCIOS = 'socios'
+PAGOS = 'pagos'
+INGRESOS = 'ingresos'
+GRUPOS = 'grupos'
+BASE = 'base'          # la base completa (restauración de un backup)
+
+# Acciones
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+RESTAURANDO = 'restaurando'  # BASE: se va a reemplazar el contenido
+RESTAURADA = 'restaurada'    # BASE: terminó la restauración (con o sin éxito)
+
+
+@dataclass(frozen=True)
+class CambioDatos:
+    """Un cambio sobre una fila identificada por su clave primaria."""
+    entidad: str
+    accion: str
+    clave: Any
+    clave_anterior: Any = None   # p. ej. DNI previo en un cambio de DNI
+    dni: Optional[int] = None    # socio afectado (pagos, ingresos)
+    fechas: Tuple[str, ...] = ()  # fechas YYYY-MM-DD afectadas (pago, ingreso, alta)
+
+
+def combinar(eventos: Iterable[CambioDatos]) -> List[CambioDatos]:
+    """Combina eventos repetidos sobre la misma fila.
+
+    Queda la última acción, en la posición de su última aparición; se conservan
+    la clave anterior y la unión de fechas de los eventos combinados.
+    """
+    por_fila: Dict[Tuple[str, Any], CambioDatos] = {}
+    for evento in eventos:
+        fila = (evento.entidad, evento.clave)
+        previo = por_fila.pop(fila, None)
+        if previo is not None:
+            fechas = tuple(sorted(set(previo.fechas) | set(evento.fechas)))
+            evento = replace(
+                evento,
+                clave_anterior=evento.clave_anterior if evento.clave_anterior is not None else previo.clave_anterior,
+                dni=evento.dni if evento.dni is not None else previo.dni,
+                fechas=fechas,
+            )
+        por_fila[fila] = evento
+    return list(por_fila.values())
+
+
+class EventBus:
+    """Publicación/suscripción en proceso, segura entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscriptores: List[Tuple[Callable[[CambioDatos], None], Optional[frozenset]]] = []
+
+    def suscribir(self, callback: Callable[[CambioDatos], None],
+                  entidades: Optional[Iterable[str]] = None) -> None:
+        """Registra un callback; ``entidades`` limita qué eventos recibe (None = todos)."""
+        filtro = frozenset(entidades) if entidades else None
+        with self._lock:
+            if all(cb != callback for cb, _ in self._suscriptores):
+                self._suscriptores.append((callback, filtro))
+
+    def desuscribir(self, callback: Callable[[CambioDatos], None]) -> None:
+        with self._lock:
+            self._suscriptores = [(cb, f) for cb, f in self._suscriptores if cb != callback]
+
+    def publicar(self, evento: CambioDatos) -> None:
+        with self._lock:
+            suscriptores = list(self._suscriptores)
+        for callback, filtro in suscriptores:
+            if filtro is not None and evento.entidad not in filtro:
+                continue
+            try:
+                callback(evento)
+            except Exception as e:
+                logging.error(f"Error en suscriptor de cambios ({evento.entidad}/{evento.accion}): {e}")
+
+
+class TkDispatcher:
+    """Entrega a un widget los eventos del bus, combinados una vez por ciclo idle.
+
+    Los eventos publicados desde el hilo de Tk se despachan con ``after_idle``;
+    los que llegan desde otros hilos se recogen con un sondeo cada
+    ``EVENT_CONFIG['poll_ms']``. La suscripción termina al destruirse el widget.
+    """
+
+    def __init__(self, widget, bus: EventBus, callback: Callable[[List[CambioDatos]], None],
+                 entidades: Optional[Iterable[str]] = None):
+        self.widget = widget
+        self.bus = bus
+        self.callback = callback
+        self._hilo_tk = threading.get_ident()
+        self._cola: "queue.SimpleQueue[CambioDatos]" = queue.SimpleQueue()
+        self._idle_id = None
+        self._poll_id = None
+        self._activo = True
+        bus.suscribir(self._recibir, entidades)
+        # Misc.bind: los widgets de CustomTkinter redirigen bind() a su canvas interno
+        tk.Misc.bind(widget, "<Destroy>", self._on_destroy, "+")
+        self._poll_id = widget.after(EVENT_CONFIG["poll_ms"], self._sondear)
+
+    def _recibir(self, evento: CambioDatos):
+        self._cola.put(evento)
+        if threading.get_ident() == self._hilo_tk and self._idle_id is None and self._activo:
+            self._idle_id = self.widget.after_idle(self._despachar)
+
+    def _sondear(self):
+        self._poll_id = None
+        if not self._activo:
+            return
+        if self._idle_id is None and not self._cola.empty():
+            self._despachar()
+        self._poll_id = self.widget.after(EVENT_CONFIG["poll_ms"], self._sondear)
+
+    def _despachar(self):
+        self._idle_id = None
+        eventos = []
+        while True:
+            try:
+                eventos.append(self._cola.get_nowait())
+            except queue.Empty:
+                break
+        if not eventos or not self._activo:
+            return
+        try:
+            self.callback(combinar(eventos))
+        except Exception as e:
+            logging.error(f"Error procesando {len(eventos)} cambio(s) en {self.widget}: {e}")
+
+    def detener(self):
+        if not self._activo:
+            return
+        self._activo = False
+        self.bus.desuscribir(self._recibir)
+        for after_id in (self._idle_id, self._poll_id):
+            if after_id is not None:
+                try:
+                    self.widget.after_cancel(after_id)
+                except Exception:
+                    pass
+
+    def _on_destroy(self, event):
+        if event.widget is self.widget:
+            self.detener()
@@ -0,0 +1,127 @@
+"""Reglas de vencimiento de cuotas.
+
+Único lugar donde se decide cuándo vence un pago y si una cuota está vigente
+(``VENCIMIENTO_CONFIG``):
+
+- modo "dias": cada mes de cuota son ``dias_por_mes`` días (comportamiento
+  histórico: 30).
+- modo "meses": meses calendario (15/01 + 1 = 15/02; 31/01 + 1 = 28/02).
+- ``dias_gracia``: la cuota sigue vigente N días después del vencimiento;
+  la fecha de vencimiento informada no cambia.
+
+Los pagos se acumulan: un pago hecho antes de que venza la cuota vigente
+empieza a correr desde ese vencimiento, así no se pierde lo que quedaba.
+``acumular`` recorre los pagos de un socio y devuelve hasta cuándo está pago
+(lo que ``DatabaseManager`` guarda en ``socios.pagado_hasta``).
+
+- ``vencimiento``/``vigente``/``acumular``: sin NumPy (kiosco, un socio).
+- ``intervalos``: arrays NumPy con el intervalo acumulado de cada pago (analítica).
+- ``vigente_desde``: límite para filtrar en SQL (``pagado_hasta >= ?``).
+"""
+import calendar
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional, Sequence, Tuple, Union
+
+from .config import VENCIMIENTO_CONFIG
+
+Fecha = Union[str, date, None]
+
+
+def _a_fecha(fecha: Fecha) -> Optional[date]:
+    if not fecha:
+        return None
+    if isinstance(fecha, datetime):
+        return fecha.date()
+    if isinstance(fecha, date):
+        return fecha
+    return date.fromisoformat(fecha[:10])
+
+
+def _sumar_meses(fecha: date, meses: int) -> date:
+    total = fecha.month - 1 + meses
+    anio, mes = fecha.year + total // 12, total % 12 + 1
+    return date(anio, mes, min(fecha.day, calendar.monthrange(anio, mes)[1]))
+
+
+# ── Un pago ────────────────────────────────────────────────────────────────
+def vencimiento(fecha_pago: Fecha, meses: Optional[int] = 1) -> Optional[date]:
+    """Fecha de vencimiento de un pago (None si no hay pago)"""
+    fecha = _a_fecha(fecha_pago)
+    if fecha is None:
+        return None
+    meses = int(meses or 1)
+    if VENCIMIENTO_CONFIG["modo"] == "meses":
+        return _sumar_meses(fecha, meses)
+    return fecha + timedelta(days=meses * VENCIMIENTO_CONFIG["dias_por_mes"])
+
+
+def vigente_desde(hoy: Optional[date] = None) -> date:
+    """Vencimiento más antiguo que todavía cuenta como vigente hoy"""
+    return (hoy or date.today()) - timedelta(days=VENCIMIENTO_CONFIG["dias_gracia"])
+
+
+def vigente(vencimiento_cuota: Fecha, hoy: Optional[date] = None) -> bool:
+    """True si la cuota sigue vigente hoy (el día del vencimiento inclusive, más la gracia)"""
+    vencimiento_cuota = _a_fecha(vencimiento_cuota)
+    return vencimiento_cuota is not None and vencimiento_cuota >= vigente_desde(hoy)
+
+
+def acumular(pagos: Iterable[Tuple[Fecha, Optional[int]]], desde: Fecha = None) -> Optional[date]:
+    """Fecha hasta la que están pagas las cuotas, recorriendo ``pagos`` (fecha, meses)
+    en orden. ``desde`` es lo ya acumulado (para sumar solo pagos nuevos)."""
+    hasta = _a_fecha(desde)
+    for fecha_pago, meses in pagos:
+        fecha = _a_fecha(fecha_pago)
+        hasta = vencimiento(max(fecha, hasta) if hasta else fecha, meses)
+    return hasta
+
+
+# ── Conjuntos (NumPy) ──────────────────────────────────────────────────────
+def _fechas_np(fechas_pago: Sequence):
+    import numpy as np  # diferido: el kiosco solo usa el camino escalar
+    if isinstance(fechas_pago, np.ndarray) and fechas_pago.dtype.kind == 'M':
+        return fechas_pago.astype('datetime64[D]')
+    return np.array([f[:10] if isinstance(f, str) else f for f in fechas_pago], dtype='datetime64[D]')
+
+
+def _meses_np(meses: Sequence):
+    import numpy as np
+    meses = np.nan_to_num(np.asarray(meses, dtype='float64'), nan=1).astype('int64')
+    meses[meses < 1] = 1
+    return meses
+
+
+def intervalos(dnis: Sequence[int], fechas_pago: Sequence, meses: Sequence):
+    """(inicio, hasta) de cada pago con acumulación, como arrays datetime64[D].
+    Los pagos deben venir ordenados por dni y fecha."""
+    import numpy as np
+    dnis, fechas, meses = np.asarray(dnis), _fechas_np(fechas_pago), _meses_np(meses)
+    if len(dnis) == 0:
+        return fechas, fechas
+    if VENCIMIENTO_CONFIG["modo"] == "meses":
+        # La duración depende del día de inicio: se recorre en orden
+        inicios, hastas, previo, hasta = [], [], None, None
+        for dni, fecha, m in zip(dnis.tolist(), fechas.tolist(), meses.tolist()):
+            if dni != previo:
+                previo, hasta = dni, None
+            inicio = max(fecha, hasta) if hasta else fecha
+            hasta = vencimiento(inicio, m)
+            inicios.append(inicio)
+            hastas.append(hasta)
+        return np.array(inicios, dtype='datetime64[D]'), np.array(hastas, dtype='datetime64[D]')
+
+    # Días: con S_k la suma de duraciones del socio hasta el pago k,
+    # hasta_k = S_k + max(fecha_j - S_{j-1}) para j <= k (un cummax por socio)
+    duracion = meses * VENCIMIENTO_CONFIG["dias_por_mes"]
+    nuevo = np.ones(len(dnis), dtype=bool)
+    nuevo[1:] = dnis[1:] != dnis[:-1]
+    grupo = np.cumsum(nuevo) - 1
+    suma = np.cumsum(duracion)
+    suma -= (suma - duracion)[np.flatnonzero(nuevo)][grupo]
+    base = fechas.astype('int64') - (suma - duracion)
+    # Cada socio se desplaza por encima de los anteriores para que el máximo no se mezcle
+    escala = int(base.max() - base.min()) + 1
+    base = np.maximum.accumulate(base + grupo * escala) - grupo * escala
+    hasta = (suma + base).astype('datetime64[D]')
+    return hasta - duracion, hasta
+
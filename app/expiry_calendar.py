@@ -0,0 +1,116 @@
+"""Calendario de vencimientos: fecha de vencimiento -> DNIs.
+
+Se arma con una sola consulta la primera vez que se usa en el día y después
+se mantiene con los eventos de cambio de socios y pagos. Cualquier pregunta
+del tipo "¿quién vence en los próximos N días?" es una búsqueda por rango
+(bisect) sobre las fechas ordenadas, sin volver a calcular vencimientos en SQL.
+"""
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from .events import CambioDatos, SOCIOS, PAGOS, BASE
+
+Fecha = Union[str, date]
+
+
+def _iso(fecha: Fecha) -> str:
+    return fecha if isinstance(fecha, str) else fecha.strftime('%Y-%m-%d')
+
+
+class CalendarioVencimientos:
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self._lock = threading.RLock()
+        self._fechas: List[str] = []               # fechas con vencimientos, ordenadas
+        self._por_fecha: Dict[str, Set[int]] = {}
+        self._socios: Dict[int, Tuple[str, str, str]] = {}  # dni -> (nombre, vencimiento, última cuota)
+        self._dia: Optional[str] = None
+        db_manager.suscribir(self._on_cambio, entidades=(SOCIOS, PAGOS, BASE))
+
+    # ── Construcción y mantenimiento ───────────────────────────────────────
+    def construir(self):
+        socios = list(self.db_manager.registros_socios_con_estado())
+        with self._lock:
+            self._fechas, self._por_fecha, self._socios = [], {}, {}
+            for s in socios:
+                if s['fecha_vencimiento']:
+                    self._socios[s['dni']] = (s['nombre'], s['fecha_vencimiento'], s['ultimo_pago'])
+                    self._por_fecha.setdefault(s['fecha_vencimiento'], set()).add(s['dni'])
+            self._fechas = sorted(self._por_fecha)
+            self._dia = datetime.now().strftime('%Y-%m-%d')
+
+    def _vigente(self):
+        if self._dia != datetime.now().strftime('%Y-%m-%d'):
+            self.construir()
+
+    def _on_cambio(self, evento: CambioDatos):
+        """Suscriptor directo: corre en el hilo que modificó la base."""
+        if self._dia is None:
+            return  # todavía no se construyó; se armará completo al usarse
+        if evento.entidad == BASE:
+            self._dia = None  # se restauró un backup: rearmar al próximo uso
+            return
+        dni = evento.clave if evento.entidad == SOCIOS else evento.dni
+        with self._lock:
+            if evento.entidad == SOCIOS and evento.clave_anterior is not None:
+                self._quitar(evento.clave_anterior)
+            if dni is None:
+                return
+            socio = self.db_manager.socio_con_estado(dni)
+            self._quitar(dni)
+            if socio is not None and socio['fecha_vencimiento']:
+                self._poner(dni, socio['nombre'], socio['fecha_vencimiento'], socio['ultimo_pago'])
+
+    def _poner(self, dni: int, nombre: str, vencimiento: str, ultima_cuota: str):
+        self._socios[dni] = (nombre, vencimiento, ultima_cuota)
+        dnis = self._por_fecha.get(vencimiento)
+        if dnis is None:
+            self._por_fecha[vencimiento] = dnis = set()
+            insort(self._fechas, vencimiento)
+        dnis.add(dni)
+
+    def _quitar(self, dni: int):
+        entrada = self._socios.pop(dni, None)
+        if entrada is None:
+            return
+        vencimiento = entrada[1]
+        dnis = self._por_fecha[vencimiento]
+        dnis.discard(dni)
+        if not dnis:
+            del self._por_fecha[vencimiento]
+            del self._fechas[bisect_left(self._fechas, vencimiento)]
+
+    # ── Consultas ──────────────────────────────────────────────────────────
+    def _rango(self, desde: Fecha, hasta: Fecha) -> List[str]:
+        return self._fechas[bisect_left(self._fechas, _iso(desde)):bisect_right(self._fechas, _iso(hasta))]
+
+    def entre(self, desde: Fecha, hasta: Fecha, limite: Optional[int] = None) -> List[Dict]:
+        """Socios que vencen entre ``desde`` y ``hasta`` (inclusive), por fecha y nombre"""
+        with self._lock:
+            self._vigente()
+            resultado = []
+            for fecha in self._rango(desde, hasta):
+                filas = sorted((self._socios[dni][0], dni) for dni in self._por_fecha[fecha])
+                for nombre, dni in filas:
+                    resultado.append({'nombre': nombre, 'dni': dni, 'fecha_vencimiento': fecha,
+                                      'ultima_cuota': self._socios[dni][2]})
+                    if limite is not None and len(resultado) >= limite:
+                        return resultado
+            return resultado
+
+    def contar_entre(self, desde: Fecha, hasta: Fecha) -> int:
+        with self._lock:
+            self._vigente()
+            return sum(len(self._por_fecha[fecha]) for fecha in self._rango(desde, hasta))
+
+    def vencen_en(self, dias: int, limite: Optional[int] = None) -> List[Dict]:
+        """Socios cuyo vencimiento cae exactamente dentro de ``dias`` días"""
+        fecha = datetime.now().date() + timedelta(days=dias)
+        return self.entre(fecha, fecha, limite)
+
+    def contar_proximos(self, dias: int) -> int:
+        """Socios con cuota vigente que vencen de hoy a ``dias`` días inclusive"""
+        hoy = datetime.now().date()
+        return self.contar_entre(hoy, hoy + timedelta(days=dias))
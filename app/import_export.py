@@ -113,7 +113,8 @@ class ImportExportManager:
                     
                     # KPIs
                     kpis = self.db_manager.kpis_basicos()
-                    metricas = self.db_manager.metricas_avanzadas()
+                    analitica = self.db_manager.analitica()
+                    metricas = {k: v for k, v in analitica.items() if k not in ('meses', 'retencion')}
                     
                     # Combinar KPIs y métricas
                     resumen_data = []
@@ -122,6 +123,17 @@ class ImportExportManager:
                     
                     df_resumen = pd.DataFrame(resumen_data)
                     df_resumen.to_excel(writer, sheet_name='Resumen', index=False)
+
+                    # Analítica mensual y retención por cohortes
+                    df_meses = pd.DataFrame([{k: v for k, v in m.items() if k != 'cohortes'}
+                                             for m in analitica['meses']])
+                    df_meses.to_excel(writer, sheet_name='Mensual', index=False)
+                    df_cohortes = pd.DataFrame([
+                        {'cohorte': c['cohorte'], 'socios': c['socios'],
+                         **{f"M{k}": v for k, v in enumerate(c['retencion'])}}
+                        for c in analitica['retencion']
+                    ])
+                    df_cohortes.to_excel(writer, sheet_name='Cohortes', index=False)
                 
                 messagebox.showinfo("Éxito", f"Reporte completo exportado a:\n{filename}")
                 return filename
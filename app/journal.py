@@ -0,0 +1,352 @@
+"""Diario de cambios para recuperar la base a un momento dado.
+
+Los backups completos los programa maintenance.py (tarea ``backup``);
+entre uno y otro, cada cambio confirmado de socios, pagos y grupos familiares
+se agrega al diario (``backups/diario/cambios_YYYYMMDD.jsonl``) como una línea
+JSON con la imagen de la fila después del cambio, o solo su clave si se borró.
+Los cambios se toman del EventBus (después del commit) y se encolan: un hilo
+escritor los junta durante ``JOURNAL_CONFIG['lote_ms']``, lee las filas con una
+sola conexión y escribe el lote con un único fsync. La hora de cada línea es
+la de la lectura de la fila, así la imagen nunca es posterior a su hora. Antes
+de una restauración (BASE/RESTAURANDO) y al salir se vacía la cola.
+
+Un lote que no se puede escribir (disco lleno, archivo bloqueado) se reintenta
+con espera creciente. Si se agotan los ``JOURNAL_CONFIG['reintentos']``, el
+diario anota una línea ``hueco`` con la última escritura buena antes de los
+cambios perdidos, y ``reconstruir`` se niega a recuperar un momento que
+necesite pasar por ese hueco.
+
+``reconstruir`` copia el backup completo más reciente anterior al momento
+pedido y reaplica en orden las líneas desde el inicio de ese backup hasta el
+momento. Reaplicar es idempotente (upsert o borrado por clave), así que lo que
+el backup ya tenía no cambia el resultado. Una restauración deja una marca
+``base`` en el diario: desde ahí el punto de partida es el backup restaurado.
+
+Los días cerrados se comprimen (.jsonl.gz) y se borran pasados
+``JOURNAL_CONFIG['retencion_dias']``. Los ingresos del kiosco no se registran.
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .config import JOURNAL_CONFIG, get_backup_path
+from .events import CambioDatos, combinar, SOCIOS, PAGOS, GRUPOS, BASE, DELETE, RESTAURANDO
+
+# entidad -> (tabla, clave primaria)
+TABLAS = {
+    SOCIOS: ('socios', 'dni'),
+    PAGOS: ('pagos', 'id'),
+    GRUPOS: ('grupos_familiares', 'id'),
+}
+# Datos derivados que el diario no trae: se recalculan en la copia reconstruida
+ROLLUPS = ['pagado_hasta', 'visitas', 'busqueda', 'analitica']
+
+
+def leer_momento(texto: str) -> datetime:
+    """'YYYY-MM-DD' (inicio del día) o 'YYYY-MM-DD HH:MM[:SS]'"""
+    try:
+        return datetime.fromisoformat(texto.strip())
+    except ValueError:
+        raise ValueError(f"Momento inválido: {texto!r} (use YYYY-MM-DD o 'YYYY-MM-DD HH:MM')")
+
+
+class DiarioCambios:
+    def __init__(self, db_path: str, directorio: Optional[Path] = None):
+        self.db_path = db_path
+        self.directorio = Path(directorio or get_backup_path() / JOURNAL_CONFIG["directorio"])
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._archivo = None
+        self._dia: Optional[str] = None
+        self._cola: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._hilo: Optional[threading.Thread] = None
+        # Hora de la última escritura buena: los cambios de un lote perdido son posteriores
+        self._ultima_escritura = datetime.now().isoformat(timespec='microseconds')
+        self._hueco: Optional[Dict] = None  # hueco aún no anotado en el archivo
+        self._fallo = False  # la última escritura falló: el archivo puede terminar a medio escribir
+        self.lineas = 0
+        self.lotes = 0
+        self.huecos = 0
+
+    # ── Escritura ──────────────────────────────────────────────────────────
+    def registrar(self, evento: CambioDatos) -> None:
+        """Suscriptor directo (SOCIOS, PAGOS, GRUPOS y BASE): solo encola."""
+        if evento.entidad == BASE:
+            if evento.accion == RESTAURANDO:
+                self.vaciar()  # lo anterior a la restauración queda antes de la marca base
+            return
+        self._encolar(evento)
+
+    def marcar_base(self, backup_filename: str) -> None:
+        """La base en uso pasó a ser ``backup_filename`` (restauración)"""
+        self._encolar(('base', backup_filename))
+        self.vaciar()
+
+    def vaciar(self, timeout: float = 10) -> bool:
+        """Espera a que todo lo encolado hasta ahora esté escrito en el disco"""
+        if self._hilo is None:
+            return True
+        listo = threading.Event()
+        self._cola.put(listo)
+        return listo.wait(timeout)
+
+    def _encolar(self, item) -> None:
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._escritor, name="diario", daemon=True)
+                self._hilo.start()
+                atexit.register(self.cerrar)
+        self._cola.put(item)
+
+    def _escritor(self):
+        while True:
+            lote = [self._cola.get()]
+            if lote[0] is None:
+                return
+            time.sleep(JOURNAL_CONFIG["lote_ms"] / 1000)  # juntar lo que publica la misma operación
+            while True:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            listos = [item for item in lote if isinstance(item, threading.Event)]
+            self._escribir_lote([item for item in lote
+                                 if item is not None and not isinstance(item, threading.Event)])
+            for listo in listos:
+                listo.set()
+            if None in lote:
+                if self._hueco is not None:
+                    self._escribir_lote([])  # que el hueco quede anotado antes de salir
+                return
+
+    def _escribir_lote(self, lote: List) -> None:
+        espera = JOURNAL_CONFIG["lote_ms"] / 1000
+        for intento in range(JOURNAL_CONFIG["reintentos"] + 1):
+            try:
+                self._escribir(self._entradas(lote))
+                return
+            except Exception as e:
+                if intento == JOURNAL_CONFIG["reintentos"]:
+                    error = e
+                    break
+                logging.warning(f"Diario de cambios: no se pudo escribir un lote de {len(lote)}, "
+                                f"reintento en {espera:.1f}s: {e}")
+                time.sleep(espera)
+                espera = min(espera * 2, JOURNAL_CONFIG["reintento_max_segundos"])
+        perdidos = sum(1 for item in lote if isinstance(item, CambioDatos))
+        if self._hueco is None:
+            self._hueco = {'op': 'hueco', 'desde': self._ultima_escritura, 'cambios': 0}
+        self._hueco['cambios'] += perdidos
+        self.huecos += 1
+        logging.error(f"Diario de cambios: se perdieron {perdidos} cambio(s) tras "
+                      f"{JOURNAL_CONFIG['reintentos']} reintentos ({error}); no se podrá "
+                      f"recuperar a un momento posterior a {self._hueco['desde']} desde un backup anterior")
+
+    def _entradas(self, lote: List) -> List[Dict]:
+        """Líneas del lote en orden; los cambios repetidos sobre una fila se combinan
+        (la imagen se lee una vez, ya con el estado final)"""
+        entradas: List[Dict] = []
+        eventos: List[CambioDatos] = []
+        conn = None
+        try:
+            for item in lote + [None]:
+                if isinstance(item, CambioDatos):
+                    eventos.append(item)
+                    continue
+                for evento in combinar(eventos):
+                    if conn is None:
+                        conn = sqlite3.connect(self.db_path)
+                        conn.row_factory = sqlite3.Row
+                    entradas.extend(self._entradas_evento(conn, evento))
+                eventos = []
+                if isinstance(item, tuple):
+                    entradas.append({'op': 'base', 'archivo': item[1]})
+        finally:
+            if conn is not None:
+                conn.close()
+        return entradas
+
+    def _entradas_evento(self, conn: sqlite3.Connection, evento: CambioDatos) -> List[Dict]:
+        tabla, clave = TABLAS[evento.entidad]
+        entradas = []
+        if evento.clave_anterior is not None:
+            entradas.append({'op': 'd', 'tabla': tabla, 'clave': evento.clave_anterior})
+        fila = None
+        if evento.accion != DELETE:
+            fila = conn.execute(f'SELECT * FROM {tabla} WHERE {clave} = ?', (evento.clave,)).fetchone()
+        if fila is None:
+            entradas.append({'op': 'd', 'tabla': tabla, 'clave': evento.clave})
+        else:
+            entradas.append({'op': 'u', 'tabla': tabla, 'fila': dict(fila)})
+        return entradas
+
+    def _escribir(self, entradas: List[Dict]) -> None:
+        if self._hueco is not None:
+            entradas = [self._hueco] + entradas
+        if not entradas:
+            return
+        with self._lock:
+            # Hora tomada después de leer las filas: la imagen no es posterior a ella
+            ahora = datetime.now()
+            t = ahora.isoformat(timespec='microseconds')
+            texto = ''.join(json.dumps({'t': t, **e}, ensure_ascii=False, separators=(',', ':')) + '\n'
+                            for e in entradas)
+            if self._fallo:
+                texto = '\n' + texto  # no pegarse a una línea que quedó a medias
+            try:
+                archivo = self._abrir(ahora)
+                archivo.write(texto)
+                archivo.flush()
+                if JOURNAL_CONFIG["fsync"]:
+                    os.fsync(archivo.fileno())
+            except Exception:
+                self._fallo = True
+                if self._archivo is not None:
+                    try:
+                        self._archivo.close()
+                    except OSError:
+                        pass
+                self._archivo, self._dia = None, None  # reabrir en el reintento
+                raise
+            self._fallo = False
+            self._hueco = None
+            self._ultima_escritura = t
+            self.lineas += len(entradas)
+            self.lotes += 1
+
+    def _abrir(self, ahora: datetime):
+        dia = ahora.strftime('%Y%m%d')
+        if dia != self._dia:
+            if self._archivo is not None:
+                self._archivo.close()
+            self._archivo = open(self.directorio / f"cambios_{dia}.jsonl", 'a', encoding='utf-8')
+            self._dia = dia
+            self._mantener(dia)
+        return self._archivo
+
+    def _mantener(self, hoy: str) -> None:
+        """Comprime los días cerrados y borra los vencidos"""
+        limite = (datetime.strptime(hoy, '%Y%m%d')
+                  - timedelta(days=JOURNAL_CONFIG["retencion_dias"])).strftime('%Y%m%d')
+        for dia, ruta in self._archivos():
+            try:
+                if dia < limite:
+                    ruta.unlink()
+                elif dia < hoy and ruta.suffix == '.jsonl':
+                    with open(ruta, 'rb') as f_in, gzip.open(f"{ruta}.gz", 'wb') as f_out:
+                        shutil.copyfileobj(f_in, f_out)
+                    ruta.unlink()
+            except OSError as e:
+                logging.warning(f"Diario de cambios: no se pudo mantener {ruta.name}: {e}")
+
+    def cerrar(self) -> None:
+        """Escribe lo encolado, detiene el escritor y cierra el archivo"""
+        if self._hilo is not None and self._hilo.is_alive():
+            self._cola.put(None)
+            self._hilo.join(timeout=10)
+            if self._hilo.is_alive():
+                logging.error("Diario de cambios: el escritor sigue reintentando al salir; "
+                              "los cambios encolados pueden perderse")
+        self._hilo = None
+        with self._lock:
+            if self._archivo is not None:
+                self._archivo.close()
+                self._archivo, self._dia = None, None
+
+    # ── Lectura ────────────────────────────────────────────────────────────
+    def _archivos(self) -> List[Tuple[str, Path]]:
+        """(día YYYYMMDD, ruta) de cada archivo del diario, en orden"""
+        archivos = []
+        for ruta in self.directorio.glob('cambios_*.jsonl*'):
+            dia = ruta.name[len('cambios_'):].split('.')[0]
+            if ruta.suffix == '.gz' and ruta.with_suffix('').exists():
+                continue  # compresión interrumpida: vale el original
+            archivos.append((dia, ruta))
+        return sorted(archivos)
+
+    def entradas(self, desde: Optional[datetime] = None, hasta: Optional[datetime] = None) -> Iterator[Dict]:
+        """Líneas con ``desde <= t <= hasta``, en el orden en que se escribieron"""
+        t_desde = desde.isoformat(timespec='microseconds') if desde else ''
+        t_hasta = hasta.isoformat(timespec='microseconds') if hasta else '9'
+        for dia, ruta in self._archivos():
+            if dia < t_desde[:10].replace('-', '') or dia > t_hasta[:10].replace('-', ''):
+                continue
+            abrir = gzip.open if ruta.suffix == '.gz' else open
+            with abrir(ruta, 'rt', encoding='utf-8') as f:
+                for linea in f:
+                    if not linea.strip():
+                        continue
+                    try:
+                        entrada = json.loads(linea)
+                    except ValueError:
+                        # Última línea a medio escribir (corte de luz)
+                        logging.warning(f"Diario de cambios: línea ilegible en {ruta.name}")
+                        continue
+                    if t_desde <= entrada['t'] <= t_hasta:
+                        yield entrada
+
+    # ── Recuperación ───────────────────────────────────────────────────────
+    def elegir_base(self, backup_manager, momento: datetime) -> Tuple[datetime, str]:
+        """(desde, backup): el punto de partida más reciente anterior a ``momento``"""
+        candidatos = []
+        for backup in backup_manager.get_backup_list():
+            if backup.get('recuperado_al'):
+                continue  # copia reconstruida: no es un estado de la base en uso
+            inicio = datetime.fromisoformat(backup.get('started_at') or backup['created_at'])
+            if inicio <= momento:
+                candidatos.append((inicio, backup['filename']))
+        for entrada in self.entradas(hasta=momento):
+            if entrada['op'] == 'base' and backup_manager.ruta_backup(entrada['archivo']) is not None:
+                candidatos.append((datetime.fromisoformat(entrada['t']), entrada['archivo']))
+        if not candidatos:
+            raise ValueError(f"No hay un backup anterior a {momento:%Y-%m-%d %H:%M}")
+        return max(candidatos)
+
+    def reconstruir(self, backup_manager, momento: datetime, destino: Path) -> Dict:
+        """Escribe en ``destino`` la base como estaba en ``momento``"""
+        from .db import DatabaseManager
+
+        desde, base = self.elegir_base(backup_manager, momento)
+        t_desde = desde.isoformat(timespec='microseconds')
+        t_momento = momento.isoformat(timespec='microseconds')
+        for entrada in self.entradas(desde):
+            # Cambios perdidos entre ``desde`` (la última escritura buena) y la hora de la línea
+            if entrada['op'] == 'hueco' and entrada['desde'] < t_momento and entrada['t'] > t_desde:
+                raise ValueError(f"El diario tiene un hueco ({entrada['cambios']} cambio(s) sin registrar "
+                                 f"entre {entrada['desde'][:19]} y {entrada['t'][:19]}): no se puede "
+                                 f"recuperar al {momento:%Y-%m-%d %H:%M:%S} desde {base}")
+        backup_manager.extraer_backup(base, destino)
+        # Abrirla con DatabaseManager migra el esquema si el backup es anterior
+        copia = DatabaseManager(str(destino), auto_backup=False, diario=False)
+        aplicados = 0
+        with sqlite3.connect(destino) as conn:
+            columnas = {tabla: {c[1] for c in conn.execute(f'PRAGMA table_info({tabla})')}
+                        for tabla, _ in TABLAS.values()}
+            claves = dict(TABLAS.values())
+            for entrada in self.entradas(desde, momento):
+                if entrada['op'] in ('base', 'hueco'):
+                    continue
+                tabla = entrada['tabla']
+                clave = claves[tabla]
+                if entrada['op'] == 'd':
+                    conn.execute(f'DELETE FROM {tabla} WHERE {clave} = ?', (entrada['clave'],))
+                else:
+                    fila = {c: v for c, v in entrada['fila'].items() if c in columnas[tabla]}
+                    nombres = ', '.join(fila)
+                    cambios = ', '.join(f'{c} = excluded.{c}' for c in fila if c != clave)
+                    conn.execute(f'INSERT INTO {tabla} ({nombres}) VALUES ({", ".join("?" * len(fila))}) '
+                                 f'ON CONFLICT({clave}) DO UPDATE SET {cambios}', list(fila.values()))
+                aplicados += 1
+            conn.commit()
+        copia.reconstruir_rollups(ROLLUPS)
+        return {'base': base, 'desde': desde.isoformat(), 'cambios': aplicados}
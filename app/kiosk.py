@@ -0,0 +1,342 @@
+"""Pantalla de consulta del kiosco.
+
+Módulo liviano: solo depende de config, la capa de base de datos y
+CustomTkinter (sin matplotlib ni pandas), para que ``python -m app kiosk``
+arranque rápido en la PC de la entrada.
+"""
+import tkinter as tk
+import logging
+import statistics
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+import customtkinter as ctk
+
+from .audio import motor_audio
+from .checkin_guard import AntiPassback
+from .config import COLORS, FONTS, KIOSK_UI_CONFIG, POPUP_AUTOCLOSE_SECONDS
+from .events import CambioDatos, TkDispatcher, SOCIOS, PAGOS, BASE, RESTAURANDO
+
+# Vistas del resultado: clave -> (título, color de fondo, ícono)
+_VISTAS = {
+    'ACTIVO': ("ACTIVO", COLORS['ACTIVE_GREEN'], "✅"),
+    'VENCIDO': ("VENCIDO", COLORS['EXPIRED_RED'], "❌"),
+    'NO REGISTRADO': ("NO REGISTRADO", COLORS['WARNING_AMBER'], "⚠️"),
+    'ERROR': ("Error", COLORS['EXPIRED_RED'], "❌"),
+    'RESTAURANDO': ("Restaurando", COLORS['INFO_BLUE'], "⏳"),
+}
+
+
+class ResultadoOverlay:
+    """Ventana de resultado armada una sola vez, con una vista por estado.
+
+    Mostrar un resultado solo cambia el texto del mensaje, trae la vista al
+    frente y muestra la ventana; no se crean widgets ni fuentes por pasada.
+    """
+
+    def __init__(self, parent):
+        self.ventana = ctk.CTkToplevel(parent)
+        self.ventana.withdraw()
+        self.ventana.transient(parent.winfo_toplevel())
+        self.ventana.protocol("WM_DELETE_WINDOW", self.ocultar)
+        # ~90% de la pantalla, centrada (el tamaño de pantalla no cambia)
+        sw, sh = self.ventana.winfo_screenwidth(), self.ventana.winfo_screenheight()
+        width, height = int(sw * 0.9), int(sh * 0.85)
+        self.ventana.geometry(f"{width}x{height}+{(sw - width) // 2}+{(sh - height) // 2}")
+
+        self.ventana.grid_rowconfigure(0, weight=1)
+        self.ventana.grid_columnconfigure(0, weight=1)
+
+        fuente_icono = ctk.CTkFont(**FONTS['TITLE_LARGE'])
+        fuente_mensaje = ctk.CTkFont(**FONTS['TITLE_SMALL'])
+        self._vistas = {}
+        for clave, (titulo, color, icono) in _VISTAS.items():
+            marco = ctk.CTkFrame(self.ventana, fg_color=color)
+            marco.grid(row=0, column=0, sticky="nsew", padx=30, pady=30)  # apiladas en la misma celda
+            content = ctk.CTkFrame(marco, fg_color="transparent")
+            content.place(relx=0.5, rely=0.5, anchor="center")
+            ctk.CTkLabel(content, text=icono, font=fuente_icono).pack(pady=(10, 10))
+            mensaje = ctk.CTkLabel(content, text="", font=fuente_mensaje, text_color="white")
+            mensaje.pack(pady=10)
+            self._vistas[clave] = (titulo, marco, mensaje)
+        self.visible = False
+
+    def mostrar(self, clave: str, mensaje: str):
+        titulo, marco, etiqueta = self._vistas[clave]
+        etiqueta.configure(text=mensaje)
+        marco.tkraise()
+        self.ventana.title(titulo)
+        if not self.visible:
+            self.ventana.deiconify()
+            self.visible = True
+        self.ventana.lift()
+        try:
+            self.ventana.grab_set()
+        except tk.TclError:
+            pass  # otra ventana tiene el grab; el resultado se ve igual
+
+    def ocultar(self):
+        if self.visible:
+            self.ventana.grab_release()
+            self.ventana.withdraw()
+            self.visible = False
+
+
+class ConsultaKioscoFrame(ctk.CTkFrame):
+    INSTRUCCIONES = "Presione ENTER para consultar su estado"
+
+    def __init__(self, parent, db_manager, cliente=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        # Cliente del servicio de kiosco (KioskClient / LoopbackKioskClient);
+        # None = consultar y registrar directamente en la base local
+        self.cliente = cliente
+        self.overlay: Optional[ResultadoOverlay] = None
+        self.after_id = None
+        # Latencia pasada -> resultado en pantalla (ms), últimas N consultas
+        self._latencias = deque(maxlen=KIOSK_UI_CONFIG["muestras_latencia"])
+        # Sonidos en su propio hilo: no demoran el dibujo del resultado
+        self.audio = motor_audio()
+        # Estado consultado por DNI: {dni: (día, resultado)}. Un pago o edición
+        # del socio lo descarta en el momento (suscripción directa, sin esperar a Tk).
+        self._estados = {}
+        # Pasadas repetidas del mismo DNI: se responden sin volver a registrar
+        self._reingresos = None
+        # Restauración de un backup en curso: sin servicio, no se consulta la base
+        self._restaurando = False
+        if self.db_manager is not None:
+            self._reingresos = AntiPassback(self.db_manager.registrar_repeticiones)
+            self.db_manager.suscribir(self._invalidar_estado, entidades=(SOCIOS, PAGOS, BASE))
+            tk.Misc.bind(self, "<Destroy>", self._on_destroy, "+")
+        
+        self.create_widgets()
+        if self.db_manager is not None:
+            TkDispatcher(self, self.db_manager.eventos, self._on_restauracion, entidades=(BASE,))
+
+    def _invalidar_estado(self, evento: CambioDatos):
+        if evento.entidad == BASE:
+            # Antes de restaurar se guardan las repeticiones; después, nada cacheado vale
+            self._restaurando = evento.accion == RESTAURANDO
+            if self._restaurando:
+                self._reingresos.vaciar()
+            else:
+                self._reingresos.descartar()
+            self._estados.clear()
+            return
+        for dni in (evento.clave if evento.entidad == SOCIOS else evento.dni, evento.clave_anterior):
+            self._estados.pop(dni, None)
+            self._reingresos.olvidar(dni)
+
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self.db_manager.desuscribir(self._invalidar_estado)
+            self._reingresos.vaciar()
+
+    def _estado_socio(self, dni: int):
+        hoy = datetime.now().date()
+        cacheado = self._estados.get(dni)
+        if cacheado and cacheado[0] == hoy:
+            return cacheado[1]
+        resultado = self.db_manager.consultar_estado_socio(dni)
+        self._estados[dni] = (hoy, resultado)
+        return resultado
+    
+    def create_widgets(self):
+        # Contenedor centrado a pantalla completa
+        container = ctk.CTkFrame(self, fg_color="transparent")
+        container.pack(fill="both", expand=True)
+        container.grid_rowconfigure(0, weight=1)
+        container.grid_columnconfigure(0, weight=1)
+
+        inner = ctk.CTkFrame(container, fg_color="transparent")
+        inner.grid(row=0, column=0)
+
+        # Título SOMA Entrenamientos (SOMA en naranja)
+        title_frame = ctk.CTkFrame(inner, fg_color="transparent")
+        title_frame.pack(pady=(0, 20))
+        ctk.CTkLabel(
+            title_frame,
+            text="SOMA",
+            font=ctk.CTkFont(**FONTS['TITLE_LARGE']),
+            text_color=COLORS['SOMA_ORANGE']
+        ).pack(side="left")
+        ctk.CTkLabel(
+            title_frame,
+            text=" Entrenamientos",
+            font=ctk.CTkFont(**FONTS['TITLE_LARGE']),
+            text_color=COLORS['TEXT_DARK']
+        ).pack(side="left")
+
+        # Box de DNI centrado
+        dni_frame = ctk.CTkFrame(inner, fg_color="transparent")
+        dni_frame.pack(pady=10)
+
+        ctk.CTkLabel(
+            dni_frame,
+            text="Ingrese su DNI:",
+            font=ctk.CTkFont(**FONTS['BODY_LARGE'])
+        ).pack(pady=(0, 10))
+
+        self.dni_entry = ctk.CTkEntry(
+            dni_frame,
+            placeholder_text="12345678",
+            font=ctk.CTkFont(**FONTS['HEADER']),
+            width=360,
+            height=56,
+            justify="center"
+        )
+        self.dni_entry.pack(pady=10)
+
+        # Bind Enter para consultar
+        self.dni_entry.bind('<Return>', self.consultar_estado)
+
+        # Instrucciones
+        self.instrucciones = ctk.CTkLabel(
+            inner,
+            text=self.INSTRUCCIONES,
+            font=ctk.CTkFont(**FONTS['BODY_MEDIUM']),
+            text_color="gray"
+        )
+        self.instrucciones.pack(pady=(12, 0))
+
+        # Ventana de resultado: se arma ahora, no en cada pasada
+        self.overlay = ResultadoOverlay(self)
+
+        # Focus inicial
+        self.after(100, lambda: self.dni_entry.focus())
+    
+    def _on_restauracion(self, eventos):
+        """Muestra en pantalla que la base se está restaurando"""
+        if eventos[-1].accion == RESTAURANDO:
+            self.instrucciones.configure(text="⏳ Actualizando la base de datos...",
+                                         text_color=COLORS['INFO_BLUE'])
+        else:
+            self.instrucciones.configure(text=self.INSTRUCCIONES, text_color="gray")
+
+    def consultar_estado(self, event=None):
+        inicio = time.perf_counter()
+        dni_text = self.dni_entry.get().strip()
+        
+        if not dni_text:
+            return
+        self.audio.cancelar()  # una pasada nueva corta el sonido de la anterior
+        
+        if self.cliente is None and self._restaurando:
+            # El servicio sigue respondiendo desde su índice; sin él hay que esperar
+            self.mostrar_resultado('RESTAURANDO', "ACTUALIZANDO DATOS\n\nIntente de nuevo en unos segundos", inicio)
+            return
+        
+        if not dni_text.isdigit():
+            self.mostrar_resultado('ERROR', "DNI inválido", inicio)
+            return
+        
+        dni = int(dni_text)
+        
+        try:
+            if self.cliente is not None:
+                # El servicio responde desde su índice y registra el ingreso
+                resultado = self.cliente.consultar(dni)
+            else:
+                resultado = self._reingresos.repetido(dni)
+                if resultado is None:
+                    # Consultar estado
+                    resultado = self._estado_socio(dni)
+
+                    # Registrar consulta en ingresos
+                    self.db_manager.registrar_ingreso(
+                        dni if resultado['estado'] != 'No registrado' else None,
+                        resultado['nombre'],
+                        resultado['estado']
+                    )
+                    self._reingresos.recordar(dni, resultado)
+            
+            # Mostrar resultado
+            if resultado['estado'] == 'Activo':
+                mensaje = f"CUOTA ACTIVA\n\n{resultado['nombre']}\nVence: {resultado['fecha_vencimiento']}"
+                self.mostrar_resultado('ACTIVO', mensaje, inicio)
+                self.reproducir_sonido('ACTIVE')
+                
+            elif resultado['estado'] == 'Vencido':
+                fecha_venc = resultado['fecha_vencimiento'] or "Sin pagos"
+                mensaje = f"CUOTA VENCIDA\n\n{resultado['nombre']}\nÚltimo vencimiento: {fecha_venc}"
+                self.mostrar_resultado('VENCIDO', mensaje, inicio)
+                self.reproducir_sonido('EXPIRED')
+                
+            else:  # No registrado
+                mensaje = "DNI NO REGISTRADO\n\nConsulte en recepción"
+                self.mostrar_resultado('NO REGISTRADO', mensaje, inicio)
+                self.reproducir_sonido('NOT_REGISTERED')
+        
+        except ConnectionError as e:
+            logging.error(f"Error en consulta: {e}")
+            self.mostrar_resultado('ERROR', "Sin conexión con el servidor\n\nConsulte en recepción", inicio)
+        except Exception as e:
+            logging.error(f"Error en consulta: {e}")
+            self.mostrar_resultado('ERROR', "Error en la consulta", inicio)
+    
+    def mostrar_resultado(self, vista: str, mensaje: str, inicio: Optional[float] = None):
+        if self.after_id:
+            self.after_cancel(self.after_id)
+
+        self.overlay.mostrar(vista, mensaje)
+        if inicio is not None:
+            # Los redibujados pendientes corren antes que este callback
+            self.after_idle(self._medir_latencia, inicio)
+        
+        # Auto-cerrar después de 3 segundos (config o mínimo 3)
+        try:
+            seconds = max(2, int(POPUP_AUTOCLOSE_SECONDS))
+        except Exception:
+            seconds = 2
+        self.after_id = self.after(seconds * 1000, self.cerrar_popup)
+
+    def _medir_latencia(self, inicio: float):
+        ms = (time.perf_counter() - inicio) * 1000
+        self._latencias.append(ms)
+        logging.debug(f"Kiosco: pasada -> pantalla {ms:.1f} ms")
+        if len(self._latencias) == self._latencias.maxlen:
+            logging.info(f"Kiosco: pasada -> pantalla {self.resumen_latencias()}")
+            self._latencias.clear()
+
+    def resumen_latencias(self) -> str:
+        """p50/p95/máx de las últimas consultas (ms)"""
+        if not self._latencias:
+            return "sin datos"
+        muestras = sorted(self._latencias)
+        p95 = muestras[min(len(muestras) - 1, int(len(muestras) * 0.95))]
+        return (f"p50 {statistics.median(muestras):.1f} ms, p95 {p95:.1f} ms, "
+                f"máx {muestras[-1]:.1f} ms ({len(muestras)} consultas)")
+    
+    def cerrar_popup(self):
+        self.overlay.ocultar()
+        
+        if self.after_id:
+            self.after_cancel(self.after_id)
+            self.after_id = None
+        
+        # Limpiar entry y devolver foco
+        self.dni_entry.delete(0, 'end')
+        self.dni_entry.focus()
+    
+    def reproducir_sonido(self, tipo):
+        """Encola el sonido de ``tipo`` (clave de SOUNDS) y vuelve enseguida"""
+        self.audio.reproducir(tipo)
+
+def ejecutar_kiosco(db_manager=None, cliente=None):
+    """Ventana a pantalla completa solo con la consulta del kiosco (sin login ni pestañas)."""
+    ctk.set_appearance_mode("light")
+    ctk.set_default_color_theme("blue")
+    root = ctk.CTk()
+    root.title("Soma Entrenamientos – Kiosco")
+    try:
+        root.configure(fg_color=COLORS['WHITE'])
+        root.attributes("-fullscreen", True)
+    except Exception:
+        pass
+    root.bind('<Escape>', lambda e: root.attributes("-fullscreen", False))
+    frame = ConsultaKioscoFrame(root, db_manager, cliente=cliente)
+    frame.pack(fill="both", expand=True)
+    logging.info("Kiosco iniciado")
+    root.mainloop()
@@ -0,0 +1,487 @@
+"""Servicio de kiosco para varias terminales en la red local.
+
+Un único proceso es dueño de la base (``DatabaseManager``) y atiende a las
+terminales por HTTP/JSON (asyncio, solo biblioteca estándar):
+
+    POST /ingreso        {"dni": 123}  -> estado del socio + registra el ingreso
+    GET  /estado/<dni>                 -> estado sin registrar ingreso
+    GET  /salud                        -> socios en índice, ingresos pendientes
+
+Cada pedido lleva ``KIOSK_SERVICE['token']`` en la cabecera ``X-Kiosk-Token``
+(401 si no coincide); sin token el servicio solo acepta escuchar en la propia
+máquina. Los cuerpos de más de ``max_cuerpo`` bytes se rechazan (413).
+
+El estado de cada DNI se responde desde un índice en memoria, que se arma con
+una sola consulta al iniciar y se mantiene con los eventos de cambio de la
+base. Los ingresos de todas las terminales se encolan y se escriben en lote
+(``registrar_ingresos_lote``) cada ``batch_ms`` o al juntar ``batch_max``;
+las pasadas repetidas del mismo DNI no se encolan (``checkin_guard.py``).
+Un lote que no se pudo escribir (p. ej. base bloqueada) se reintenta con
+espera creciente, antes que lo nuevo; si al detener el servicio sigue sin
+escribirse, se guarda junto a la base (``kiosco_pendientes.jsonl``) y se
+escribe al volver a iniciar.
+Mientras se restaura un backup (eventos BASE) el servicio sigue respondiendo:
+escribe lo pendiente, retiene los ingresos nuevos en la cola y, al terminar,
+recarga el índice y los escribe sobre la base restaurada.
+
+Clientes: ``KioskClient`` (HTTP, para otra terminal) y ``LoopbackKioskClient``
+(en proceso, para la terminal que hospeda el servicio y para pruebas).
+"""
+import asyncio
+import concurrent.futures
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import threading
+import urllib.error
+import urllib.request
+from datetime import date, datetime
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .checkin_guard import AntiPassback
+from .config import KIOSK_SERVICE
+from .db import DatabaseManager, estado_kiosco
+from .events import CambioDatos, SOCIOS, PAGOS, BASE, RESTAURANDO
+
+
+def _fecha(texto: Optional[str]) -> Optional[date]:
+    return date.fromisoformat(texto) if texto else None
+
+
+def _es_local(host: str) -> bool:
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class KioskService:
+    def __init__(self, db_manager: DatabaseManager, host: Optional[str] = None, port: Optional[int] = None,
+                 token: Optional[str] = None):
+        self.db_manager = db_manager
+        self.host = host or KIOSK_SERVICE["host"]
+        self.port = KIOSK_SERVICE["port"] if port is None else port  # 0: puerto libre (pruebas)
+        self.token = KIOSK_SERVICE["token"] if token is None else token
+        self.batch_ms = KIOSK_SERVICE["batch_ms"]
+        self.batch_max = KIOSK_SERVICE["batch_max"]
+
+        # {dni: (nombre, vencimiento)}; el estado se calcula al consultar
+        self._indice: Dict[int, Tuple[str, Optional[date]]] = {}
+        self._indice_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._cola: Optional[asyncio.Queue] = None
+        self._escritura: Optional[asyncio.Lock] = None  # la toma el escritor por lote, o la pausa
+        self._pausado = False
+        self._detener: Optional[asyncio.Event] = None
+        self._hilo: Optional[threading.Thread] = None
+        self._listo = threading.Event()
+        self.reingresos = AntiPassback(self._registrar_repeticiones)
+        # Lo que no se pudo escribir, en orden; se reintenta antes que la cola
+        self._pendientes: List = []
+        self.archivo_pendientes = Path(db_manager.db_path).with_name("kiosco_pendientes.jsonl")
+        self.consultas = 0
+        self.ingresos_escritos = 0
+        self.reintentos = 0
+
+    # ── Índice de estados ──────────────────────────────────────────────────
+    def cargar_indice(self):
+        indice = {
+            s['dni']: (s['nombre'], _fecha(s['pagado_hasta']))
+            for s in self.db_manager.registros_socios_con_estado()
+        }
+        with self._indice_lock:
+            self._indice = indice
+        logging.info(f"Servicio kiosco: índice con {len(indice)} socios")
+
+    def _on_cambio(self, evento: CambioDatos):
+        """Suscriptor directo: corre en el hilo que modificó la base."""
+        if evento.entidad == BASE:
+            if evento.accion == RESTAURANDO:
+                self.pausar_escritura()
+            else:
+                self.reanudar_escritura()
+            return
+        dni = evento.clave if evento.entidad == SOCIOS else evento.dni
+        if evento.entidad == SOCIOS and evento.clave_anterior is not None:
+            with self._indice_lock:
+                self._indice.pop(evento.clave_anterior, None)
+            self.reingresos.olvidar(evento.clave_anterior)
+        if dni is None:
+            return
+        self.reingresos.olvidar(dni)
+        socio = self.db_manager.socio_con_estado(dni)
+        with self._indice_lock:
+            if socio is None:
+                self._indice.pop(dni, None)
+            else:
+                self._indice[dni] = (socio['nombre'], _fecha(socio['pagado_hasta']))
+
+    def estado(self, dni: int) -> Dict:
+        with self._indice_lock:
+            entrada = self._indice.get(dni)
+        if entrada is None:
+            return estado_kiosco(None, None, registrado=False)
+        return estado_kiosco(*entrada)
+
+    def salud(self) -> Dict:
+        with self._indice_lock:
+            socios = len(self._indice)
+        return {'ok': True, 'socios': socios,
+                'pendientes': (self._cola.qsize() if self._cola is not None else 0) + len(self._pendientes),
+                'consultas': self.consultas, 'ingresos_escritos': self.ingresos_escritos,
+                'reintentos': self.reintentos,
+                'repeticiones': self.reingresos.repeticiones}
+
+    # ── Consultas ──────────────────────────────────────────────────────────
+    def registrar_consulta(self, dni: int) -> Dict:
+        """Estado del socio + encola el ingreso. Seguro desde cualquier hilo."""
+        self.consultas += 1
+        repetido = self.reingresos.repetido(dni)
+        if repetido is not None:
+            return repetido
+        resultado = self.estado(dni)
+        registrado = resultado['estado'] != 'No registrado'
+        fila = (dni if registrado else None, resultado['nombre'], resultado['estado'],
+                datetime.now().isoformat())
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._cola.put_nowait, fila)
+        else:
+            self.db_manager.registrar_ingresos_lote([fila])
+        self.reingresos.recordar(dni, resultado)
+        return resultado
+
+    def _registrar_repeticiones(self, conteos: Dict[int, int]):
+        # Por la misma cola que los ingresos, para escribirse después de ellos
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._cola.put_nowait, conteos)
+        else:
+            self.db_manager.registrar_repeticiones(conteos)
+
+    # ── Escritura en lote ──────────────────────────────────────────────────
+    async def _escritor(self):
+        lote: List[Tuple] = []
+        espera = base = self.batch_ms / 1000
+        try:
+            while True:
+                if not self._pendientes:
+                    lote.append(await self._cola.get())
+                async with self._escritura:  # en pausa (restauración) espera acá
+                    limite = self._loop.time() + self.batch_ms / 1000
+                    while len(lote) < self.batch_max:
+                        restante = limite - self._loop.time()
+                        if restante <= 0:
+                            break
+                        try:
+                            lote.append(await asyncio.wait_for(self._cola.get(), restante))
+                        except asyncio.TimeoutError:
+                            break
+                    # Vaciar antes de esperar: si se cancela durante la escritura, no se repite
+                    pendiente, lote = lote, []
+                    escrito = await self._escribir(pendiente)
+                if escrito:
+                    espera = base
+                else:
+                    await asyncio.sleep(espera)
+                    espera = min(espera * 2, KIOSK_SERVICE["reintento_max_segundos"])
+        except asyncio.CancelledError:
+            if lote:
+                await self._escribir(lote)
+            raise
+
+    async def _escribir(self, lote: List) -> bool:
+        """Escribe lo pendiente y ``lote``. Si un tramo falla, ese tramo y lo que
+        sigue quedan en ``_pendientes`` para reintentar; retorna si se escribió todo."""
+        # La cola lleva filas de ingresos y conteos de repeticiones {dni: n}. Se
+        # escriben en orden, por tramos, para que cada conteo caiga sobre el
+        # ingreso que repite y no sobre uno posterior.
+        lote, self._pendientes = self._pendientes + lote, []
+        tramos = [list(tramo) for _, tramo in groupby(lote, key=lambda item: isinstance(item, dict))]
+        for i, tramo in enumerate(tramos):
+            try:
+                if isinstance(tramo[0], dict):
+                    conteos: Dict[int, int] = {}
+                    for item in tramo:
+                        for dni, n in item.items():
+                            conteos[dni] = conteos.get(dni, 0) + n
+                    await self._loop.run_in_executor(None, self.db_manager.registrar_repeticiones, conteos)
+                else:
+                    await self._loop.run_in_executor(None, self.db_manager.registrar_ingresos_lote, tramo)
+                    self.ingresos_escritos += len(tramo)
+            except Exception as e:
+                self._pendientes = [item for resto in tramos[i:] for item in resto]
+                self.reintentos += 1
+                logging.warning(f"Servicio kiosco: no se pudieron escribir {len(tramo)} ingreso(s), "
+                                f"se reintenta ({len(self._pendientes)} pendientes): {e}")
+                return False
+        return True
+
+    async def _vaciar_cola(self):
+        lote = []
+        while not self._cola.empty():
+            lote.append(self._cola.get_nowait())
+        if lote or self._pendientes:
+            await self._escribir(lote)
+
+    def _guardar_pendientes(self):
+        """Al detener: lo que no se pudo escribir queda en un archivo junto a la base"""
+        if not self._pendientes:
+            return
+        with open(self.archivo_pendientes, 'a', encoding='utf-8') as f:
+            for item in self._pendientes:
+                f.write(json.dumps({'repeticiones': item} if isinstance(item, dict) else {'ingreso': item}) + "\n")
+        logging.error(f"Servicio kiosco: {len(self._pendientes)} ingreso(s) sin escribir guardados en "
+                      f"{self.archivo_pendientes}; se escriben al volver a iniciar")
+        self._pendientes = []
+
+    def _cargar_pendientes(self):
+        if not self.archivo_pendientes.exists():
+            return
+        with open(self.archivo_pendientes, encoding='utf-8') as f:
+            for linea in f:
+                item = json.loads(linea)
+                if 'repeticiones' in item:
+                    self._pendientes.append({int(dni): n for dni, n in item['repeticiones'].items()})
+                else:
+                    self._pendientes.append(tuple(item['ingreso']))
+        os.remove(self.archivo_pendientes)
+        logging.info(f"Servicio kiosco: {len(self._pendientes)} ingreso(s) pendientes de la sesión anterior")
+
+    async def _pausar(self):
+        await self._escritura.acquire()  # espera a que termine el lote en curso
+        self._pausado = True
+        await self._vaciar_cola()
+
+    def _liberar(self):
+        if self._pausado:
+            self._pausado = False
+            self._escritura.release()
+
+    def pausar_escritura(self, timeout: float = 10):
+        """Escribe lo encolado y deja los ingresos nuevos en la cola hasta reanudar.
+
+        Las consultas se siguen respondiendo desde el índice. Bloquea hasta que
+        la cola quedó escrita (llamar desde otro hilo, no desde el del servicio).
+        """
+        self.reingresos.vaciar()  # sus conteos entran a la cola antes de la pausa
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            return
+        pausa = asyncio.run_coroutine_threadsafe(self._pausar(), loop)
+        try:
+            pausa.result(timeout)
+        except concurrent.futures.TimeoutError:
+            pausa.cancel()
+            logging.warning(f"Servicio kiosco: la escritura no se pausó en {timeout}s; sigue activa")
+
+    def reanudar_escritura(self):
+        """Recarga el índice desde la base y vuelve a escribir la cola"""
+        self.reingresos.descartar()
+        self.cargar_indice()
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            loop.call_soon_threadsafe(self._liberar)
+
+    # ── HTTP ───────────────────────────────────────────────────────────────
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            linea = await reader.readline()
+            partes = linea.decode('latin-1').split()
+            if len(partes) < 2:
+                writer.close()
+                return
+            metodo, ruta = partes[0].upper(), partes[1]
+            largo, token = 0, ''
+            while True:
+                cabecera = await reader.readline()
+                if cabecera in (b'\r\n', b'\n', b''):
+                    break
+                nombre, _, valor = cabecera.decode('latin-1').partition(':')
+                nombre = nombre.strip().lower()
+                if nombre == 'content-length':
+                    largo = int(valor.strip() or 0)
+                elif nombre == 'x-kiosk-token':
+                    token = valor.strip()
+            if not self._autorizado(token):
+                codigo, respuesta = 401, {'error': "Token del kiosco inválido"}
+            elif not 0 <= largo <= KIOSK_SERVICE["max_cuerpo"]:
+                codigo, respuesta = 413, {'error': f"Cuerpo de {largo} bytes (máximo {KIOSK_SERVICE['max_cuerpo']})"}
+            else:
+                cuerpo = await reader.readexactly(largo) if largo else b''
+                codigo, respuesta = self._resolver(metodo, ruta, cuerpo)
+        except Exception as e:
+            codigo, respuesta = 400, {'error': str(e)}
+        datos = json.dumps(respuesta, ensure_ascii=False).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {codigo} {'OK' if codigo == 200 else 'Error'}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(datos)}\r\n"
+            f"Connection: close\r\n\r\n".encode('latin-1') + datos
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    def _autorizado(self, token: str) -> bool:
+        if not self.token:
+            return True  # solo posible escuchando en la propia máquina (ver _verificar_acceso)
+        return hmac.compare_digest(token.encode('utf-8'), self.token.encode('utf-8'))
+
+    def _verificar_acceso(self):
+        if not self.token and not _es_local(self.host):
+            raise ValueError(f"El servicio de kiosco en {self.host} necesita un token "
+                             f"(SOMA_KIOSK_TOKEN) para atender a otras terminales")
+
+    def _resolver(self, metodo: str, ruta: str, cuerpo: bytes) -> Tuple[int, Dict]:
+        if metodo == 'POST' and ruta == '/ingreso':
+            dni = int(json.loads(cuerpo or b'{}')['dni'])
+            return 200, self.registrar_consulta(dni)
+        if metodo == 'GET' and ruta.startswith('/estado/'):
+            return 200, self.estado(int(ruta[len('/estado/'):]))
+        if metodo == 'GET' and ruta == '/salud':
+            return 200, self.salud()
+        return 404, {'error': f"Ruta no encontrada: {metodo} {ruta}"}
+
+    # ── Ciclo de vida ──────────────────────────────────────────────────────
+    async def _principal(self):
+        self._loop = asyncio.get_running_loop()
+        self._cola = asyncio.Queue()
+        self._escritura = asyncio.Lock()
+        self._detener = asyncio.Event()
+        try:
+            servidor = await asyncio.start_server(self._atender, self.host, self.port)
+        except OSError as e:
+            logging.error(f"Servicio kiosco: no se pudo escuchar en {self.host}:{self.port}: {e}")
+            self._loop = None
+            self._listo.set()
+            return
+        self.port = servidor.sockets[0].getsockname()[1]  # el asignado si se pidió el 0
+        self._cargar_pendientes()
+        escritor = asyncio.create_task(self._escritor())
+        logging.info(f"Servicio kiosco escuchando en {self.host}:{self.port}")
+        self._listo.set()
+        try:
+            await self._detener.wait()
+        finally:
+            servidor.close()
+            await servidor.wait_closed()
+            self._liberar()
+            escritor.cancel()
+            try:
+                await escritor
+            except asyncio.CancelledError:
+                pass
+            await self._vaciar_cola()
+            self._guardar_pendientes()
+            self._loop = None
+            self.reingresos.vaciar()
+            logging.info("Servicio kiosco detenido")
+
+    def iniciar(self) -> "KioskService":
+        """Arranca el servicio en un hilo aparte (no bloquea)."""
+        if self._hilo is not None:
+            return self
+        self._verificar_acceso()
+        self.cargar_indice()
+        self.db_manager.suscribir(self._on_cambio, entidades=(SOCIOS, PAGOS, BASE))
+        self._hilo = threading.Thread(target=asyncio.run, args=(self._principal(),),
+                                      name="kiosk-service", daemon=True)
+        self._hilo.start()
+        self._listo.wait(timeout=5)
+        if self._loop is None:
+            self.detener()
+            raise OSError(f"No se pudo abrir el puerto {self.host}:{self.port}")
+        return self
+
+    def servir(self):
+        """Corre el servicio en el hilo actual hasta Ctrl+C."""
+        self._verificar_acceso()
+        self.cargar_indice()
+        self.db_manager.suscribir(self._on_cambio, entidades=(SOCIOS, PAGOS, BASE))
+        try:
+            asyncio.run(self._principal())
+        except KeyboardInterrupt:
+            pass
+
+    def detener(self):
+        """Deja de aceptar consultas y escribe los ingresos pendientes."""
+        self.db_manager.desuscribir(self._on_cambio)
+        loop = self._loop
+        if loop is not None and self._detener is not None:
+            loop.call_soon_threadsafe(self._detener.set)
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)
+            self._hilo = None
+
+
+class KioskClient:
+    """Cliente HTTP para una terminal que no es dueña de la base."""
+
+    def __init__(self, url: Optional[str] = None, timeout: Optional[float] = None,
+                 token: Optional[str] = None):
+        self.url = (url or KIOSK_SERVICE["url"]).rstrip('/')
+        self.timeout = timeout if timeout is not None else KIOSK_SERVICE["timeout"]
+        self.token = KIOSK_SERVICE["token"] if token is None else token
+
+    def _pedir(self, ruta: str, datos: Optional[Dict] = None) -> Dict:
+        cuerpo = json.dumps(datos).encode('utf-8') if datos is not None else None
+        pedido = urllib.request.Request(self.url + ruta, data=cuerpo,
+                                        headers={'Content-Type': 'application/json',
+                                                 'X-Kiosk-Token': self.token})
+        try:
+            with urllib.request.urlopen(pedido, timeout=self.timeout) as respuesta:
+                return json.loads(respuesta.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            raise ConnectionError(f"El servicio de kiosco ({self.url}) rechazó el pedido: "
+                                  f"{e.code} {e.reason}") from e
+        except (urllib.error.URLError, OSError) as e:
+            raise ConnectionError(f"Sin conexión con el servicio de kiosco ({self.url}): {e}") from e
+
+    def consultar(self, dni: int) -> Dict:
+        """Estado del socio; el servicio registra el ingreso."""
+        return self._pedir('/ingreso', {'dni': dni})
+
+    def estado(self, dni: int) -> Dict:
+        return self._pedir(f'/estado/{dni}')
+
+    def salud(self) -> Dict:
+        return self._pedir('/salud')
+
+
+class LoopbackKioskClient:
+    """Misma interfaz que KioskClient pero llamando al servicio en proceso."""
+
+    def __init__(self, service: KioskService):
+        self.service = service
+
+    def consultar(self, dni: int) -> Dict:
+        return self.service.registrar_consulta(dni)
+
+    def estado(self, dni: int) -> Dict:
+        return self.service.estado(dni)
+
+    def salud(self) -> Dict:
+        return self.service.salud()
+
+
+def main():
+    import argparse
+    from .log_manager import iniciar_logging
+
+    parser = argparse.ArgumentParser(description="Servicio de kiosco (HTTP/JSON)")
+    parser.add_argument('--host', default=KIOSK_SERVICE["host"])
+    parser.add_argument('--port', type=int, default=KIOSK_SERVICE["port"])
+    args = parser.parse_args()
+
+    iniciar_logging()
+    KioskService(DatabaseManager(), args.host, args.port).servir()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Historial diario de los KPIs del dashboard (tabla ``kpi_snapshots``).
+
+Una fila por día con lo que devuelve ``DashboardManager._get_kpis``. La tarea
+de mantenimiento ``kpis`` guarda los de hoy (se pisan hasta que el día
+cierra) y completa reconstruyendo los días que falten; el rollup ``kpis``
+(``python -m app rollups kpis``) reconstruye el historial entero desde socios,
+pagos e ingresos. Los días capturados no se pisan al reconstruir: los socios
+borrados ya no cuentan en la reconstrucción.
+
+Con esto el "vs prev." del dashboard y las mini-tendencias son lecturas por
+clave, sin volver a calcular un período completo.
+"""
+import calendar
+import json
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from .config import KPI_CONFIG
+from .expiry import acumular, vigente_desde
+
+CAPTURADO = 'capturado'
+RECONSTRUIDO = 'reconstruido'
+
+
+def dia_comparable(dia: date) -> date:
+    """Mismo día del mes anterior (o su último día): los KPIs del mes en curso
+    se comparan contra el mismo punto del mes pasado"""
+    anio, mes = (dia.year, dia.month - 1) if dia.month > 1 else (dia.year - 1, 12)
+    return date(anio, mes, min(dia.day, calendar.monthrange(anio, mes)[1]))
+
+
+# ── Lectura ────────────────────────────────────────────────────────────────
+def obtener(conn, dia: date) -> Optional[Dict]:
+    """KPIs del día (o del último anterior con foto)"""
+    row = conn.execute('SELECT datos FROM kpi_snapshots WHERE fecha <= ? ORDER BY fecha DESC LIMIT 1',
+                       (dia.isoformat(),)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def serie(conn, desde: date, hasta: date) -> Dict[str, List[float]]:
+    """{kpi: [valor por día con foto, en orden]} entre ``desde`` y ``hasta``"""
+    valores: Dict[str, List[float]] = {}
+    for (datos,) in conn.execute('SELECT datos FROM kpi_snapshots WHERE fecha BETWEEN ? AND ? ORDER BY fecha',
+                                 (desde.isoformat(), hasta.isoformat())):
+        for clave, valor in json.loads(datos).items():
+            valores.setdefault(clave, []).append(valor)
+    return valores
+
+
+def ultimo_dia(conn) -> Optional[date]:
+    row = conn.execute('SELECT MAX(fecha) FROM kpi_snapshots').fetchone()
+    return date.fromisoformat(row[0]) if row[0] else None
+
+
+# ── Escritura ──────────────────────────────────────────────────────────────
+def guardar(conn, dia: date, kpis: Dict, origen: str = CAPTURADO) -> None:
+    conn.execute('''
+        INSERT INTO kpi_snapshots (fecha, datos, origen, calculado) VALUES (?, ?, ?, ?)
+        ON CONFLICT(fecha) DO UPDATE SET datos = excluded.datos, origen = excluded.origen,
+                                         calculado = excluded.calculado
+    ''', (dia.isoformat(), json.dumps(kpis), origen, datetime.now().isoformat(timespec='seconds')))
+
+
+def completar(conn, hoy: date, kpis_hoy: Dict) -> Dict:
+    """Guarda la foto de hoy y reconstruye los días sin foto desde la última
+    (a lo sumo ``KPI_CONFIG['dias_historial']`` hacia atrás)"""
+    desde = hoy - timedelta(days=KPI_CONFIG["dias_historial"])
+    ultimo = ultimo_dia(conn)
+    if ultimo is not None:
+        desde = max(desde, ultimo + timedelta(days=1))
+    reconstruidos = reconstruir(conn, desde, hoy - timedelta(days=1)) if desde < hoy else 0
+    guardar(conn, hoy, kpis_hoy)
+    return {'dia': hoy.isoformat(), 'reconstruidos': reconstruidos}
+
+
+# ── Reconstrucción ─────────────────────────────────────────────────────────
+def reconstruir(conn, desde: Optional[date] = None, hasta: Optional[date] = None) -> int:
+    """Calcula los KPIs al cierre de cada día entre ``desde`` (por defecto el
+    primer dato) y ``hasta`` (por defecto ayer), en una sola pasada por los
+    pagos. Mismas definiciones que ``_get_kpis``. No pisa días capturados.
+    Retorna los días escritos."""
+    hasta = hasta or date.today() - timedelta(days=1)
+    socios = [(dni, _fecha(alta)) for dni, alta in conn.execute('SELECT dni, fecha_alta FROM socios')]
+    pagos = [(dni, _fecha(fecha), meses, monto) for dni, fecha, meses, monto in conn.execute(
+        'SELECT dni, fecha_pago, meses, monto FROM pagos WHERE fecha_pago <= ? ORDER BY fecha_pago, id',
+        (hasta.isoformat(),))]
+    primeros = [alta for _, alta in socios if alta] + [fecha for _, fecha, _, _ in pagos[:1]]
+    if not primeros:
+        return 0
+    desde = max(desde or min(primeros), min(primeros))  # sin días vacíos antes del primer dato
+    if desde > hasta:
+        return 0
+    visitas = _visitas_por_dia(conn, desde - timedelta(days=30), hasta)
+    capturados = {fila[0] for fila in conn.execute(
+        'SELECT fecha FROM kpi_snapshots WHERE origen = ? AND fecha BETWEEN ? AND ?',
+        (CAPTURADO, desde.isoformat(), hasta.isoformat()))}
+    altas = Counter(alta for _, alta in socios if alta)
+    sin_alta = sum(1 for _, alta in socios if alta is None)
+    vigentes = {dni for dni, _ in socios}  # socios que existen hoy
+    alta_de = dict(socios)
+
+    pagado_hasta: Dict[int, date] = {}
+    primer_pago: Dict[int, date] = {}
+    i = 0
+    # Pagos anteriores a ``desde``: solo acumulan
+    while i < len(pagos) and pagos[i][1] < desde:
+        _aplicar(pagos[i], pagado_hasta, primer_pago)
+        i += 1
+    total = sin_alta + sum(n for alta, n in altas.items() if alta < desde)
+    mes, ingresos_mes, nuevos_mes, renovaron = None, 0.0, 0, set()
+
+    escritos = 0
+    dia = desde
+    while dia <= hasta:
+        inicio_mes = dia.replace(day=1)
+        if mes != inicio_mes:
+            # Cambio de mes (o ``desde`` a mitad de mes: lo ya transcurrido del mes)
+            mes, ingresos_mes, nuevos_mes, renovaron = inicio_mes, 0.0, 0, set()
+            if dia > inicio_mes:
+                previos = [p for p in pagos if inicio_mes <= p[1] < dia]
+                ingresos_mes = sum(monto for _, _, _, monto in previos)
+                nuevos_mes = sum(n for alta, n in altas.items() if inicio_mes <= alta < dia)
+                renovaron = {dni for dni, _, _, _ in previos if primer_pago[dni] < inicio_mes}
+        while i < len(pagos) and pagos[i][1] == dia:
+            dni, fecha, _, monto = pagos[i]
+            if primer_pago.get(dni, fecha) < inicio_mes:
+                renovaron.add(dni)
+            _aplicar(pagos[i], pagado_hasta, primer_pago)
+            ingresos_mes += monto
+            i += 1
+        total += altas.get(dia, 0)
+        nuevos_mes += altas.get(dia, 0)
+        limite = vigente_desde(dia)
+        activos = sum(1 for dni, hasta_dni in pagado_hasta.items()
+                      if hasta_dni >= limite and dni in vigentes and (alta_de[dni] or dia) <= dia)
+        if dia.isoformat() not in capturados:
+            guardar(conn, dia, {
+                "total_socios": total,
+                "socios_activos": activos,
+                "socios_inactivos": total - activos,
+                "tasa_actividad": round((activos / total * 100) if total > 0 else 0, 1),
+                "ingresos_mes": ingresos_mes,
+                "nuevos_mes": nuevos_mes,
+                "renovaciones_mes": len(renovaron),
+                "visitas_hoy": visitas.get(dia, 0),
+                "promedio_visitas_diarias": round(_visitas_desde(visitas, dia) / 30.0, 1),
+            }, RECONSTRUIDO)
+            escritos += 1
+        dia += timedelta(days=1)
+    return escritos
+
+
+def _fecha(texto: Optional[str]) -> Optional[date]:
+    return date.fromisoformat(texto[:10]) if texto else None
+
+
+def _aplicar(pago: Tuple, pagado_hasta: Dict[int, date], primer_pago: Dict[int, date]) -> None:
+    dni, fecha, meses, _ = pago
+    pagado_hasta[dni] = acumular([(fecha, meses)], desde=pagado_hasta.get(dni))
+    primer_pago.setdefault(dni, fecha)
+
+
+def _visitas_por_dia(conn, desde: date, hasta: date) -> Dict[date, int]:
+    return {date.fromisoformat(dia): n for dia, n in conn.execute('''
+        SELECT substr(fecha, 1, 10), COUNT(*) FROM ingresos
+        WHERE fecha >= ? AND fecha < ? GROUP BY 1
+    ''', (desde.isoformat(), (hasta + timedelta(days=1)).isoformat()))}
+
+
+def _visitas_desde(visitas: Dict[date, int], dia: date) -> int:
+    """Ingresos desde hace 30 días hasta el cierre de ``dia`` (como el promedio de _get_kpis)"""
+    return sum(visitas.get(dia - timedelta(days=d), 0) for d in range(31))
@@ -0,0 +1,139 @@
+"""Pestañas de la ventana principal que se arman al usarlas.
+
+Cada pestaña se registra con una fábrica ``fabrica(contenedor) -> frame``;
+el frame (y la consulta que hace al crearse) recién se construye la primera
+vez que se elige la pestaña. Mientras la app está sin uso (sin teclado ni
+mouse durante ``TABS_CONFIG['inactividad_ms']``) las pendientes se precargan
+de a una, así el primer clic suele encontrarlas listas.
+
+Tk es de un solo hilo: la precarga corre en el bucle de eventos, una pestaña
+por vez, y se corta si el usuario vuelve a interactuar. El tiempo de carga de
+cada pestaña queda en ``tiempos`` y en el log.
+
+``recargar`` descarta los frames armados (p. ej. después de restaurar un
+backup) para que se vuelvan a construir con los datos nuevos. Un frame con
+método ``al_mostrarse()`` es avisado cada vez que su pestaña pasa a la vista
+(para recalcular lo que dejó pendiente mientras estaba oculto).
+"""
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+from .config import TABS_CONFIG
+
+
+class LazyTabs:
+    def __init__(self, notebook, precarga: Optional[bool] = None):
+        self.notebook = notebook
+        self.precarga = TABS_CONFIG["precarga"] if precarga is None else precarga
+        self._fabricas: Dict[str, Callable] = {}
+        self._precargables: List[str] = []
+        self._recargables: List[str] = []
+        self.frames: Dict[str, object] = {}
+        self.tiempos: Dict[str, Dict] = {}  # nombre -> {'segundos': s, 'origen': 'uso' | 'precarga' | 'recarga'}
+        self._ultima_actividad = time.monotonic()
+        self._precarga_programada = None
+        notebook.configure(command=self._al_cambiar)
+        root = notebook.winfo_toplevel()
+        for evento in ("<KeyPress>", "<ButtonPress>"):
+            root.bind_all(evento, self._actividad, add="+")
+
+    def registrar(self, nombre: str, fabrica: Callable, precargar: bool = True,
+                  recargar: bool = True) -> None:
+        """Agrega la pestaña sin construir su contenido.
+        ``recargar=False``: el frame se conserva en ``recargar()``"""
+        self.notebook.add(nombre)
+        self._fabricas[nombre] = fabrica
+        if precargar:
+            self._precargables.append(nombre)
+        if recargar:
+            self._recargables.append(nombre)
+
+    def obtener(self, nombre: str, origen: str = "uso"):
+        """Frame de la pestaña, construyéndolo si todavía no existe"""
+        frame = self.frames.get(nombre)
+        if frame is not None:
+            return frame
+        inicio = time.perf_counter()
+        frame = self._fabricas[nombre](self.notebook.tab(nombre))
+        frame.pack(fill="both", expand=True)
+        self.frames[nombre] = frame
+        segundos = time.perf_counter() - inicio
+        self.tiempos[nombre] = {'segundos': segundos, 'origen': origen}
+        logging.info(f"Pestaña {nombre} cargada en {segundos * 1000:.0f} ms ({origen})")
+        return frame
+
+    def mostrar(self, nombre: str):
+        """Selecciona la pestaña (construyéndola si hace falta) y devuelve su frame"""
+        frame = self.obtener(nombre)
+        self.notebook.set(nombre)
+        self._avisar_visible()
+        self._programar_precarga()
+        return frame
+
+    def cargada(self, nombre: str) -> bool:
+        return nombre in self.frames
+
+    def visible(self, frame) -> bool:
+        """True si ``frame`` es el de la pestaña elegida"""
+        return frame is not None and self.frames.get(self.notebook.get()) is frame
+
+    def recargar(self) -> None:
+        """Destruye los frames recargables; la pestaña visible se rearma ya y el
+        resto al elegirlas o en la precarga"""
+        for nombre in [n for n in self.frames if n in self._recargables]:
+            self.frames.pop(nombre).destroy()
+            self.tiempos.pop(nombre, None)
+        actual = self.notebook.get()
+        if actual:
+            self.obtener(actual, origen="recarga")
+        self._programar_precarga()
+
+    # ── Eventos ────────────────────────────────────────────────────────────
+    def _al_cambiar(self):
+        try:
+            self.obtener(self.notebook.get())
+            self._avisar_visible()
+        except Exception as e:
+            logging.error(f"Error cargando la pestaña {self.notebook.get()}: {e}", exc_info=True)
+        self._programar_precarga()
+
+    def _avisar_visible(self):
+        al_mostrarse = getattr(self.frames.get(self.notebook.get()), 'al_mostrarse', None)
+        if al_mostrarse is not None:
+            al_mostrarse()
+
+    def _actividad(self, event=None):
+        self._ultima_actividad = time.monotonic()
+
+    # ── Precarga ───────────────────────────────────────────────────────────
+    def _pendientes(self) -> List[str]:
+        return [nombre for nombre in self._precargables if nombre not in self.frames]
+
+    def _programar_precarga(self, demora_ms: Optional[int] = None) -> None:
+        if not self.precarga or self._precarga_programada is not None or not self._pendientes():
+            return
+        demora_ms = TABS_CONFIG["inactividad_ms"] if demora_ms is None else demora_ms
+        self._precarga_programada = self.notebook.after(demora_ms, self._precargar)
+
+    def _precargar(self):
+        self._precarga_programada = None
+        pendientes = self._pendientes()
+        if not pendientes:
+            return
+        inactivo_ms = (time.monotonic() - self._ultima_actividad) * 1000
+        if inactivo_ms < TABS_CONFIG["inactividad_ms"]:
+            # Hubo teclado o mouse: esperar a que vuelva a quedar sin uso
+            self._programar_precarga(int(TABS_CONFIG["inactividad_ms"] - inactivo_ms) + 1)
+            return
+        try:
+            self.obtener(pendientes[0], origen="precarga")
+        except Exception as e:
+            logging.error(f"Error precargando la pestaña {pendientes[0]}: {e}", exc_info=True)
+            self._precargables.remove(pendientes[0])  # queda para cuando se elija
+        self._programar_precarga(TABS_CONFIG["pausa_ms"])
+
+    def resumen(self) -> str:
+        """Tiempos de carga por pestaña, para el log o la consola"""
+        return ", ".join(f"{nombre} {t['segundos'] * 1000:.0f} ms ({t['origen']})"
+                         for nombre, t in self.tiempos.items())
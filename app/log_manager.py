@@ -0,0 +1,206 @@
+"""Pipeline de logging asíncrono.
+
+Los módulos siguen usando ``logging`` normalmente; el handler raíz solo encola
+el registro (QueueHandler) y un hilo aparte (QueueListener) escribe a disco.
+El archivo cambia de nombre al cambiar el día y rota por tamaño. Opcionalmente
+se guarda una copia estructurada en la tabla ``logs`` de SQLite.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import List, Optional
+
+from .config import DB_PATH, LOG_CONFIG, ensure_directories, get_log_filename
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+_handlers: List[logging.Handler] = []
+
+
+class DailyRotatingFileHandler(RotatingFileHandler):
+    """Escribe en logs/sistema_YYYYMMDD.log, cambia de archivo al cambiar
+    la fecha y rota por tamaño dentro del mismo día."""
+
+    def __init__(self, max_bytes: int = 0, backup_count: int = 0, retencion_dias: int = 0):
+        self._fecha = datetime.now().date()
+        self.retencion_dias = retencion_dias
+        super().__init__(get_log_filename(), maxBytes=max_bytes, backupCount=backup_count,
+                         encoding='utf-8', delay=True)
+        self._purgar_antiguos()
+
+    def shouldRollover(self, record) -> bool:
+        if datetime.now().date() != self._fecha:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        hoy = datetime.now().date()
+        if hoy == self._fecha:
+            super().doRollover()
+            return
+        # Cambio de día: abrir el archivo del nuevo día
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self._fecha = hoy
+        self.baseFilename = os.path.abspath(get_log_filename())
+        self._purgar_antiguos()
+
+    def _purgar_antiguos(self):
+        if not self.retencion_dias:
+            return
+        limite = (datetime.now() - timedelta(days=self.retencion_dias)).strftime("%Y%m%d")
+        for archivo in Path(self.baseFilename).parent.glob("sistema_*.log*"):
+            fecha = archivo.name[len("sistema_"):len("sistema_") + 8]
+            if fecha.isdigit() and fecha < limite:
+                try:
+                    archivo.unlink()
+                except OSError:
+                    pass
+
+
+class SQLiteLogHandler(logging.Handler):
+    """Guarda registros como JSON en la tabla logs con inserts en lote.
+
+    El lote se escribe al llegar a ``batch`` registros, cuando pasaron
+    ``flush_segundos`` desde el último lote, o al cerrar.
+    """
+
+    def __init__(self, db_path: str, batch: int = 50, flush_segundos: float = 5,
+                 retencion_dias: int = 90, level=logging.WARNING):
+        super().__init__(level)
+        self.db_path = db_path
+        self.batch = batch
+        self.flush_segundos = flush_segundos
+        self.retencion_dias = retencion_dias
+        self._buffer: list = []
+        self._ultimo_flush = time.monotonic()
+        self._ultima_poda = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _conectar(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    evento TEXT,
+                    detalle TEXT,
+                    fecha DATETIME
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_logs_fecha ON logs(fecha)')
+        return self._conn
+
+    def emit(self, record):
+        try:
+            detalle = {
+                "mensaje": record.getMessage(),
+                "logger": record.name,
+                "modulo": record.module,
+                "linea": record.lineno,
+            }
+            self._buffer.append((
+                record.levelname,
+                json.dumps(detalle, ensure_ascii=False),
+                datetime.fromtimestamp(record.created).isoformat(),
+            ))
+            if (len(self._buffer) >= self.batch
+                    or time.monotonic() - self._ultimo_flush >= self.flush_segundos):
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        if not self._buffer:
+            return
+        filas, self._buffer = self._buffer, []
+        self._ultimo_flush = time.monotonic()
+        try:
+            conn = self._conectar()
+            with conn:
+                conn.executemany('INSERT INTO logs (evento, detalle, fecha) VALUES (?, ?, ?)', filas)
+            self._podar(conn)
+        except sqlite3.Error:
+            # La DB puede estar bloqueada (p. ej. restauración); no perder el lote
+            self._buffer = filas + self._buffer
+
+    def _podar(self, conn: sqlite3.Connection):
+        hoy = datetime.now().date()
+        if not self.retencion_dias or self._ultima_poda == hoy:
+            return
+        limite = (datetime.now() - timedelta(days=self.retencion_dias)).isoformat()
+        with conn:
+            conn.execute('DELETE FROM logs WHERE fecha < ?', (limite,))
+        self._ultima_poda = hoy
+
+    def close(self):
+        try:
+            self.flush()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        finally:
+            super().close()
+
+
+def iniciar_logging(db_path: str = DB_PATH) -> QueueListener:
+    """Configura el logger raíz con QueueHandler y arranca el listener."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+
+    ensure_directories()
+    formatter = logging.Formatter(LOG_CONFIG["format"], datefmt=LOG_CONFIG["datefmt"])
+
+    archivo = DailyRotatingFileHandler(
+        max_bytes=LOG_CONFIG["max_bytes"],
+        backup_count=LOG_CONFIG["backup_count"],
+        retencion_dias=LOG_CONFIG["retencion_dias"],
+    )
+    archivo.setFormatter(formatter)
+    _handlers.append(archivo)
+
+    if LOG_CONFIG.get("sqlite_sink"):
+        _handlers.append(SQLiteLogHandler(
+            db_path,
+            batch=LOG_CONFIG["sqlite_batch"],
+            flush_segundos=LOG_CONFIG["sqlite_flush_segundos"],
+            retencion_dias=LOG_CONFIG["sqlite_retencion_dias"],
+            level=getattr(logging, LOG_CONFIG["sqlite_level"], logging.WARNING),
+        ))
+
+    cola: "queue.Queue" = queue.Queue(-1)
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, LOG_CONFIG["level"], logging.INFO))
+    _queue_handler = QueueHandler(cola)
+    root.addHandler(_queue_handler)
+
+    _listener = QueueListener(cola, *_handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(detener_logging)
+    return _listener
+
+
+def detener_logging():
+    """Vacía la cola y cierra los handlers (idempotente)."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_queue_handler)
+    _queue_handler = None
+    _listener.stop()
+    _listener = None
+    for handler in _handlers:
+        try:
+            handler.close()
+        except Exception:
+            pass
+    _handlers.clear()
@@ -29,52 +29,63 @@ except ImportError:
     import sys
     sys.exit(1)
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import pandas as pd
+from typing import List
 import os
 import sys
 from PIL import Image
 
 try:
-    from .config import get_log_filename, ensure_directories, resource_path, COLORS, POPUP_AUTOCLOSE_SECONDS, SOUNDS, ALERT_CONFIG, FONTS, OWNER_PIN
-    from .db import DatabaseManager
+    from .config import (ensure_directories, resource_path, COLORS, ALERT_CONFIG, ANALYTICS_CONFIG, FONTS,
+                         OWNER_PIN, KIOSK_SERVICE, LISTADOS_CONFIG, BACKUP_CONFIG)
+    from .db import DatabaseManager, FiltroPagos
     from .admin_windows import (AltaSocioWindow, EditarSocioWindow, RegistrarPagoWindow,
                                 EditarPagoWindow, GrupoFamiliarWindow, RegistrarPagoGrupalWindow)
     from .import_export import ImportExportManager
     from .dashboard_manager import DashboardManager
+    from .analytics import calcular_en_segundo_plano
+    from .charts import DonutChart, LineChart, MATPLOTLIB_DISPONIBLE
+    from .log_manager import iniciar_logging, detener_logging
+    from .events import (CambioDatos, TkDispatcher, SOCIOS, PAGOS, INGRESOS, GRUPOS, BASE, DELETE,
+                         RESTAURADA)
+    from .tree_sync import TreeSync
+    from .expiry import vencimiento, vigente
+    from .kiosk_service import KioskService, KioskClient, LoopbackKioskClient
+    from .kiosk import ConsultaKioscoFrame
+    from .lazy_tabs import LazyTabs
+    from .widget_pool import WidgetPool, configurar, fuente
 except ImportError:
     # Fallback para ejecución directa
-    from config import get_log_filename, ensure_directories, resource_path, COLORS, POPUP_AUTOCLOSE_SECONDS, SOUNDS, ALERT_CONFIG, FONTS, OWNER_PIN
-    from db import DatabaseManager
+    from config import (ensure_directories, resource_path, COLORS, ALERT_CONFIG, ANALYTICS_CONFIG, FONTS,
+                        OWNER_PIN, KIOSK_SERVICE, LISTADOS_CONFIG, BACKUP_CONFIG)
+    from db import DatabaseManager, FiltroPagos
     from admin_windows import (AltaSocioWindow, EditarSocioWindow, RegistrarPagoWindow,
                                EditarPagoWindow, GrupoFamiliarWindow, RegistrarPagoGrupalWindow)
     from import_export import ImportExportManager
     from dashboard_manager import DashboardManager
-
-# Configurar logging
+    from analytics import calcular_en_segundo_plano
+    from charts import DonutChart, LineChart, MATPLOTLIB_DISPONIBLE
+    from log_manager import iniciar_logging, detener_logging
+    from events import (CambioDatos, TkDispatcher, SOCIOS, PAGOS, INGRESOS, GRUPOS, BASE, DELETE,
+                        RESTAURADA)
+    from tree_sync import TreeSync
+    from expiry import vencimiento, vigente
+    from kiosk_service import KioskService, KioskClient, LoopbackKioskClient
+    from kiosk import ConsultaKioscoFrame
+    from lazy_tabs import LazyTabs
+    from widget_pool import WidgetPool, configurar, fuente
+
+# Configurar logging (escritura en hilo aparte, rotación diaria)
 ensure_directories()
-logging.basicConfig(
-    filename=get_log_filename(),
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+iniciar_logging()
 
 # Configurar CustomTkinter
 # Modo claro y tema por defecto
 ctk.set_appearance_mode("light")
 ctk.set_default_color_theme("blue")
 
-# Importar winsound para sonidos (solo Windows)
-try:
-    import winsound
-    SOUND_AVAILABLE = True
-except ImportError:
-    SOUND_AVAILABLE = False
-    logging.warning("winsound no disponible - sonidos deshabilitados")
-
 def resource_path(relative_path):
     """Obtiene la ruta absoluta del recurso, funciona para dev y para PyInstaller"""
     try:
@@ -94,197 +105,16 @@ def load_custom_image(image_name, size=(100, 100)):
         logging.warning(f"No se pudo cargar la imagen {image_name}: {e}")
     return None
 
-class ConsultaKioscoFrame(ctk.CTkFrame):
-    def __init__(self, parent, db_manager):
-        super().__init__(parent)
-        self.db_manager = db_manager
-        self.popup_window = None
-        self.after_id = None
-        
-        self.create_widgets()
-    
-    def create_widgets(self):
-        # Contenedor centrado a pantalla completa
-        container = ctk.CTkFrame(self, fg_color="transparent")
-        container.pack(fill="both", expand=True)
-        container.grid_rowconfigure(0, weight=1)
-        container.grid_columnconfigure(0, weight=1)
-
-        inner = ctk.CTkFrame(container, fg_color="transparent")
-        inner.grid(row=0, column=0)
-
-        # Título SOMA Entrenamientos (SOMA en naranja)
-        title_frame = ctk.CTkFrame(inner, fg_color="transparent")
-        title_frame.pack(pady=(0, 20))
-        ctk.CTkLabel(
-            title_frame,
-            text="SOMA",
-            font=ctk.CTkFont(**FONTS['TITLE_LARGE']),
-            text_color=COLORS['SOMA_ORANGE']
-        ).pack(side="left")
-        ctk.CTkLabel(
-            title_frame,
-            text=" Entrenamientos",
-            font=ctk.CTkFont(**FONTS['TITLE_LARGE']),
-            text_color=COLORS['TEXT_DARK']
-        ).pack(side="left")
-
-        # Box de DNI centrado
-        dni_frame = ctk.CTkFrame(inner, fg_color="transparent")
-        dni_frame.pack(pady=10)
-
-        ctk.CTkLabel(
-            dni_frame,
-            text="Ingrese su DNI:",
-            font=ctk.CTkFont(**FONTS['BODY_LARGE'])
-        ).pack(pady=(0, 10))
-
-        self.dni_entry = ctk.CTkEntry(
-            dni_frame,
-            placeholder_text="12345678",
-            font=ctk.CTkFont(**FONTS['HEADER']),
-            width=360,
-            height=56,
-            justify="center"
-        )
-        self.dni_entry.pack(pady=10)
-
-        # Bind Enter para consultar
-        self.dni_entry.bind('<Return>', self.consultar_estado)
-
-        # Instrucciones
-        ctk.CTkLabel(
-            inner,
-            text="Presione ENTER para consultar su estado",
-            font=ctk.CTkFont(**FONTS['BODY_MEDIUM']),
-            text_color="gray"
-        ).pack(pady=(12, 0))
-
-        # Focus inicial
-        self.after(100, lambda: self.dni_entry.focus())
-    
-    def consultar_estado(self, event=None):
-        dni_text = self.dni_entry.get().strip()
-        
-        if not dni_text:
-            return
-        
-        if not dni_text.isdigit():
-            self.mostrar_popup("Error", "DNI inválido", COLORS['EXPIRED_RED'], "❌")
-            return
-        
-        dni = int(dni_text)
-        
-        try:
-            # Consultar estado
-            resultado = self.db_manager.consultar_estado_socio(dni)
-            
-            # Registrar consulta en ingresos
-            self.db_manager.registrar_ingreso(
-                dni if resultado['estado'] != 'No registrado' else None,
-                resultado['nombre'],
-                resultado['estado']
-            )
-            
-            # Mostrar resultado
-            if resultado['estado'] == 'Activo':
-                mensaje = f"CUOTA ACTIVA\n\n{resultado['nombre']}\nVence: {resultado['fecha_vencimiento']}"
-                self.mostrar_popup("ACTIVO", mensaje, COLORS['ACTIVE_GREEN'], "✅")
-                self.reproducir_sonido('ACTIVE')
-                
-            elif resultado['estado'] == 'Vencido':
-                fecha_venc = resultado['fecha_vencimiento'] or "Sin pagos"
-                mensaje = f"CUOTA VENCIDA\n\n{resultado['nombre']}\nÚltimo vencimiento: {fecha_venc}"
-                self.mostrar_popup("VENCIDO", mensaje, COLORS['EXPIRED_RED'], "❌")
-                self.reproducir_sonido('EXPIRED')
-                
-            else:  # No registrado
-                mensaje = "DNI NO REGISTRADO\n\nConsulte en recepción"
-                self.mostrar_popup("NO REGISTRADO", mensaje, COLORS['WARNING_AMBER'], "⚠️")
-                self.reproducir_sonido('NOT_REGISTERED')
-        
-        except Exception as e:
-            logging.error(f"Error en consulta: {e}")
-            self.mostrar_popup("Error", "Error en la consulta", COLORS['EXPIRED_RED'], "❌")
-    
-    def mostrar_popup(self, titulo, mensaje, color, icono):
-        # Cerrar popup anterior si existe
-        if self.popup_window:
-            self.popup_window.destroy()
-        
-        if self.after_id:
-            self.after_cancel(self.after_id)
-        
-        # Crear popup grande y centrado (no pantalla completa)
-        self.popup_window = ctk.CTkToplevel(self)
-        self.popup_window.title(titulo)
-        self.popup_window.transient(self)
-        self.popup_window.grab_set()
-        # Calcular tamaño ~90% de la pantalla y centrar
-        self.popup_window.update_idletasks()
-        sw = self.popup_window.winfo_screenwidth()
-        sh = self.popup_window.winfo_screenheight()
-        width = int(sw * 0.9)
-        height = int(sh * 0.85)
-        x = (sw - width) // 2
-        y = (sh - height) // 2
-        self.popup_window.geometry(f"{width}x{height}+{x}+{y}")
-        
-        # Frame principal y contenido centrado
-        main_frame = ctk.CTkFrame(self.popup_window, fg_color=color)
-        main_frame.pack(fill="both", expand=True, padx=30, pady=30)
-
-        content = ctk.CTkFrame(main_frame, fg_color="transparent")
-        content.place(relx=0.5, rely=0.5, anchor="center")
-
-        # Icono y título
-        ctk.CTkLabel(
-            content, text=icono, font=ctk.CTkFont(**FONTS['TITLE_LARGE'])
-        ).pack(pady=(10, 10))
-
-        # Mensaje principal
-        ctk.CTkLabel(
-            content, text=mensaje, font=ctk.CTkFont(**FONTS['TITLE_SMALL']), text_color="white"
-        ).pack(pady=10)
-        
-        # Auto-cerrar después de 3 segundos (config o mínimo 3)
-        try:
-            seconds = max(2, int(POPUP_AUTOCLOSE_SECONDS))
-        except Exception:
-            seconds = 2
-        self.after_id = self.after(seconds * 1000, self.cerrar_popup)
-    
-    def cerrar_popup(self):
-        if self.popup_window:
-            self.popup_window.destroy()
-            self.popup_window = None
-        
-        if self.after_id:
-            self.after_cancel(self.after_id)
-            self.after_id = None
-        
-        # Limpiar entry y devolver foco
-        self.dni_entry.delete(0, 'end')
-        self.dni_entry.focus()
-    
-    def reproducir_sonido(self, tipo):
-        if not SOUND_AVAILABLE:
-            return
-        
-        try:
-            if tipo == 'ACTIVE':
-                freq, duration = SOUNDS['ACTIVE']
-                winsound.Beep(freq, duration)
-            elif tipo == 'EXPIRED':
-                for freq, duration in SOUNDS['EXPIRED']:
-                    winsound.Beep(freq, duration)
-                    if len(SOUNDS['EXPIRED']) > 1:
-                        self.after(100)  # Pausa entre beeps
-            elif tipo == 'NOT_REGISTERED':
-                freq, duration = SOUNDS['NOT_REGISTERED']
-                winsound.Beep(freq, duration)
-        except Exception as e:
-            logging.warning(f"Error reproduciendo sonido: {e}")
+def sparkline(valores, ancho=14):
+    """Mini-tendencia en texto (▁▂▃▄▅▆▇█) con los últimos ``ancho`` valores"""
+    valores = [float(v or 0) for v in valores][-ancho:]
+    if len(valores) < 2:
+        return ""
+    bajo, alto = min(valores), max(valores)
+    barras = "▁▂▃▄▅▆▇█"
+    if alto == bajo:
+        return barras[3] * len(valores)
+    return "".join(barras[round((v - bajo) / (alto - bajo) * (len(barras) - 1))] for v in valores)
 
 class SociosFrame(ctk.CTkFrame):
     def __init__(self, parent, db_manager):
@@ -293,6 +123,7 @@ class SociosFrame(ctk.CTkFrame):
         
         self.create_widgets()
         self.cargar_socios()
+        TkDispatcher(self, self.db_manager.eventos, self._on_cambios, entidades=(SOCIOS, PAGOS, INGRESOS))
     
     def create_widgets(self):
         # Frame superior con controles
@@ -350,17 +181,12 @@ class SociosFrame(ctk.CTkFrame):
         table_frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
         
         # Treeview con scrollbar
-        columns = ("DNI", "Nombre", "Email", "Último Pago", "Estado", "Vencimiento", "Grupo", "Acciones")
+        columns = ("DNI", "Nombre", "Email", "Último Pago", "Estado", "Vencimiento", "Última Visita", "Grupo", "Acciones")
         self.tree = ttk.Treeview(table_frame, columns=columns, show="headings", height=15)
 
-        # Configurar columnas
-        self.tree.heading("DNI", text="DNI")
-        self.tree.heading("Nombre", text="Nombre")
-        self.tree.heading("Email", text="Email")
-        self.tree.heading("Último Pago", text="Último Pago")
-        self.tree.heading("Estado", text="Estado")
-        self.tree.heading("Vencimiento", text="Vencimiento")
-        self.tree.heading("Grupo", text="Grupo")
+        # Configurar columnas (click en el encabezado ordena por esa columna)
+        for col in columns[:-1]:
+            self.tree.heading(col, text=col, command=lambda c=col: self.ordenar_por(c))
         self.tree.heading("Acciones", text="Acciones")
 
         # Ancho de columnas
@@ -370,6 +196,7 @@ class SociosFrame(ctk.CTkFrame):
         self.tree.column("Último Pago", width=105)
         self.tree.column("Estado", width=90)
         self.tree.column("Vencimiento", width=105)
+        self.tree.column("Última Visita", width=125)
         self.tree.column("Grupo", width=120)
         self.tree.column("Acciones", width=120)
         
@@ -381,6 +208,10 @@ class SociosFrame(ctk.CTkFrame):
         self.tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
+        # Filas identificadas por DNI, mismo orden que socios_con_estado
+        self._sync = TreeSync(self.tree, lambda dni, v: (v[1], dni))
+        self._orden_columna, self._orden_desc = "Nombre", False
+
         # Bind doble click
         self.tree.bind("<Double-1>", self.editar_socio_seleccionado)
         
@@ -388,87 +219,101 @@ class SociosFrame(ctk.CTkFrame):
         self.tree.bind("<Button-3>", self.mostrar_menu_contextual)
     
     def cargar_socios(self):
-        # Limpiar tabla
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
+        """Recarga completa de la tabla (respeta los filtros actuales)"""
         try:
-            socios = self.db_manager.socios_con_estado()
-            
-            for socio in socios:
-                # Formatear datos
-                dni = socio['dni']
-                nombre = socio['nombre']
-                email = socio['email'] or ""
-                ultimo_pago = socio['ultimo_pago'] or "Sin pagos"
-                estado = socio['estado']
-                vencimiento = socio['fecha_vencimiento'] or ""
-                grupo = socio.get('grupo_nombre') or "—"
-
-                # Insertar en tabla
-                item = self.tree.insert("", "end", values=(
-                    dni, nombre, email, ultimo_pago, estado, vencimiento, grupo, "Ver acciones"
-                ))
-
-                # Colorear según estado
-                if estado == "Activo":
-                    self.tree.set(item, "Estado", "✅ Activo")
-                else:
-                    self.tree.set(item, "Estado", "❌ Vencido")
-        
+            socios = self.db_manager.registros_socios_con_estado()
+            self._sync.cargar(
+                (socio['dni'], self._fila_socio(socio))
+                for socio in socios if self._pasa_filtro(socio)
+            )
         except Exception as e:
             logging.error(f"Error cargando socios: {e}")
             messagebox.showerror("Error", f"Error al cargar socios: {str(e)}")
-    
+
     def filtrar_socios(self, event=None):
-        # Obtener filtros
-        busqueda = self.search_entry.get().lower()
-        estado_filtro = self.estado_filter.get()
-        
-        # Limpiar tabla
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
         try:
-            socios = self.db_manager.socios_con_estado()
-            
-            for socio in socios:
-                # Aplicar filtros
-                if busqueda:
-                    if (busqueda not in str(socio['dni']) and 
-                        busqueda not in socio['nombre'].lower()):
-                        continue
-                
-                if estado_filtro != "Todos":
-                    if estado_filtro == "Activos" and socio['estado'] != "Activo":
-                        continue
-                    if estado_filtro == "Vencidos" and socio['estado'] != "Vencido":
-                        continue
-                
-                # Insertar en tabla
-                dni = socio['dni']
-                nombre = socio['nombre']
-                email = socio['email'] or ""
-                ultimo_pago = socio['ultimo_pago'] or "Sin pagos"
-                estado = socio['estado']
-                vencimiento = socio['fecha_vencimiento'] or ""
-                grupo = socio.get('grupo_nombre') or "—"
-
-                item = self.tree.insert("", "end", values=(
-                    dni, nombre, email, ultimo_pago, estado, vencimiento, grupo, "Ver acciones"
-                ))
+            socios = self.db_manager.registros_socios_con_estado()
+            self._sync.cargar(
+                (socio['dni'], self._fila_socio(socio))
+                for socio in socios if self._pasa_filtro(socio)
+            )
+        except Exception as e:
+            logging.error(f"Error filtrando socios: {e}")
+
+    def ordenar_por(self, columna):
+        """Ordena la tabla por la columna clickeada; un segundo click invierte el orden"""
+        self._orden_desc = not self._orden_desc if columna == self._orden_columna else False
+        self._orden_columna = columna
+        indice = self.tree["columns"].index(columna)
+        if columna == "Última Visita":
+            # Sin visitas ("Nunca") primero en orden ascendente
+            key = lambda dni, v: (v[indice] if v[indice] != "Nunca" else "", v[1], dni)
+        else:
+            key = lambda dni, v: (v[indice], v[1], dni)
+        self._sync.reordenar(key, reverse=self._orden_desc)
 
-                # Colorear según estado
-                if estado == "Activo":
-                    self.tree.set(item, "Estado", "✅ Activo")
+    @staticmethod
+    def _fila_socio(socio):
+        estado = "✅ Activo" if socio['estado'] == "Activo" else "❌ Vencido"
+        ultima_visita = socio.get('ultima_visita')
+        return (
+            socio['dni'], socio['nombre'], socio['email'] or "",
+            socio['ultimo_pago'] or "Sin pagos", estado,
+            socio['fecha_vencimiento'] or "",
+            ultima_visita[:16].replace('T', ' ') if ultima_visita else "Nunca",
+            socio.get('grupo_nombre') or "—",
+            "Ver acciones"
+        )
+
+    def _pasa_filtro(self, socio) -> bool:
+        busqueda = self.search_entry.get().lower()
+        if busqueda:
+            if (busqueda not in str(socio['dni']) and
+                busqueda not in socio['nombre'].lower()):
+                return False
+        estado_filtro = self.estado_filter.get()
+        if estado_filtro == "Activos" and socio['estado'] != "Activo":
+            return False
+        if estado_filtro == "Vencidos" and socio['estado'] != "Vencido":
+            return False
+        return True
+
+    def _refrescar_socio(self, dni):
+        """Vuelve a leer un socio y actualiza, inserta o quita solo su fila"""
+        socio = self.db_manager.socio_con_estado(dni)
+        if socio and self._pasa_filtro(socio):
+            self._sync.upsert(dni, self._fila_socio(socio))
+        else:
+            self._sync.eliminar(dni)
+
+    def _on_cambios(self, eventos: List[CambioDatos]):
+        eliminados, a_refrescar = set(), {}
+        for evento in eventos:
+            if evento.entidad == SOCIOS:
+                if evento.clave_anterior is not None:
+                    eliminados.add(evento.clave_anterior)
+                if evento.accion == DELETE:
+                    eliminados.add(evento.clave)
+                    a_refrescar.pop(evento.clave, None)
                 else:
-                    self.tree.set(item, "Estado", "❌ Vencido")
-        
+                    a_refrescar[evento.clave] = True
+            elif evento.entidad == PAGOS and evento.dni is not None:
+                # Los pagos definen el vencimiento acumulado del socio
+                a_refrescar[evento.dni] = True
+                if evento.clave_anterior is not None:
+                    a_refrescar[evento.clave_anterior] = True
+            elif evento.entidad == INGRESOS and evento.dni is not None:
+                a_refrescar[evento.dni] = True  # última visita
+        try:
+            for dni in eliminados:
+                self._sync.eliminar(dni)
+            for dni in a_refrescar:
+                self._refrescar_socio(dni)
         except Exception as e:
-            logging.error(f"Error filtrando socios: {e}")
-    
+            logging.error(f"Error actualizando filas de socios: {e}")
+
     def nuevo_socio(self):
-        AltaSocioWindow(self, self.db_manager, callback=self.cargar_socios)
+        AltaSocioWindow(self, self.db_manager)
     
     def editar_socio_seleccionado(self, event=None):
         selection = self.tree.selection()
@@ -478,7 +323,7 @@ class SociosFrame(ctk.CTkFrame):
         item = selection[0]
         dni = self.tree.item(item)['values'][0]
         
-        EditarSocioWindow(self, self.db_manager, dni, callback=self.cargar_socios)
+        EditarSocioWindow(self, self.db_manager, dni)
     
     def mostrar_menu_contextual(self, event):
         selection = self.tree.selection()
@@ -504,10 +349,10 @@ class SociosFrame(ctk.CTkFrame):
             menu.grab_release()
     
     def editar_socio(self, dni):
-        EditarSocioWindow(self, self.db_manager, dni, callback=self.cargar_socios)
+        EditarSocioWindow(self, self.db_manager, dni)
     
     def registrar_pago(self, dni):
-        RegistrarPagoWindow(self, self.db_manager, dni, callback=self.cargar_socios)
+        RegistrarPagoWindow(self, self.db_manager, dni)
     
     def ver_historial(self, dni):
         try:
@@ -609,14 +454,13 @@ class SociosFrame(ctk.CTkFrame):
         try:
             self.db_manager.eliminar_socio_y_pagos(dni)
             messagebox.showinfo("Éxito", f"Socio {nombre} eliminado correctamente")
-            self.cargar_socios()
         except Exception as e:
             logging.error(f"Error eliminando socio: {e}")
             messagebox.showerror("Error", f"Error al eliminar socio: {str(e)}")
 
     def abrir_gestion_grupos(self):
         """Abre la ventana de gestión de grupos familiares."""
-        GruposFamiliaresManagerWindow(self, self.db_manager, callback=self.cargar_socios)
+        GruposFamiliaresManagerWindow(self, self.db_manager)
 
 
 class GruposFamiliaresManagerWindow:
@@ -638,6 +482,7 @@ class GruposFamiliaresManagerWindow:
 
         self._create_widgets()
         self._cargar_grupos()
+        TkDispatcher(self.window, self.db_manager.eventos, self._on_cambios, entidades=(GRUPOS,))
 
     def _create_widgets(self):
         # Encabezado
@@ -671,6 +516,8 @@ class GruposFamiliaresManagerWindow:
         self.grupos_tree.pack(side="left", fill="both", expand=True)
         sb.pack(side="right", fill="y")
 
+        self._sync = TreeSync(self.grupos_tree, lambda gid, v: (v[1], gid))
+
         self.grupos_tree.bind("<Double-1>", lambda e: self._editar_grupo_seleccionado())
         self.grupos_tree.bind("<Button-3>", self._menu_contextual)
 
@@ -693,13 +540,23 @@ class GruposFamiliaresManagerWindow:
                       width=100).pack(side="right")
 
     def _cargar_grupos(self):
-        for item in self.grupos_tree.get_children():
-            self.grupos_tree.delete(item)
-        for g in self.db_manager.listar_grupos():
-            precio = f"${g['precio_especial']:.2f}" if g['precio_especial'] else "—"
-            self.grupos_tree.insert("", "end", values=(
-                g['id'], g['nombre'], g['cantidad_miembros'], precio
-            ))
+        self._sync.cargar((g['id'], self._fila_grupo(g)) for g in self.db_manager.listar_grupos())
+
+    @staticmethod
+    def _fila_grupo(g):
+        precio = f"${g['precio_especial']:.2f}" if g['precio_especial'] else "—"
+        return (g['id'], g['nombre'], g['cantidad_miembros'], precio)
+
+    def _on_cambios(self, eventos: List[CambioDatos]):
+        try:
+            for evento in eventos:
+                grupo = None if evento.accion == DELETE else self.db_manager.obtener_grupo_resumen(evento.clave)
+                if grupo:
+                    self._sync.upsert(grupo['id'], self._fila_grupo(grupo))
+                else:
+                    self._sync.eliminar(evento.clave)
+        except Exception as e:
+            logging.error(f"Error actualizando filas de grupos: {e}")
 
     def _get_grupo_seleccionado(self):
         sel = self.grupos_tree.selection()
@@ -763,7 +620,7 @@ class GruposFamiliaresManagerWindow:
             menu.grab_release()
 
     def _on_cambio(self):
-        self._cargar_grupos()
+        # Las filas ya se actualizaron por los eventos de la base
         if self.callback:
             self.callback()
 
@@ -773,6 +630,7 @@ class IngresosFrame(ctk.CTkFrame):
         super().__init__(parent)
         self.db_manager = db_manager
         self.import_export = ImportExportManager(db_manager)
+        self._busqueda_pendiente = None
         
         self.create_widgets()
         self.cargar_ingresos()
@@ -801,7 +659,7 @@ class IngresosFrame(ctk.CTkFrame):
         ctk.CTkLabel(filter_frame, text="Buscar:", font=ctk.CTkFont(**FONTS['LABEL'])).pack(side="left", padx=(10, 5), pady=10)
         self.search_entry = ctk.CTkEntry(filter_frame, placeholder_text="DNI o nombre...", font=ctk.CTkFont(**FONTS['INPUT']))
         self.search_entry.pack(side="left", padx=5, pady=10)
-        self.search_entry.bind('<KeyRelease>', self.filtrar_ingresos)
+        self.search_entry.bind('<KeyRelease>', self._programar_filtro)
         
         # Filtros de fecha
         ctk.CTkLabel(filter_frame, text="Desde:").pack(side="left", padx=(20, 5), pady=10)
@@ -848,38 +706,41 @@ class IngresosFrame(ctk.CTkFrame):
         self.tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
     
+    # Estado con emoji
+    ESTADOS = {"Activo": "✅ Activo", "Vencido": "❌ Vencido"}
+
+    @staticmethod
+    def _fila_ingreso(ingreso):
+        # fecha_hora llega formateada desde la consulta (registros_ingresos)
+        estado_display = IngresosFrame.ESTADOS.get(ingreso['estado'], "⚠️ No registrado")
+        return (ingreso['fecha_hora'], ingreso['dni'] or "", ingreso['nombre'] or "", estado_display)
+
+    def _poblar_ingresos(self, ingresos):
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        insertar = self.tree.insert
+        for ingreso in ingresos:
+            insertar("", "end", values=self._fila_ingreso(ingreso))
+
     def cargar_ingresos(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
         try:
-            ingresos = self.db_manager.listar_ingresos()
-            
-            for ingreso in ingresos:
-                # Formatear fecha
-                fecha_dt = datetime.fromisoformat(ingreso['fecha'])
-                fecha_str = fecha_dt.strftime('%Y-%m-%d %H:%M:%S')
-                
-                dni = ingreso['dni'] or ""
-                nombre = ingreso['nombre'] or ""
-                estado = ingreso['estado']
-                
-                # Agregar emoji según estado
-                if estado == "Activo":
-                    estado_display = "✅ Activo"
-                elif estado == "Vencido":
-                    estado_display = "❌ Vencido"
-                else:
-                    estado_display = "⚠️ No registrado"
-                
-                self.tree.insert("", "end", values=(fecha_str, dni, nombre, estado_display))
-        
+            self._poblar_ingresos(self.db_manager.registros_ingresos())
         except Exception as e:
             logging.error(f"Error cargando ingresos: {e}")
             messagebox.showerror("Error", f"Error al cargar ingresos: {str(e)}")
     
+    def _programar_filtro(self, event=None):
+        """Filtra cuando se deja de tipear (una consulta por ráfaga de teclas)"""
+        if self._busqueda_pendiente is not None:
+            self.after_cancel(self._busqueda_pendiente)
+        self._busqueda_pendiente = self.after(LISTADOS_CONFIG['debounce_ms'], self.filtrar_ingresos)
+
     def filtrar_ingresos(self, event=None):
-        busqueda = self.search_entry.get().lower()
+        if self._busqueda_pendiente is not None:
+            self.after_cancel(self._busqueda_pendiente)
+            self._busqueda_pendiente = None
+        busqueda = self.search_entry.get().strip()
         fecha_desde = self.fecha_desde.get().strip() or None
         fecha_hasta = self.fecha_hasta.get().strip() or None
         
@@ -898,30 +759,8 @@ class IngresosFrame(ctk.CTkFrame):
                 messagebox.showerror("Error", "Fecha 'Hasta' debe tener formato YYYY-MM-DD")
                 return
         
-        # Limpiar tabla
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
         try:
-            ingresos = self.db_manager.listar_ingresos(fecha_desde, fecha_hasta, busqueda)
-            
-            for ingreso in ingresos:
-                fecha_dt = datetime.fromisoformat(ingreso['fecha'])
-                fecha_str = fecha_dt.strftime('%Y-%m-%d %H:%M:%S')
-                
-                dni = ingreso['dni'] or ""
-                nombre = ingreso['nombre'] or ""
-                estado = ingreso['estado']
-                
-                if estado == "Activo":
-                    estado_display = "✅ Activo"
-                elif estado == "Vencido":
-                    estado_display = "❌ Vencido"
-                else:
-                    estado_display = "⚠️ No registrado"
-                
-                self.tree.insert("", "end", values=(fecha_str, dni, nombre, estado_display))
-        
+            self._poblar_ingresos(self.db_manager.registros_ingresos(fecha_desde, fecha_hasta, busqueda))
         except Exception as e:
             logging.error(f"Error filtrando ingresos: {e}")
             messagebox.showerror("Error", f"Error al filtrar ingresos: {str(e)}")
@@ -940,18 +779,26 @@ class ReportesFrame(ctk.CTkFrame):
     def __init__(self, parent, db_manager):
         super().__init__(parent)
         self.db_manager = db_manager
-        self.dashboard_manager = DashboardManager(db_manager.db_path)
+        self.dashboard_manager = DashboardManager(db_manager.db_path, db_manager.vencimientos)
         self.dashboard_data = {}
         self.selected_range = '30d'
         self.last_update_label = None
-        self.kpi_chart_canvas = None
-        self.kpi_chart_figure = None
         self.kpi_chart_holder = None
-        self._nav = {'notebook': None, 'socios': None, 'ingresos': None}
+        self.kpi_chart = None
+        self.income_line_chart = None
+        self.payment_methods_chart = None
+        self._nav = None
+        self._analitica_future = None
+        self._analitica_pendiente = False
+        self._analitica_sucia = False
+        self._refresco_id = None
+        self._refresco_pendiente = False
         
         self.create_widgets()
         self.actualizar_dashboard()
+        self.actualizar_analitica()
         self.schedule_dashboard_refresh()
+        TkDispatcher(self, self.db_manager.eventos, self._on_cambios, entidades=(SOCIOS, PAGOS, INGRESOS, GRUPOS))
     
     def _section_title(self, parent, texto):
         """Helper: título de sección con barra naranja a la izquierda."""
@@ -983,7 +830,7 @@ class ReportesFrame(ctk.CTkFrame):
         self.last_update_label.pack(side="left", padx=4)
 
         refresh_btn = ctk.CTkButton(control_frame, text="↺  Actualizar",
-                                    command=self.actualizar_dashboard,
+                                    command=self.refrescar_completo,
                                     fg_color=COLORS['SOMA_ORANGE'],
                                     hover_color=COLORS['SOMA_ORANGE_DARK'],
                                     font=ctk.CTkFont(size=12, weight="bold"),
@@ -1008,6 +855,8 @@ class ReportesFrame(ctk.CTkFrame):
         
         # Frame de KPIs
         self.create_kpis_frame_v2()
+
+        self.create_analytics_frame()
         
         self.create_quick_actions_frame()
         
@@ -1027,9 +876,11 @@ class ReportesFrame(ctk.CTkFrame):
         self.alerts_scroll.pack(fill="x", padx=5, pady=(0, 6))
 
         self.no_alerts_label = ctk.CTkLabel(self.alerts_scroll,
-                                            text="No hay alertas en este momento",
+                                            text="✅ No hay alertas en este momento",
                                             text_color=COLORS['TEXT_SECONDARY'])
-        self.no_alerts_label.pack(pady=18)
+        self.alerts_pool = WidgetPool(self.alerts_scroll, self.create_alert_widget, self.update_alert_widget,
+                                      pack=dict(fill="x", padx=5, pady=2),
+                                      vacio=self.no_alerts_label, vacio_pack=dict(pady=20))
     
     def create_quick_actions_frame(self):
         actions_frame = ctk.CTkFrame(self, fg_color="transparent")
@@ -1040,10 +891,15 @@ class ReportesFrame(ctk.CTkFrame):
         self.actions_container = ctk.CTkFrame(actions_frame, fg_color="transparent")
         self.actions_container.pack(fill="x", padx=5, pady=(0, 6))
 
-        self.no_actions_label = ctk.CTkLabel(self.actions_container,
+        actions_row = ctk.CTkFrame(self.actions_container, fg_color="transparent")
+        actions_row.pack(fill="x", pady=10)
+
+        self.no_actions_label = ctk.CTkLabel(actions_row,
                                              text="No hay acciones sugeridas",
                                              text_color=COLORS['TEXT_SECONDARY'])
-        self.no_actions_label.pack(pady=16)
+        self.actions_pool = WidgetPool(actions_row, self.create_action_button, self.update_action_button,
+                                       pack=dict(side="left", padx=5, fill="x", expand=True),
+                                       vacio=self.no_actions_label, vacio_pack=dict(expand=True, pady=10))
     
     def create_recent_activity_frame(self):
         activity_frame = ctk.CTkFrame(self, fg_color="transparent")
@@ -1060,7 +916,9 @@ class ReportesFrame(ctk.CTkFrame):
         self.no_activity_label = ctk.CTkLabel(self.activity_scroll,
                                               text="No hay actividad reciente",
                                               text_color=COLORS['TEXT_SECONDARY'])
-        self.no_activity_label.pack(pady=20)
+        self.activity_pool = WidgetPool(self.activity_scroll, self.create_activity_item, self.update_activity_item,
+                                        pack=dict(fill="x", padx=5, pady=2),
+                                        vacio=self.no_activity_label, vacio_pack=dict(pady=20))
 
     def create_kpis_frame_v2(self):
         kpis_frame = ctk.CTkFrame(self, fg_color="transparent")
@@ -1127,6 +985,71 @@ class ReportesFrame(ctk.CTkFrame):
                                                border_width=1, border_color=COLORS['BORDER_SUBTLE'])
         self.income_line_holder.pack(fill='both', expand=True, padx=5, pady=(0, 8))
 
+    def create_analytics_frame(self):
+        analytics_frame = ctk.CTkFrame(self, fg_color="transparent")
+        analytics_frame.pack(fill="x", padx=10, pady=(0, 6))
+
+        self._section_title(analytics_frame, "🔁  Retención y cohortes")
+
+        row = ctk.CTkFrame(analytics_frame, fg_color="transparent")
+        row.pack(fill="x", padx=5, pady=4)
+        self.churn_card = self.create_kpi_card_interactive(row, "Churn Mensual", "—", COLORS['EXPIRED_RED'])
+        self.churn_card.pack(side="left", padx=4, fill="x", expand=True)
+        self.pagos_en_fecha_card = self.create_kpi_card_interactive(row, "Pagos en Fecha", "—", COLORS['ACTIVE_GREEN'])
+        self.pagos_en_fecha_card.pack(side="left", padx=4, fill="x", expand=True)
+        self.ltv_card = self.create_kpi_card_interactive(row, "Valor por Socio (LTV)", "—", COLORS['SOMA_ORANGE'])
+        self.ltv_card.pack(side="left", padx=4, fill="x", expand=True)
+        self.permanencia_card = self.create_kpi_card_interactive(row, "Permanencia Promedio", "—", COLORS['INFO_BLUE'])
+        self.permanencia_card.pack(side="left", padx=4, fill="x", expand=True)
+
+        # Tabla de cohortes: % de cada cohorte que sigue activa N meses después
+        meses = [f"M{k}" for k in range(ANALYTICS_CONFIG['meses_retencion'])]
+        columns = ("Cohorte", "Socios", *meses)
+        self.cohortes_tree = ttk.Treeview(analytics_frame, columns=columns, show="headings",
+                                          height=min(ANALYTICS_CONFIG['cohortes_visibles'], 8))
+        for col in columns:
+            self.cohortes_tree.heading(col, text=col)
+            self.cohortes_tree.column(col, width=80, anchor="center")
+        self.cohortes_tree.pack(fill="x", padx=9, pady=(4, 8))
+
+    def actualizar_analitica(self):
+        """Recalcula la analítica en el hilo de fondo y la muestra al terminar"""
+        if self._analitica_future is not None and not self._analitica_future.done():
+            self._analitica_pendiente = True
+            return
+        self._analitica_pendiente = False
+        self._analitica_future = calcular_en_segundo_plano(self.db_manager.db_path)
+        self.after(ANALYTICS_CONFIG['poll_ms'], self._recoger_analitica)
+
+    def _recoger_analitica(self):
+        future = self._analitica_future
+        if not future.done():
+            self.after(ANALYTICS_CONFIG['poll_ms'], self._recoger_analitica)
+            return
+        try:
+            self._mostrar_analitica(future.result())
+        except Exception as e:
+            logging.error(f"Error calculando analítica: {e}")
+        if self._analitica_pendiente:
+            self.actualizar_analitica()
+
+    def _mostrar_analitica(self, analitica):
+        configurar(self.churn_card.value_label, text=f"{analitica['churn_mensual']}%")
+        configurar(self.pagos_en_fecha_card.value_label, text=f"{analitica['porcentaje_pagos_en_fecha']}%")
+        configurar(self.ltv_card.value_label, text=f"${analitica['ltv']:.0f}")
+        configurar(self.permanencia_card.value_label, text=f"{analitica['permanencia_promedio_meses']} meses")
+        configurar(self.churn_card.delta_label,
+                   text=f"últimos {ANALYTICS_CONFIG['meses_promedio_churn']} meses cerrados")
+
+        children = self.cohortes_tree.get_children()
+        if children:
+            self.cohortes_tree.delete(*children)
+        columnas = ANALYTICS_CONFIG['meses_retencion']
+        for fila in reversed(analitica['retencion']):
+            valores = [f"{v:.0f}%" for v in fila['retencion']]
+            valores += [""] * (columnas - len(valores))
+            self.cohortes_tree.insert("", "end", values=(fila['cohorte'], fila['socios'], *valores))
+
     def create_kpi_card_interactive(self, parent, titulo, valor, accent_color=None, on_click=None):
         """KPI card con fondo blanco, borde sutil y barra lateral de color semántico."""
         accent = accent_color or COLORS['SOMA_ORANGE']
@@ -1146,17 +1069,17 @@ class ReportesFrame(ctk.CTkFrame):
         inner.pack(fill="both", expand=True, padx=(10, 10), pady=10)
 
         title_label = ctk.CTkLabel(inner, text=titulo,
-                                   font=ctk.CTkFont(size=11),
+                                   font=fuente(size=11),
                                    text_color=COLORS['TEXT_SECONDARY'])
         title_label.pack(anchor="w")
 
         value_label = ctk.CTkLabel(inner, text=valor,
-                                   font=ctk.CTkFont(size=28, weight="bold"),
+                                   font=fuente(size=28, weight="bold"),
                                    text_color=COLORS['TEXT_DARK'])
         value_label.pack(anchor="w", pady=(3, 1))
 
         delta_label = ctk.CTkLabel(inner, text="",
-                                   font=ctk.CTkFont(size=11),
+                                   font=fuente(size=11),
                                    text_color=COLORS['TEXT_SECONDARY'])
         delta_label.pack(anchor="w")
 
@@ -1181,10 +1104,10 @@ class ReportesFrame(ctk.CTkFrame):
     def create_kpi_card(self, parent, titulo, valor, color=None):
         card = ctk.CTkFrame(parent, fg_color=color or "#2B2B2B")
         
-        title_label = ctk.CTkLabel(card, text=titulo, font=ctk.CTkFont(**FONTS['CAPTION']))
+        title_label = ctk.CTkLabel(card, text=titulo, font=fuente(**FONTS['CAPTION']))
         title_label.pack(pady=(10, 5))
         
-        value_label = ctk.CTkLabel(card, text=valor, font=ctk.CTkFont(**FONTS['HEADER']))
+        value_label = ctk.CTkLabel(card, text=valor, font=fuente(**FONTS['HEADER']))
         value_label.pack(pady=(0, 10))
         
         # Guardar referencia al label del valor
@@ -1225,50 +1148,91 @@ class ReportesFrame(ctk.CTkFrame):
             logging.error(f"Error actualizando dashboard: {e}")
             messagebox.showerror("Error", f"Error al actualizar dashboard: {str(e)}")
     
+    def refrescar_completo(self):
+        """Descarta todo lo cacheado y vuelve a calcular el dashboard"""
+        self.dashboard_manager.invalidar_todo()
+        self.actualizar_dashboard()
+        self.actualizar_analitica()
+
+    def _on_cambios(self, eventos: List[CambioDatos]):
+        """Descarta las secciones afectadas; el recálculo espera a que el dashboard
+        esté a la vista. Los ingresos del kiosco (uno por DNI, en el hilo de Tk) se
+        agrupan: a lo sumo un recálculo cada ``ingresos_refresh_segundos``."""
+        self.dashboard_manager.invalidar(eventos)
+        if any(evento.entidad == PAGOS for evento in eventos):
+            self._analitica_sucia = True
+        if all(evento.entidad == INGRESOS for evento in eventos):
+            self._programar_refresco(ALERT_CONFIG["ingresos_refresh_segundos"] * 1000)
+        else:
+            self._programar_refresco(0)
+
+    def _programar_refresco(self, espera_ms: int):
+        if self._refresco_id is not None:
+            if espera_ms:
+                return  # el ya programado cubre este cambio
+            self.after_cancel(self._refresco_id)
+        self._refresco_id = self.after(espera_ms, self._refrescar)
+
+    def _refrescar(self):
+        self._refresco_id = None
+        if self._nav is not None and not self._nav.visible(self):
+            self._refresco_pendiente = True  # se hace en al_mostrarse
+            return
+        self._refresco_pendiente = False
+        self.actualizar_dashboard()
+        if self._analitica_sucia:
+            self._analitica_sucia = False
+            self.actualizar_analitica()
+
+    def al_mostrarse(self):
+        """LazyTabs: la pestaña Dashboard pasó a la vista"""
+        if self._refresco_pendiente:
+            self._programar_refresco(0)
+
     def actualizar_kpis(self):
         """Actualiza los KPIs en la interfaz"""
         kpis = self.dashboard_data.get('kpis', {})
         
         # Actualizar valores
-        self.total_socios_card.value_label.configure(text=str(kpis.get('total_socios', 0)))
-        self.activos_card.value_label.configure(text=str(kpis.get('socios_activos', 0)))
-        self.vencidos_card.value_label.configure(text=str(kpis.get('socios_inactivos', 0)))
-        self.tasa_actividad_card.value_label.configure(text=f"{kpis.get('tasa_actividad', 0)}%")
-        self.ingresos_mes_card.value_label.configure(text=f"${kpis.get('ingresos_mes', 0):.2f}")
-        self.visitas_hoy_card.value_label.configure(text=str(kpis.get('visitas_hoy', 0)))
-        self.promedio_visitas_card.value_label.configure(text=str(kpis.get('promedio_visitas_diarias', 0)))
+        configurar(self.total_socios_card.value_label, text=str(kpis.get('total_socios', 0)))
+        configurar(self.activos_card.value_label, text=str(kpis.get('socios_activos', 0)))
+        configurar(self.vencidos_card.value_label, text=str(kpis.get('socios_inactivos', 0)))
+        configurar(self.tasa_actividad_card.value_label, text=f"{kpis.get('tasa_actividad', 0)}%")
+        configurar(self.ingresos_mes_card.value_label, text=f"${kpis.get('ingresos_mes', 0):.2f}")
+        configurar(self.visitas_hoy_card.value_label, text=str(kpis.get('visitas_hoy', 0)))
+        configurar(self.promedio_visitas_card.value_label, text=str(kpis.get('promedio_visitas_diarias', 0)))
         # Nuevos y Renovaciones del mes
         try:
-            self.nuevos_mes_card.value_label.configure(text=str(kpis.get('nuevos_mes', 0)))
+            configurar(self.nuevos_mes_card.value_label, text=str(kpis.get('nuevos_mes', 0)))
         except Exception:
             pass
         try:
-            self.renovaciones_mes_card.value_label.configure(text=str(kpis.get('renovaciones_mes', 0)))
+            configurar(self.renovaciones_mes_card.value_label, text=str(kpis.get('renovaciones_mes', 0)))
         except Exception:
             pass
 
-        # Deltas (si hay previos)
+        # Deltas contra el mismo día del mes anterior y mini-tendencia (de kpi_snapshots)
         prev = self.dashboard_data.get('kpis_prev', {})
-        def set_delta(card, curr, prev_val, suffix=""):
+        historial = self.dashboard_data.get('kpi_history', {})
+        def set_delta(card, clave, suffix=""):
             try:
-                if prev_val is None:
-                    card.delta_label.configure(text="")
+                curr = float(kpis.get(clave, 0) or 0)
+                tendencia = sparkline(historial.get(clave, []) + [curr])
+                if prev.get(clave) is None:
+                    configurar(card.delta_label, text=tendencia, text_color=COLORS['TEXT_SECONDARY'])
                     return
-                delta = curr - prev_val
+                delta = curr - float(prev[clave])
                 sign = "↑" if delta > 0 else ("↓" if delta < 0 else "→")
                 color = COLORS['SUCCESS_GREEN'] if delta > 0 else (COLORS['EXPIRED_RED'] if delta < 0 else 'gray')
                 text = f"{sign} {delta:.1f}{suffix} vs prev." if suffix else f"{sign} {delta:.0f}{suffix} vs prev."
-                card.delta_label.configure(text=text, text_color=color)
+                configurar(card.delta_label, text=f"{text}  {tendencia}".rstrip(), text_color=color)
             except Exception:
-                card.delta_label.configure(text="")
+                configurar(card.delta_label, text="")
 
-        try:
-            set_delta(self.activos_card, float(kpis.get('socios_activos', 0) or 0), float(prev.get('socios_activos')) if prev.get('socios_activos') is not None else None)
-            set_delta(self.vencidos_card, float(kpis.get('socios_inactivos', 0) or 0), float(prev.get('socios_inactivos')) if prev.get('socios_inactivos') is not None else None)
-            set_delta(self.ingresos_mes_card, float(kpis.get('ingresos_mes', 0.0) or 0.0), float(prev.get('ingresos_mes')) if prev.get('ingresos_mes') is not None else None)
-            set_delta(self.tasa_actividad_card, float(kpis.get('tasa_actividad', 0.0) or 0.0), float(prev.get('tasa_actividad')) if prev.get('tasa_actividad') is not None else None, suffix='%')
-        except Exception:
-            pass
+        set_delta(self.activos_card, 'socios_activos')
+        set_delta(self.vencidos_card, 'socios_inactivos')
+        set_delta(self.ingresos_mes_card, 'ingresos_mes')
+        set_delta(self.tasa_actividad_card, 'tasa_actividad', suffix='%')
 
         # Donut activos vs vencidos
         try:
@@ -1291,181 +1255,88 @@ class ReportesFrame(ctk.CTkFrame):
             pass
 
     def _update_donut(self, activos, vencidos):
-        total_members = activos + vencidos
-        labels = [f"Activos {int(activos)}", f"Vencidos {int(vencidos)}"]
-        colors = [COLORS['ACTIVE_GREEN'], COLORS['EXPIRED_RED']]
-
-        try:
-            import matplotlib.pyplot as plt
-            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-        except Exception as e:
-            logging.debug(f"Matplotlib no disponible: {e}")
+        if not MATPLOTLIB_DISPONIBLE:
             return
-
-        if self.kpi_chart_figure is None:
-            self.kpi_chart_figure = plt.Figure(figsize=(3.2, 3.2), dpi=100)
-            ax = self.kpi_chart_figure.add_subplot(111)
-            self.kpi_chart_canvas = FigureCanvasTkAgg(self.kpi_chart_figure, master=self.kpi_chart_holder)
-            self.kpi_chart_canvas.get_tk_widget().pack()
-        else:
-            ax = self.kpi_chart_figure.axes[0]
-            ax.clear()
-
-        ax.axis('equal')
-        if total_members <= 0:
-            ax.text(0.5, 0.5, 'Sin datos', ha='center', va='center')
-        else:
-            total = activos + vencidos
-            sizes = [activos/total, vencidos/total]
-            wedges, texts = ax.pie(sizes, colors=colors, startangle=90, wedgeprops=dict(width=0.35))
-            try:
-                centre_circle = plt.Circle((0,0),0.55,fc='white')
-                ax.add_artist(centre_circle)
-            except Exception:
-                pass
-            ax.legend(labels, loc='lower center', bbox_to_anchor=(0.5, -0.2), ncol=2, frameon=False)
-        self.kpi_chart_canvas.draw()
+        if self.kpi_chart is None:
+            self.kpi_chart = DonutChart(self.kpi_chart_holder,
+                                        colors=[COLORS['ACTIVE_GREEN'], COLORS['EXPIRED_RED']],
+                                        texto_vacio='Sin datos', legend_ncol=2)
+        self.kpi_chart.actualizar([activos, vencidos],
+                                  [f"Activos {int(activos)}", f"Vencidos {int(vencidos)}"])
 
     def _update_income_line(self, income_series):
-        try:
-            import matplotlib.pyplot as plt
-            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-        except Exception:
+        if not MATPLOTLIB_DISPONIBLE:
             return
-        ORANGE = COLORS['SOMA_ORANGE']
+        if self.income_line_chart is None:
+            self.income_line_chart = LineChart(self.income_line_holder, color=COLORS['SOMA_ORANGE'],
+                                               ylabel='Monto ($)', figsize=(6.4, 2.8),
+                                               pack_kwargs={'fill': 'both', 'expand': True})
         dates = [item.get('fecha') for item in income_series]
         totals = [float(item.get('total', 0) or 0) for item in income_series]
-
-        def _draw_line(ax):
-            ax.clear()
-            ax.plot(dates, totals, marker='o', color=ORANGE, linewidth=2, markersize=5)
-            if dates and totals:
-                ax.fill_between(range(len(dates)), totals, alpha=0.12, color=ORANGE)
-                ax.set_xticks(range(len(dates)))
-                ax.set_xticklabels(dates, rotation=45, ha='right', fontsize=8)
-            ax.set_ylabel('Monto ($)', fontsize=9)
-            ax.spines['top'].set_visible(False)
-            ax.spines['right'].set_visible(False)
-            ax.grid(True, linestyle='--', alpha=0.2)
-            ax.tick_params(axis='both', labelsize=8)
-
-        if not hasattr(self, 'income_line_figure'):
-            self.income_line_figure = plt.Figure(figsize=(6.4, 2.8), dpi=100)
-            self.income_line_figure.patch.set_facecolor('#FFFFFF')
-            ax = self.income_line_figure.add_subplot(111)
-            _draw_line(ax)
-            self.income_line_figure.tight_layout(pad=1.5)
-            self.income_line_canvas = FigureCanvasTkAgg(self.income_line_figure, master=self.income_line_holder)
-            self.income_line_canvas.get_tk_widget().pack(fill='both', expand=True)
-        else:
-            ax = self.income_line_figure.axes[0]
-            _draw_line(ax)
-            self.income_line_figure.tight_layout(pad=1.5)
-            self.income_line_canvas.draw()
+        self.income_line_chart.actualizar(dates, totals)
 
     def _update_payment_methods_donut(self, methods):
-        try:
-            import matplotlib.pyplot as plt
-            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-        except Exception:
+        if not MATPLOTLIB_DISPONIBLE:
             return
         efectivo = float(methods.get('efectivo', 0) or 0)
         transferencia = float(methods.get('transferencia', 0) or 0)
-        otros = sum(float(v or 0) for k, v in methods.items() if k not in ('efectivo','transferencia'))
-        total_val = efectivo + transferencia + otros
-        labels = [f"Efectivo ${efectivo:.0f}", f"Transferencia ${transferencia:.0f}"]
-        colors = [COLORS['SOMA_ORANGE'], COLORS.get('INFO_BLUE', '#17a2b8')]
-
-        if not hasattr(self, 'payment_methods_chart_figure'):
-            self.payment_methods_chart_figure = plt.Figure(figsize=(3.2, 3.2), dpi=100)
-            ax = self.payment_methods_chart_figure.add_subplot(111)
-            self.payment_methods_chart_canvas = FigureCanvasTkAgg(self.payment_methods_chart_figure, master=self.payment_methods_chart_holder)
-            self.payment_methods_chart_canvas.get_tk_widget().pack()
-        else:
-            ax = self.payment_methods_chart_figure.axes[0]
-            ax.clear()
-
-        ax.axis('equal')
-        if total_val <= 0:
-            ax.text(0.5, 0.5, 'Sin pagos', ha='center', va='center')
-        else:
-            total = total_val
-            sizes = [efectivo/total, transferencia/total]
-            ax.pie(sizes, colors=colors, startangle=90, wedgeprops=dict(width=0.35))
-            try:
-                centre_circle = plt.Circle((0,0),0.55,fc='white')
-                ax.add_artist(centre_circle)
-            except Exception:
-                pass
-            ax.legend(labels, loc='lower center', bbox_to_anchor=(0.5, -0.2), ncol=1, frameon=False)
-        self.payment_methods_chart_canvas.draw()
+        if self.payment_methods_chart is None:
+            self.payment_methods_chart = DonutChart(
+                self.payment_methods_chart_holder,
+                colors=[COLORS['SOMA_ORANGE'], COLORS.get('INFO_BLUE', '#17a2b8')],
+                texto_vacio='Sin pagos', legend_ncol=1)
+        # metodo_pago solo admite estos dos (CHECK en pagos)
+        self.payment_methods_chart.actualizar(
+            [efectivo, transferencia],
+            [f"Efectivo ${efectivo:.0f}", f"Transferencia ${transferencia:.0f}"])
 
     def _set_range_and_refresh(self, key):
         self.selected_range = key
         self.actualizar_dashboard()
 
-    def set_navigation_context(self, notebook, socios_frame=None, ingresos_frame=None):
-        self._nav = {'notebook': notebook, 'socios': socios_frame, 'ingresos': ingresos_frame}
+    def set_navigation_context(self, pestanas):
+        """``pestanas``: LazyTabs de la ventana principal (arma la pestaña destino si hace falta)"""
+        self._nav = pestanas
 
     def _go_to_socios(self, estado=None):
         try:
-            if self._nav.get('notebook'):
-                self._nav['notebook'].set("Socios")
-            if estado and self._nav.get('socios'):
-                self._nav['socios'].estado_filter.set(estado)
-                self._nav['socios'].filtrar_socios()
+            if self._nav is not None:
+                socios = self._nav.mostrar("Socios")
+                if estado:
+                    socios.estado_filter.set(estado)
+                    socios.filtrar_socios()
         except Exception as e:
             logging.debug(f"Navegación Socios falló: {e}")
 
     def _go_to_ingresos(self):
         try:
-            if self._nav.get('notebook'):
-                self._nav['notebook'].set("Ingresos")
+            if self._nav is not None:
+                self._nav.mostrar("Ingresos")
         except Exception as e:
             logging.debug(f"Navegación Ingresos falló: {e}")
     
     def actualizar_alertas(self):
-        """Actualiza las alertas inteligentes"""
-        alerts = self.dashboard_data.get('alerts', [])
-        
-        # Limpiar alertas existentes
-        for widget in self.alerts_scroll.winfo_children():
-            widget.destroy()
-        
-        if not alerts:
-            self.no_alerts_label = ctk.CTkLabel(self.alerts_scroll, 
-                                              text="✅ No hay alertas en este momento",
-                                              text_color="gray")
-            self.no_alerts_label.pack(pady=20)
-            return
-        
-        # Crear alertas
-        for alert in alerts:
-            self.create_alert_widget(alert)
+        """Actualiza las alertas inteligentes (reutiliza las filas ya creadas)"""
+        self.alerts_pool.mostrar(self.dashboard_data.get('alerts', []))
     
-    def create_alert_widget(self, alert):
-        """Crea un widget de alerta"""
-        alert_frame = ctk.CTkFrame(self.alerts_scroll)
-        alert_frame.pack(fill="x", padx=5, pady=2)
-        
-        # Color según tipo de alerta
-        colors = {
-            "danger": COLORS['EXPIRED_RED'],
-            "warning": COLORS['WARNING_AMBER'],
-            "info": "#2196F3"
-        }
-        
-        # Icono según tipo
-        icons = {
-            "danger": "🚨",
-            "warning": "⚠️",
-            "info": "ℹ️"
-        }
-        
-        alert_type = alert.get('type', 'info')
+    # Color e icono según tipo de alerta
+    ALERT_COLORS = {
+        "danger": COLORS['EXPIRED_RED'],
+        "warning": COLORS['WARNING_AMBER'],
+        "info": "#2196F3"
+    }
+    ALERT_ICONS = {
+        "danger": "🚨",
+        "warning": "⚠️",
+        "info": "ℹ️"
+    }
+
+    def create_alert_widget(self, parent):
+        """Crea una fila de alerta vacía (se completa en update_alert_widget)"""
+        alert_frame = ctk.CTkFrame(parent)
         
         # Frame interno con color
-        inner_frame = ctk.CTkFrame(alert_frame, fg_color=colors.get(alert_type, "#2B2B2B"))
+        inner_frame = ctk.CTkFrame(alert_frame)
         inner_frame.pack(fill="x", padx=2, pady=2)
         
         # Contenido de la alerta
@@ -1476,27 +1347,48 @@ class ReportesFrame(ctk.CTkFrame):
         header_frame = ctk.CTkFrame(content_frame, fg_color="transparent")
         header_frame.pack(fill="x")
         
-        icon_label = ctk.CTkLabel(header_frame, text=icons.get(alert_type, "ℹ️"), 
-                                font=ctk.CTkFont(size=16))
+        icon_label = ctk.CTkLabel(header_frame, text="", font=fuente(size=16))
         icon_label.pack(side="left", padx=(0, 10))
         
-        title_label = ctk.CTkLabel(header_frame, text=alert['title'], 
-                                 font=ctk.CTkFont(size=14, weight="bold"),
+        title_label = ctk.CTkLabel(header_frame, text="", 
+                                 font=fuente(size=14, weight="bold"),
                                  text_color="white")
         title_label.pack(side="left")
         
         # Mensaje
-        message_label = ctk.CTkLabel(content_frame, text=alert['message'], 
-                                   font=ctk.CTkFont(size=12),
+        message_label = ctk.CTkLabel(content_frame, text="", 
+                                   font=fuente(size=12),
                                    text_color="white")
         message_label.pack(anchor="w", pady=(5, 0))
         
-        # Botón de acción si existe
-        if alert.get('action'):
-            action_btn = ctk.CTkButton(content_frame, text="Ver detalles", 
-                                     command=lambda: self.handle_alert_action(alert),
-                                     height=25, width=100)
-            action_btn.pack(anchor="e", pady=(5, 0))
+        # Botón de acción (se muestra solo si la alerta tiene una)
+        action_btn = ctk.CTkButton(content_frame, text="Ver detalles", height=25, width=100)
+
+        alert_frame.inner_frame = inner_frame
+        alert_frame.icon_label = icon_label
+        alert_frame.title_label = title_label
+        alert_frame.message_label = message_label
+        alert_frame.action_btn = action_btn
+        alert_frame.con_accion = False
+        return alert_frame
+
+    def update_alert_widget(self, alert_frame, alert):
+        """Muestra ``alert`` en una fila existente"""
+        alert_type = alert.get('type', 'info')
+        configurar(alert_frame.inner_frame, fg_color=self.ALERT_COLORS.get(alert_type, "#2B2B2B"))
+        configurar(alert_frame.icon_label, text=self.ALERT_ICONS.get(alert_type, "ℹ️"))
+        configurar(alert_frame.title_label, text=alert['title'])
+        configurar(alert_frame.message_label, text=alert['message'])
+
+        con_accion = bool(alert.get('action'))
+        if con_accion:
+            alert_frame.action_btn.configure(command=lambda: self.handle_alert_action(alert))
+        if con_accion != alert_frame.con_accion:
+            if con_accion:
+                alert_frame.action_btn.pack(anchor="e", pady=(5, 0))
+            else:
+                alert_frame.action_btn.pack_forget()
+            alert_frame.con_accion = con_accion
     
     def handle_alert_action(self, alert):
         """Maneja las acciones de las alertas"""
@@ -1558,43 +1450,25 @@ class ReportesFrame(ctk.CTkFrame):
     def actualizar_acciones_rapidas(self):
         """Actualiza las acciones rápidas sugeridas"""
         actions = self.dashboard_data.get('quick_actions', [])
-        
-        # Limpiar acciones existentes
-        for widget in self.actions_container.winfo_children():
-            widget.destroy()
-        
-        if not actions:
-            self.no_actions_label = ctk.CTkLabel(self.actions_container, 
-                                               text="No hay acciones sugeridas",
-                                               text_color="gray")
-            self.no_actions_label.pack(pady=20)
-            return
-        
-        # Crear botones de acciones
-        actions_row = ctk.CTkFrame(self.actions_container, fg_color="transparent")
-        actions_row.pack(fill="x", pady=10)
-        
-        for action in actions[:4]:  # Máximo 4 acciones
-            self.create_action_button(actions_row, action)
+        self.actions_pool.mostrar(actions[:4])  # Máximo 4 acciones
     
-    def create_action_button(self, parent, action):
-        """Crea un botón de acción rápida"""
-        # Color según prioridad
-        colors = {
-            "high": COLORS['EXPIRED_RED'],
-            "medium": COLORS['WARNING_AMBER'],
-            "low": COLORS['ACTIVE_GREEN']
-        }
-        
+    # Color según prioridad
+    ACTION_COLORS = {
+        "high": COLORS['EXPIRED_RED'],
+        "medium": COLORS['WARNING_AMBER'],
+        "low": COLORS['ACTIVE_GREEN']
+    }
+
+    def create_action_button(self, parent):
+        """Crea un botón de acción rápida (se completa en update_action_button)"""
+        return ctk.CTkButton(parent, text="", height=60, font=fuente(size=11))
+
+    def update_action_button(self, btn, action):
         priority = action.get('priority', 'low')
-        
-        btn = ctk.CTkButton(parent, 
-                          text=f"{action.get('icon', '⚡')} {action['title']}\n{action['description']}", 
-                          command=lambda: self.handle_quick_action(action),
-                          fg_color=colors.get(priority, COLORS['ACTIVE_GREEN']),
-                          height=60,
-                          font=ctk.CTkFont(size=11))
-        btn.pack(side="left", padx=5, fill="x", expand=True)
+        configurar(btn,
+                   text=f"{action.get('icon', '⚡')} {action['title']}\n{action['description']}",
+                   fg_color=self.ACTION_COLORS.get(priority, COLORS['ACTIVE_GREEN']))
+        btn.configure(command=lambda: self.handle_quick_action(action))
     
     def handle_quick_action(self, action):
         """Maneja las acciones rápidas"""
@@ -1622,85 +1496,83 @@ class ReportesFrame(ctk.CTkFrame):
             messagebox.showerror("Error", f"Error al crear backup: {str(e)}")
     
     def actualizar_actividad_reciente(self):
-        """Actualiza la actividad reciente"""
-        activity = self.dashboard_data.get('recent_activity', [])
-        
-        # Limpiar actividad existente
-        for widget in self.activity_scroll.winfo_children():
-            widget.destroy()
-        
-        if not activity:
-            self.no_activity_label = ctk.CTkLabel(self.activity_scroll, 
-                                                text="No hay actividad reciente",
-                                                text_color="gray")
-            self.no_activity_label.pack(pady=20)
-            return
-        
-        # Crear elementos de actividad
-        for item in activity:
-            self.create_activity_item(item)
+        """Actualiza la actividad reciente (reutiliza las filas ya creadas)"""
+        self.activity_pool.mostrar(self.dashboard_data.get('recent_activity', []))
     
-    def create_activity_item(self, item):
-        """Crea un elemento de actividad"""
-        item_frame = ctk.CTkFrame(self.activity_scroll)
-        item_frame.pack(fill="x", padx=5, pady=2)
-        
-        # Icono según tipo
-        icons = {
-            "visit": "👤",
-            "payment": "💰"
-        }
-        
-        # Color según estado
-        colors = {
-            "Activo": COLORS['ACTIVE_GREEN'],
-            "Vencido": COLORS['EXPIRED_RED'],
-            "No registrado": COLORS['WARNING_AMBER'],
-            "completed": COLORS['ACTIVE_GREEN']
-        }
-        
-        item_type = item.get('type', 'visit')
-        status = item.get('status', '')
+    # Icono según tipo y color según estado
+    ACTIVITY_ICONS = {
+        "visit": "👤",
+        "payment": "💰"
+    }
+    ACTIVITY_COLORS = {
+        "Activo": COLORS['ACTIVE_GREEN'],
+        "Vencido": COLORS['EXPIRED_RED'],
+        "No registrado": COLORS['WARNING_AMBER'],
+        "completed": COLORS['ACTIVE_GREEN']
+    }
+
+    def create_activity_item(self, parent):
+        """Crea una fila de actividad vacía (se completa en update_activity_item)"""
+        item_frame = ctk.CTkFrame(parent)
         
         # Contenido
         content_frame = ctk.CTkFrame(item_frame, fg_color="transparent")
         content_frame.pack(fill="x", padx=10, pady=5)
         
         # Icono y descripción
-        icon_label = ctk.CTkLabel(content_frame, text=icons.get(item_type, "📝"), 
-                                font=ctk.CTkFont(size=14))
+        icon_label = ctk.CTkLabel(content_frame, text="", font=fuente(size=14))
         icon_label.pack(side="left", padx=(0, 10))
         
-        desc_label = ctk.CTkLabel(content_frame, text=item['description'], 
-                                font=ctk.CTkFont(size=12))
+        desc_label = ctk.CTkLabel(content_frame, text="", font=fuente(size=12))
         desc_label.pack(side="left", anchor="w")
         
         # Timestamp
+        time_label = ctk.CTkLabel(content_frame, text="", 
+                                font=fuente(size=10),
+                                text_color="gray")
+        time_label.pack(side="right")
+        
+        # Indicador de estado (se muestra solo con un estado conocido)
+        status_indicator = ctk.CTkFrame(content_frame, width=4, height=20)
+
+        item_frame.icon_label = icon_label
+        item_frame.desc_label = desc_label
+        item_frame.time_label = time_label
+        item_frame.status_indicator = status_indicator
+        item_frame.con_estado = False
+        return item_frame
+
+    @staticmethod
+    def _hora_actividad(timestamp):
         try:
-            if isinstance(item['timestamp'], str):
-                if 'T' in item['timestamp']:
+            if isinstance(timestamp, str):
+                if 'T' in timestamp:
                     # Formato ISO
-                    dt = datetime.fromisoformat(item['timestamp'].replace('Z', '+00:00'))
+                    dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
                 else:
                     # Formato fecha simple
-                    dt = datetime.strptime(item['timestamp'], '%Y-%m-%d')
-                time_str = dt.strftime('%H:%M')
-            else:
-                time_str = str(item['timestamp'])
+                    dt = datetime.strptime(timestamp, '%Y-%m-%d')
+                return dt.strftime('%H:%M')
+            return str(timestamp)
         except:
-            time_str = "N/A"
-        
-        time_label = ctk.CTkLabel(content_frame, text=time_str, 
-                                font=ctk.CTkFont(size=10),
-                                text_color="gray")
-        time_label.pack(side="right")
-        
-        # Indicador de estado
-        if status and status in colors:
-            status_indicator = ctk.CTkFrame(content_frame, 
-                                          fg_color=colors[status], 
-                                          width=4, height=20)
-            status_indicator.pack(side="right", padx=(5, 0))
+            return "N/A"
+
+    def update_activity_item(self, item_frame, item):
+        """Muestra ``item`` en una fila existente"""
+        status = item.get('status', '')
+        configurar(item_frame.icon_label, text=self.ACTIVITY_ICONS.get(item.get('type', 'visit'), "📝"))
+        configurar(item_frame.desc_label, text=item['description'])
+        configurar(item_frame.time_label, text=self._hora_actividad(item['timestamp']))
+
+        con_estado = bool(status) and status in self.ACTIVITY_COLORS
+        if con_estado:
+            configurar(item_frame.status_indicator, fg_color=self.ACTIVITY_COLORS[status])
+        if con_estado != item_frame.con_estado:
+            if con_estado:
+                item_frame.status_indicator.pack(side="right", padx=(5, 0))
+            else:
+                item_frame.status_indicator.pack_forget()
+            item_frame.con_estado = con_estado
     
     def schedule_dashboard_refresh(self):
         """Programa la actualización automática del dashboard"""
@@ -1710,7 +1582,10 @@ class ReportesFrame(ctk.CTkFrame):
     def auto_refresh_dashboard(self):
         """Actualización automática del dashboard"""
         try:
-            self.actualizar_dashboard()
+            # Los cambios de datos llegan por eventos; esto cubre lo que depende de la hora
+            self.dashboard_manager.invalidar_todo()
+            self._analitica_sucia = True
+            self._programar_refresco(0)
         except Exception as e:
             logging.error(f"Error en actualización automática del dashboard: {e}")
         finally:
@@ -1795,6 +1670,9 @@ class ImportExportFrame(ctk.CTkFrame):
         
         ctk.CTkButton(backup_buttons, text="Abrir Carpeta", 
                      command=self.abrir_carpeta_backups).pack(side="left", padx=5, fill="x", expand=True)
+        
+        ctk.CTkButton(backup_buttons, text="Diagnóstico", 
+                     command=self.ver_diagnostico).pack(side="left", padx=5, fill="x", expand=True)
     
     def exportar_socios(self):
         self.import_export.exportar_socios(self)
@@ -1901,6 +1779,56 @@ class ImportExportFrame(ctk.CTkFrame):
         except Exception as e:
             messagebox.showerror("Error", f"Error al obtener lista de backups: {str(e)}")
     
+    def ver_diagnostico(self):
+        """Tamaño de la base, páginas libres y último resultado de cada tarea de mantenimiento"""
+        diag_window = ctk.CTkToplevel(self)
+        diag_window.title("Diagnóstico de la Base")
+        diag_window.geometry("900x450")
+        diag_window.transient(self)
+        
+        resumen_label = ctk.CTkLabel(diag_window, text="", font=ctk.CTkFont(size=14, weight="bold"))
+        resumen_label.pack(pady=10)
+        
+        columns = ("Tarea", "Última", "Próxima", "Resultado")
+        tree = ttk.Treeview(diag_window, columns=columns, show="headings", height=10)
+        for col, ancho in zip(columns, (110, 150, 150, 440)):
+            tree.heading(col, text=col)
+            tree.column(col, width=ancho)
+        tree.pack(fill="both", expand=True, padx=20, pady=10)
+        
+        def formatear(tarea: dict) -> str:
+            if tarea['error']:
+                return f"Error: {tarea['error']}"
+            texto = ", ".join(f"{k}: {v}" for k, v in (tarea['resultado'] or {}).items() if k != 'errores')
+            errores = (tarea['resultado'] or {}).get('errores')
+            if errores:
+                texto += f" | {len(errores)} problemas: {errores[0]}"
+            if tarea['pendiente']:
+                texto += f" (en curso, {tarea['tramos']} tramos)"
+            return texto or "-"
+        
+        def actualizar():
+            try:
+                diag = self.db_manager.diagnostico()
+            except Exception as e:
+                messagebox.showerror("Error", f"Error al obtener diagnóstico: {str(e)}", parent=diag_window)
+                return
+            resumen_label.configure(
+                text=f"Base: {diag['tamano'] / (1024 * 1024):.2f} MB  |  "
+                     f"Libre: {diag['bytes_libres'] / (1024 * 1024):.2f} MB ({diag['libres']} páginas)  |  "
+                     f"auto_vacuum: {diag['auto_vacuum']}")
+            tree.delete(*tree.get_children())
+            for tarea in diag['tareas']:
+                ultima = tarea['ultimo'][:16].replace('T', ' ') if tarea['ultimo'] else "Nunca"
+                tree.insert("", "end", values=(tarea['tarea'], ultima,
+                                               tarea['proxima'][:16].replace('T', ' '), formatear(tarea)))
+        
+        button_frame = ctk.CTkFrame(diag_window, fg_color="transparent")
+        button_frame.pack(pady=10)
+        ctk.CTkButton(button_frame, text="Actualizar", command=actualizar).pack(side="left", padx=10)
+        ctk.CTkButton(button_frame, text="Cerrar", command=diag_window.destroy).pack(side="left", padx=10)
+        actualizar()
+    
     def restaurar_backup(self):
         """Restaura desde un backup seleccionado"""
         try:
@@ -1948,24 +1876,43 @@ class ImportExportFrame(ctk.CTkFrame):
                                          "Se creará un backup de seguridad automáticamente."):
                     return
                 
-                # Realizar restauración
-                result = self.db_manager.restore_from_backup(backup_filename)
+                # Realizar restauración en segundo plano: la app sigue abierta y
+                # las pestañas se recargan con el evento de fin de restauración
+                restaurar_btn.configure(state="disabled", text="Restaurando...")
+                executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="restauracion")
+                future = executor.submit(self.db_manager.restore_from_backup, backup_filename)
+                executor.shutdown(wait=False)
                 
-                if result['success']:
-                    messagebox.showinfo("Éxito", 
-                                      f"Base de datos restaurada exitosamente.\n"
-                                      f"Backup de seguridad: {result.get('safety_backup', 'N/A')}")
-                    restore_window.destroy()
-                else:
-                    messagebox.showerror("Error", f"Error al restaurar: {result['error']}")
+                def recoger_resultado():
+                    if not future.done():
+                        self.after(BACKUP_CONFIG['restore_poll_ms'], recoger_resultado)
+                        return
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {'success': False, 'error': str(e)}
+                    ventana_abierta = restore_window.winfo_exists()
+                    if result['success']:
+                        if ventana_abierta:
+                            restore_window.destroy()
+                        messagebox.showinfo("Éxito", 
+                                          f"Base de datos restaurada en {result['tiempos']['total']:.1f} s.\n"
+                                          f"Backup de seguridad: {result.get('safety_backup', 'N/A')}")
+                    else:
+                        if ventana_abierta:
+                            restaurar_btn.configure(state="normal", text="Restaurar")
+                        messagebox.showerror("Error", f"Error al restaurar: {result['error']}")
+                
+                self.after(BACKUP_CONFIG['restore_poll_ms'], recoger_resultado)
             
             # Botones
             button_frame = ctk.CTkFrame(restore_window, fg_color="transparent")
             button_frame.pack(pady=10)
             
-            ctk.CTkButton(button_frame, text="Restaurar", 
-                         command=realizar_restauracion,
-                         fg_color=COLORS['WARNING_AMBER']).pack(side="left", padx=10)
+            restaurar_btn = ctk.CTkButton(button_frame, text="Restaurar", 
+                                          command=realizar_restauracion,
+                                          fg_color=COLORS['WARNING_AMBER'])
+            restaurar_btn.pack(side="left", padx=10)
             
             ctk.CTkButton(button_frame, text="Cancelar", 
                          command=restore_window.destroy).pack(side="left", padx=10)
@@ -1986,11 +1933,27 @@ class ImportExportFrame(ctk.CTkFrame):
             messagebox.showerror("Error", f"Error al abrir carpeta: {str(e)}")
 
 class PagosFrame(ctk.CTkFrame):
+    # Encabezado -> (columna de consultar_pagos, clave de TreeSync equivalente al ORDER BY)
+    ORDEN_COLUMNAS = {
+        'ID': ('id', lambda pid, v: pid),
+        'DNI': ('dni', lambda pid, v: (v[1], pid)),
+        'Nombre': ('nombre', lambda pid, v: (v[2], pid)),
+        'Monto': ('monto', lambda pid, v: (float(v[3].lstrip('$')), pid)),
+        'Duración': ('meses', lambda pid, v: (int(v[4].split()[0]), pid)),
+        'Fecha': ('fecha_pago', lambda pid, v: (v[5], pid)),
+        'Método': ('metodo_pago', lambda pid, v: (v[6].lower(), pid)),
+    }
+    TITULOS = {'ID': 'ID', 'DNI': 'DNI', 'Nombre': 'Nombre del Socio', 'Monto': 'Monto',
+               'Duración': 'Duración', 'Fecha': 'Fecha de Pago', 'Método': 'Método', 'Estado': 'Estado'}
+
     def __init__(self, parent, db_manager):
         super().__init__(parent)
         self.db_manager = db_manager
+        self._montos = {}
+        self._filtro = FiltroPagos()
         self.create_widgets()
         self.refrescar_pagos()
+        TkDispatcher(self, self.db_manager.eventos, self._on_cambios, entidades=(SOCIOS, PAGOS))
     
     def create_widgets(self):
         # Título principal
@@ -2027,10 +1990,16 @@ class PagosFrame(ctk.CTkFrame):
         ctk.CTkLabel(date_frame, text="Hasta:").pack(side="left")
         self.fecha_hasta = ctk.CTkEntry(date_frame, placeholder_text="YYYY-MM-DD", width=100)
         self.fecha_hasta.pack(side="left", padx=(10, 0))
+
+        # Filtro por método
+        ctk.CTkLabel(date_frame, text="Método:").pack(side="left", padx=(10, 0))
+        self.metodo_filter = ctk.CTkOptionMenu(date_frame, values=["Todos", "Efectivo", "Transferencia"],
+                                               command=self.filtrar_pagos, width=120)
+        self.metodo_filter.pack(side="left", padx=(10, 0))
         
         # Botón aplicar filtros
         ctk.CTkButton(filters_frame, text="Aplicar Filtros", 
-                     command=self.aplicar_filtros_fecha,
+                     command=self.aplicar_filtros,
                      fg_color=COLORS['SUCCESS_GREEN']).pack(side="left", padx=10, pady=10)
         
         # Botón limpiar filtros
@@ -2060,15 +2029,11 @@ class PagosFrame(ctk.CTkFrame):
         columns = ('ID', 'DNI', 'Nombre', 'Monto', 'Duración', 'Fecha', 'Método', 'Estado')
         self.pagos_tree = ttk.Treeview(table_frame, columns=columns, show='headings', height=15)
 
-        # Configurar columnas
-        self.pagos_tree.heading('ID', text='ID')
-        self.pagos_tree.heading('DNI', text='DNI')
-        self.pagos_tree.heading('Nombre', text='Nombre del Socio')
-        self.pagos_tree.heading('Monto', text='Monto')
-        self.pagos_tree.heading('Duración', text='Duración')
-        self.pagos_tree.heading('Fecha', text='Fecha de Pago')
-        self.pagos_tree.heading('Método', text='Método')
-        self.pagos_tree.heading('Estado', text='Estado')
+        # Configurar columnas (click en el encabezado ordena la consulta por esa columna)
+        for col in columns:
+            self.pagos_tree.heading(col, text=self.TITULOS[col])
+        for col in self.ORDEN_COLUMNAS:
+            self.pagos_tree.heading(col, command=lambda c=col: self.ordenar_por(c))
 
         # Configurar anchos de columna
         self.pagos_tree.column('ID', width=50)
@@ -2088,6 +2053,9 @@ class PagosFrame(ctk.CTkFrame):
         self.pagos_tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
+        # Filas identificadas por ID de pago, mismo orden que la consulta (fecha DESC)
+        self._sync = TreeSync(self.pagos_tree, self.ORDEN_COLUMNAS['Fecha'][1], reverse=True)
+
         # Bind para doble clic
         self.pagos_tree.bind('<Double-1>', self.editar_pago_seleccionado)
         # Menú contextual (click derecho)
@@ -2116,94 +2084,141 @@ class PagosFrame(ctk.CTkFrame):
     def _formato_pago(pago):
         """Retorna (duracion_txt, estado) para un registro de pago."""
         meses = int(pago.get('meses', 1) or 1)
-        dias_vigencia = meses * 30
-        fecha_pago = datetime.strptime(pago['fecha_pago'], '%Y-%m-%d')
-        dias_transcurridos = (datetime.now() - fecha_pago).days
-        if dias_transcurridos <= dias_vigencia:
+        venc = vencimiento(pago['fecha_pago'], meses)
+        if vigente(venc):
             estado = "✅ Vigente"
-        elif dias_transcurridos <= dias_vigencia + 30:
+        elif vigente(venc + timedelta(days=30)):
             estado = "⚠️ Vencido"
         else:
             estado = "❌ Muy Vencido"
         duracion_txt = f"{meses} mes" if meses == 1 else f"{meses} meses"
         return duracion_txt, estado
 
-    def _poblar_tabla_pagos(self, pagos, label_prefix="Total"):
-        """Limpia la tabla y la rellena con la lista de pagos dada. Actualiza stats."""
-        for item in self.pagos_tree.get_children():
-            self.pagos_tree.delete(item)
-        total_pagos = 0
-        monto_total = 0.0
-        for pago in pagos:
-            socio = self.db_manager.obtener_socio(pago['dni'])
-            nombre = socio['nombre'] if socio else "Socio no encontrado"
-            duracion_txt, estado = self._formato_pago(pago)
-            self.pagos_tree.insert('', 'end', values=(
-                pago['id'], pago['dni'], nombre,
-                f"${pago['monto']:.2f}", duracion_txt,
-                pago['fecha_pago'], pago['metodo_pago'].title(), estado
-            ))
-            total_pagos += 1
-            monto_total += pago['monto']
+    def _fila_pago(self, pago, nombre):
+        duracion_txt, estado = self._formato_pago(pago)
+        return (
+            pago['id'], pago['dni'], nombre,
+            f"${pago['monto']:.2f}", duracion_txt,
+            pago['fecha_pago'], pago['metodo_pago'].title(), estado
+        )
+
+    def _poblar_tabla_pagos(self):
+        """Recarga completa de la tabla con la consulta de ``self._filtro``. Actualiza stats.
+
+        Los pagos que lleguen luego por eventos de cambio se filtran con el mismo criterio.
+        """
+        self._montos = {}
+        filas = []
+        for pago in self.db_manager.consultar_pagos(self._filtro):
+            filas.append((pago['id'], self._fila_pago(pago, pago['nombre'] or "Socio no encontrado")))
+            self._montos[pago['id']] = pago['monto']
+        columna = next(c for c, (orden, _) in self.ORDEN_COLUMNAS.items() if orden == self._filtro.orden)
+        self._sync.cargar(filas, sort_key=self.ORDEN_COLUMNAS[columna][1], reverse=self._filtro.descendente)
+        for col, titulo in self.TITULOS.items():
+            flecha = (" ▼" if self._filtro.descendente else " ▲") if col == columna else ""
+            self.pagos_tree.heading(col, text=titulo + flecha)
+        self._actualizar_stats()
+
+    def _actualizar_stats(self):
+        total_pagos = len(self._montos)
+        monto_total = sum(self._montos.values())
         promedio = monto_total / total_pagos if total_pagos > 0 else 0.0
-        self.total_pagos_label.configure(text=f"{label_prefix}: {total_pagos}")
+        prefijo = "Filtrados" if self._filtro.filtra else "Total pagos"
+        self.total_pagos_label.configure(text=f"{prefijo}: {total_pagos}")
         self.monto_total_label.configure(text=f"Monto Total: ${monto_total:.2f}")
         self.promedio_label.configure(text=f"Promedio: ${promedio:.2f}")
 
+    def _refrescar_pago(self, pago_id):
+        pago = self.db_manager.obtener_pago_con_socio(pago_id)
+        if pago and self._filtro.cumple(pago):
+            nombre = pago['nombre'] or "Socio no encontrado"
+            self._sync.upsert(pago_id, self._fila_pago(pago, nombre))
+            self._montos[pago_id] = pago['monto']
+        else:
+            self._sync.eliminar(pago_id)
+            self._montos.pop(pago_id, None)
+
+    def _on_cambios(self, eventos: List[CambioDatos]):
+        try:
+            socios_editados = {e.clave for e in eventos if e.entidad == SOCIOS and e.accion != DELETE}
+            for evento in eventos:
+                if evento.entidad != PAGOS:
+                    continue
+                if evento.accion == DELETE:
+                    self._sync.eliminar(evento.clave)
+                    self._montos.pop(evento.clave, None)
+                else:
+                    self._refrescar_pago(evento.clave)
+            if socios_editados:
+                # El nombre del socio se muestra en cada uno de sus pagos
+                for pago_id in list(self._montos):
+                    if self._sync.valores(pago_id)[1] in socios_editados:
+                        self._refrescar_pago(pago_id)
+            self._actualizar_stats()
+        except Exception as e:
+            logging.error(f"Error actualizando filas de pagos: {e}")
+
     def refrescar_pagos(self):
-        """Refresca la lista de pagos desde la base de datos"""
+        """Refresca la lista de pagos desde la base de datos (con los filtros actuales)"""
         try:
-            self._poblar_tabla_pagos(self.db_manager.obtener_todos_los_pagos(), "Total pagos")
+            self._poblar_tabla_pagos()
         except Exception as e:
             logging.error(f"Error al refrescar pagos: {e}")
             messagebox.showerror("Error", f"Error al cargar pagos: {str(e)}")
 
+    def _leer_filtro(self) -> FiltroPagos:
+        """FiltroPagos con los controles de la pantalla y el orden actual.
+        ValueError si alguna fecha no tiene formato YYYY-MM-DD."""
+        try:
+            dni = int(self.dni_filter.get().strip())
+        except ValueError:
+            dni = None  # vacío o incompleto: sin filtro de DNI
+        metodo = self.metodo_filter.get()
+        return FiltroPagos(
+            dni=dni,
+            desde=self.fecha_desde.get().strip() or None,
+            hasta=self.fecha_hasta.get().strip() or None,
+            metodo=None if metodo == "Todos" else metodo.lower(),
+            orden=self._filtro.orden,
+            descendente=self._filtro.descendente,
+        )
+
     def filtrar_pagos(self, event=None):
-        """Filtra pagos por DNI en tiempo real"""
-        dni_filtro = self.dni_filter.get().strip()
-        if not dni_filtro:
-            self.refrescar_pagos()
-            return
+        """Filtra en tiempo real (DNI al tipear, método al elegirlo) junto con las fechas cargadas"""
         try:
-            self._poblar_tabla_pagos(
-                self.db_manager.obtener_pagos_por_dni(int(dni_filtro)), "Filtrados")
+            self._filtro = self._leer_filtro()
         except ValueError:
-            self.refrescar_pagos()
-        except Exception as e:
-            logging.error(f"Error al filtrar pagos: {e}")
-            messagebox.showerror("Error", f"Error al filtrar pagos: {str(e)}")
-
-    def aplicar_filtros_fecha(self):
-        """Filtra pagos por rango de fechas"""
-        fecha_desde = self.fecha_desde.get().strip()
-        fecha_hasta = self.fecha_hasta.get().strip()
-        if not fecha_desde and not fecha_hasta:
-            self.refrescar_pagos()
-            return
+            return  # fecha a medio escribir: se valida al aplicar filtros
+        self.refrescar_pagos()
+
+    def aplicar_filtros(self):
+        """Aplica DNI, rango de fechas y método"""
         try:
-            dt_desde = datetime.strptime(fecha_desde, '%Y-%m-%d') if fecha_desde else None
-            dt_hasta = datetime.strptime(fecha_hasta, '%Y-%m-%d') if fecha_hasta else None
+            self._filtro = self._leer_filtro()
         except ValueError:
             messagebox.showerror("Error", "Formato de fecha inválido. Use YYYY-MM-DD")
             return
-        pagos = self.db_manager.obtener_todos_los_pagos()
-        filtrados = [
-            p for p in pagos
-            if (not dt_desde or datetime.strptime(p['fecha_pago'], '%Y-%m-%d') >= dt_desde)
-            and (not dt_hasta or datetime.strptime(p['fecha_pago'], '%Y-%m-%d') <= dt_hasta)
-        ]
-        self._poblar_tabla_pagos(filtrados, "Filtrados")
+        self.refrescar_pagos()
+
+    def ordenar_por(self, columna):
+        """Ordena por la columna clickeada (en la consulta); un segundo click invierte el orden"""
+        orden = self.ORDEN_COLUMNAS[columna][0]
+        descendente = not self._filtro.descendente if orden == self._filtro.orden else False
+        self._filtro = replace(self._filtro, orden=orden, descendente=descendente)
+        self.refrescar_pagos()
     
     def limpiar_filtros(self):
         """Limpia todos los filtros aplicados"""
         self.dni_filter.delete(0, 'end')
         self.fecha_desde.delete(0, 'end')
         self.fecha_hasta.delete(0, 'end')
+        self.metodo_filter.set("Todos")
+        self._filtro = self._leer_filtro()
         self.refrescar_pagos()
     
     def nuevo_pago(self):
         """Abre ventana para registrar nuevo pago"""
-        RegistrarPagoWindow(self, self.db_manager, callback=self.refrescar_pagos)
+        RegistrarPagoWindow(self, self.db_manager)
     
     def editar_pago_seleccionado(self, event):
         """Abrir editor rápido (monto y método) para el pago seleccionado"""
@@ -2238,14 +2253,13 @@ class PagosFrame(ctk.CTkFrame):
             menu.grab_release()
 
     def _abrir_editor_pago_simple(self, pago_id: int):
-        EditarPagoWindow(self, self.db_manager, pago_id, callback=self.refrescar_pagos)
+        EditarPagoWindow(self, self.db_manager, pago_id)
 
     def _eliminar_pago_por_id(self, pago_id: int):
         if not messagebox.askyesno("Confirmar eliminación", "¿Eliminar el pago seleccionado? Esta acción no se puede deshacer."):
             return
         try:
             self.db_manager.eliminar_pago(pago_id)
-            self.refrescar_pagos()
             messagebox.showinfo("Éxito", "Pago eliminado")
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo eliminar: {str(e)}")
@@ -2292,6 +2306,7 @@ class SomaEntrenamientosApp:
         
         # Rol de usuario (dueno | profe)
         self.user_role = None
+        self.kiosk_service = None
 
         # Pedir inicio de sesión con rol
         try:
@@ -2447,45 +2462,49 @@ class SomaEntrenamientosApp:
         )
         self.notebook.pack(fill="both", expand=True, padx=10, pady=(6, 10))
 
-        # Pestaña Consulta (Kiosco)
-        self.notebook.add("Consulta")
-        self.consulta_frame = ConsultaKioscoFrame(self.notebook.tab("Consulta"), self.db_manager)
-        self.consulta_frame.pack(fill="both", expand=True)
-        
-        # Pestaña Socios
-        self.notebook.add("Socios")
-        self.socios_frame = SociosFrame(self.notebook.tab("Socios"), self.db_manager)
-        self.socios_frame.pack(fill="both", expand=True)
-        
-        # Pestaña Ingresos
-        self.notebook.add("Ingresos")
-        self.ingresos_frame = IngresosFrame(self.notebook.tab("Ingresos"), self.db_manager)
-        self.ingresos_frame.pack(fill="both", expand=True)
-        
-        # Pestaña Pagos
-        self.notebook.add("Pagos")
-        self.pagos_frame = PagosFrame(self.notebook.tab("Pagos"), self.db_manager)
-        self.pagos_frame.pack(fill="both", expand=True)
-        
+        # Cada pestaña se arma (y consulta la base) recién al elegirla; ver lazy_tabs.py
+        self.pestanas = LazyTabs(self.notebook)
+        db = self.db_manager
+        # Consulta e Import/Export no se rearman al restaurar un backup: el kiosco
+        # se actualiza solo y la restauración se lanza desde Import/Export
+        self.pestanas.registrar("Consulta", lambda tab: ConsultaKioscoFrame(tab, db, cliente=self.crear_cliente_kiosco()),
+                                recargar=False)
+        self.pestanas.registrar("Socios", lambda tab: SociosFrame(tab, db))
+        self.pestanas.registrar("Ingresos", lambda tab: IngresosFrame(tab, db))
+        self.pestanas.registrar("Pagos", lambda tab: PagosFrame(tab, db))
         # Pestaña Dashboard (solo Dueño)
         if getattr(self, 'user_role', 'profe') == 'dueno':
-            self.notebook.add("Dashboard")
-            self.reportes_frame = ReportesFrame(self.notebook.tab("Dashboard"), self.db_manager)
-            self.reportes_frame.pack(fill="both", expand=True)
-            # Contexto de navegación para dashboard (KPIs clicables)
-            try:
-                self.reportes_frame.set_navigation_context(self.notebook, self.socios_frame, self.ingresos_frame)
-            except Exception:
-                pass
-        
-        # Pestaña Import/Export
-        self.notebook.add("Import/Export")
-        self.import_export_frame = ImportExportFrame(self.notebook.tab("Import/Export"), self.db_manager)
-        self.import_export_frame.pack(fill="both", expand=True)
-        
-        # Establecer pestaña inicial en Consulta
-        self.notebook.set("Consulta")
+            self.pestanas.registrar("Dashboard", self._crear_dashboard)
+        self.pestanas.registrar("Import/Export", lambda tab: ImportExportFrame(tab, db), recargar=False)
+
+        # Pestaña inicial: Consulta; el resto se precarga cuando la app queda sin uso
+        self.pestanas.mostrar("Consulta")
+        TkDispatcher(self.notebook, db.eventos, self._on_restauracion, entidades=(BASE,))
+
+    def _on_restauracion(self, eventos: List[CambioDatos]):
+        """Después de restaurar un backup las pestañas se rearman con los datos nuevos"""
+        if eventos[-1].accion == RESTAURADA:
+            self.pestanas.recargar()
+
+    def _crear_dashboard(self, tab):
+        reportes = ReportesFrame(tab, self.db_manager)
+        # Contexto de navegación para dashboard (KPIs clicables)
+        reportes.set_navigation_context(self.pestanas)
+        return reportes
     
+    def crear_cliente_kiosco(self):
+        """Según KIOSK_SERVICE['modo'] arranca el servicio y/o arma el cliente del kiosco"""
+        modo = KIOSK_SERVICE.get("modo", "local")
+        try:
+            if modo == "servidor":
+                self.kiosk_service = KioskService(self.db_manager).iniciar()
+                return LoopbackKioskClient(self.kiosk_service)
+            if modo == "cliente":
+                return KioskClient()
+        except Exception as e:
+            logging.error(f"No se pudo iniciar el servicio de kiosco ({modo}): {e}")
+        return None
+
     def configure_table_styles(self):
         """Configura los estilos de las tablas para usar fuentes más grandes"""
         try:
@@ -2501,12 +2520,18 @@ class SomaEntrenamientosApp:
     
     def on_closing(self):
         logging.info("Cerrando aplicación")
+        if self.kiosk_service is not None:
+            try:
+                self.kiosk_service.detener()
+            except Exception as e:
+                logging.error(f"Error deteniendo servicio de kiosco: {e}")
         try:
             self.db_manager.stop_auto_backup()
         except Exception as e:
             logging.error(f"Error deteniendo backup automático: {e}")
         
         self.root.destroy()
+        detener_logging()
     
     def run(self):
         if not getattr(self, 'user_role', None):
@@ -0,0 +1,256 @@
+"""Tareas periódicas de mantenimiento (backup, ANALYZE, rollups, archivo, VACUUM).
+
+Un solo hilo duerme en un ``threading.Event`` hasta la próxima tarea que
+vence; no hay sondeo. La hora de la última ejecución de cada tarea se guarda
+en ``mantenimiento.json`` junto a la base, así el intervalo no vuelve a
+empezar con cada arranque: una PC que se apaga todas las noches igual hace
+su backup diario.
+
+Reglas por tarea (``MANTENIMIENTO_CONFIG['tareas']``):
+
+- ``cada_horas``: intervalo desde la última ejecución.
+- ``ventana`` ("HH:MM", "HH:MM"): solo arranca en ese horario, salvo que ya
+  lleve un intervalo entero de atraso (la PC no estuvo prendida en la ventana).
+- ``escrituras``: arranca antes si hubo ese número de cambios de socios, pagos
+  o grupos desde la última vez (con ``min_minutos`` entre ejecuciones).
+
+Ninguna tarea arranca en ``horas_pico`` (kiosco lleno): se corre al final de
+la franja. Si una tarea falla se reintenta a los ``reintento_minutos``.
+
+Una tarea puede ser un generador: cada ``yield`` cierra un tramo corto (una
+transacción) y devuelve el avance. Entre tramos se espera a que no haya
+cambios en la base por ``ocio_segundos``; si la corrida suma ``max_segundos``
+de trabajo o entra una hora pico, el generador queda pendiente y sigue donde
+quedó en el próximo intento. El último avance (o el valor del ``return``) se
+guarda como resultado de la tarea para el panel de diagnóstico.
+"""
+import inspect
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from datetime import time as hora
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .config import MANTENIMIENTO_CONFIG
+from .events import CambioDatos
+
+Franja = Tuple[str, str]  # ("HH:MM", "HH:MM"); si el fin es menor, cruza la medianoche
+
+
+def dentro(momento: datetime, franja: Franja) -> bool:
+    inicio, fin = hora.fromisoformat(franja[0]), hora.fromisoformat(franja[1])
+    h = momento.time()
+    return inicio <= h < fin if inicio <= fin else (h >= inicio or h < fin)
+
+
+def fin_de_franja(momento: datetime, franja: Franja) -> datetime:
+    """Final de la franja que contiene ``momento``"""
+    fin = datetime.combine(momento.date(), hora.fromisoformat(franja[1]))
+    return fin if fin > momento else fin + timedelta(days=1)
+
+
+def proximo_inicio(momento: datetime, franja: Franja) -> datetime:
+    """Primer momento >= ``momento`` dentro de la franja"""
+    if dentro(momento, franja):
+        return momento
+    inicio = datetime.combine(momento.date(), hora.fromisoformat(franja[0]))
+    return inicio if inicio >= momento else inicio + timedelta(days=1)
+
+
+class MaintenanceScheduler:
+    def __init__(self, archivo_estado: Path, horas_pico: Optional[Sequence[Franja]] = None):
+        self.archivo_estado = Path(archivo_estado)
+        self.horas_pico = list(MANTENIMIENTO_CONFIG["horas_pico"] if horas_pico is None else horas_pico)
+        self._tareas: Dict[str, Dict] = {}
+        self._estado: Dict[str, Dict] = self._leer_estado()
+        self._escrituras: Dict[str, int] = {}
+        self._fallos: Dict[str, datetime] = {}
+        self._pendientes: Dict[str, Iterator] = {}
+        self._ultima_actividad = 0.0
+        self._despertar = threading.Event()
+        self._detener = False
+        self._hilo: Optional[threading.Thread] = None
+        self._inicio = datetime.now()
+
+    # ── Registro ───────────────────────────────────────────────────────────
+    def agregar(self, nombre: str, funcion: Callable[[], object], cada_horas: float,
+                ventana: Optional[Franja] = None, escrituras: Optional[int] = None,
+                min_minutos: float = 0) -> None:
+        self._tareas[nombre] = {'funcion': funcion, 'cada': timedelta(hours=cada_horas),
+                                'ventana': ventana, 'escrituras': escrituras,
+                                'min': timedelta(minutes=min_minutos)}
+        self._escrituras.setdefault(nombre, 0)
+        self._despertar.set()
+
+    def listar(self) -> List[str]:
+        return list(self._tareas)
+
+    # ── Disparadores ───────────────────────────────────────────────────────
+    def contar_escritura(self, evento: Optional[CambioDatos] = None) -> None:
+        """Suscriptor directo: suma un cambio y despierta al hilo si alguna tarea llegó a su umbral"""
+        for nombre, tarea in self._tareas.items():
+            if tarea['escrituras']:
+                self._escrituras[nombre] += 1
+                if self._escrituras[nombre] == tarea['escrituras']:
+                    self._despertar.set()
+
+    def registrar_actividad(self, evento: Optional[CambioDatos] = None) -> None:
+        """Suscriptor directo de todas las entidades: los tramos esperan a que la base esté quieta"""
+        self._ultima_actividad = time.monotonic()
+
+    def ultimo(self, nombre: str) -> Optional[datetime]:
+        ultimo = self._estado.get(nombre, {}).get('ultimo')
+        return datetime.fromisoformat(ultimo) if ultimo else None
+
+    def proxima(self, nombre: str, ahora: Optional[datetime] = None) -> datetime:
+        """Cuándo corresponde correr la tarea según sus reglas y las horas pico"""
+        ahora = ahora or datetime.now()
+        tarea = self._tareas[nombre]
+        ultimo = self.ultimo(nombre)
+        if ultimo is None:
+            momento = ahora  # nunca corrió
+        else:
+            momento = ultimo + tarea['cada']
+            if tarea['ventana']:
+                momento = min(proximo_inicio(momento, tarea['ventana']), ultimo + 2 * tarea['cada'])
+            if tarea['escrituras'] and self._escrituras[nombre] >= tarea['escrituras']:
+                momento = min(momento, ultimo + tarea['min'])
+        if nombre in self._fallos:
+            momento = max(momento, self._fallos[nombre]
+                          + timedelta(minutes=MANTENIMIENTO_CONFIG["reintento_minutos"]))
+        momento = max(momento, self._inicio + timedelta(minutes=MANTENIMIENTO_CONFIG["demora_inicio_minutos"]))
+        return self._fuera_de_pico(momento)
+
+    def _fuera_de_pico(self, momento: datetime) -> datetime:
+        for _ in range(len(self.horas_pico) + 1):  # franjas pegadas: correr hasta salir de todas
+            franja = next((f for f in self.horas_pico if dentro(momento, f)), None)
+            if franja is None:
+                break
+            momento = fin_de_franja(momento, franja)
+        return momento
+
+    # ── Ejecución ──────────────────────────────────────────────────────────
+    def ejecutar(self, nombre: str, en_segundo_plano: bool = False):
+        """Corre la tarea ya (hilo actual) y guarda la hora; devuelve su resultado.
+        ``en_segundo_plano``: tramos solo con la base quieta y hasta ``max_segundos``."""
+        inicio = time.perf_counter()
+        comienzo = datetime.now()
+        estado = self._estado.setdefault(nombre, {})
+        try:
+            trabajo = self._pendientes.pop(nombre, None) or self._tareas[nombre]['funcion']()
+            completa, tramos, resultado = True, 0, trabajo
+            if inspect.isgenerator(trabajo):
+                completa, tramos, resultado = self._por_tramos(nombre, trabajo, en_segundo_plano)
+        except Exception as e:
+            self._fallos[nombre] = datetime.now()
+            estado.update(error=str(e), fallo=self._fallos[nombre].isoformat(timespec='seconds'))
+            self._guardar_estado()
+            raise
+        segundos = time.perf_counter() - inicio
+        estado.update(resultado=resultado if isinstance(resultado, dict) else None,
+                      tramos=tramos, completa=completa, error=None)
+        if completa:
+            self._fallos.pop(nombre, None)
+            self._escrituras[nombre] = 0
+            estado.update(ultimo=comienzo.isoformat(), segundos=round(segundos, 3))
+            logging.info(f"Mantenimiento: {nombre} en {segundos:.2f}s")
+        else:
+            self._fallos[nombre] = datetime.now()  # sigue tras reintento_minutos
+            logging.info(f"Mantenimiento: {nombre} pausada tras {tramos} tramos")
+        self._guardar_estado()
+        return resultado
+
+    def _por_tramos(self, nombre: str, trabajo: Iterator, en_segundo_plano: bool) -> Tuple[bool, int, object]:
+        """(completa, tramos, resultado); si no termina, el generador queda pendiente"""
+        trabajado, tramos, resultado = 0.0, 0, None
+        while not en_segundo_plano or (trabajado < MANTENIMIENTO_CONFIG["max_segundos"] and self._esperar_ocio()):
+            inicio = time.perf_counter()
+            tramos += 1
+            try:
+                resultado = next(trabajo)
+            except StopIteration as fin:
+                return True, tramos, resultado if fin.value is None else fin.value
+            trabajado += time.perf_counter() - inicio
+        self._pendientes[nombre] = trabajo
+        return False, tramos, resultado
+
+    def _esperar_ocio(self) -> bool:
+        """Espera ``ocio_segundos`` sin cambios en la base; False si hay que detenerse o es hora pico"""
+        ocio = MANTENIMIENTO_CONFIG["ocio_segundos"]
+        while not self._detener:
+            ahora = datetime.now()
+            if self._fuera_de_pico(ahora) != ahora:
+                return False
+            quieto = time.monotonic() - self._ultima_actividad
+            if quieto >= ocio:
+                return True
+            self._despertar.wait(ocio - quieto)
+            self._despertar.clear()  # el hilo recalcula todo al terminar la tarea
+        return False
+
+    def iniciar(self) -> "MaintenanceScheduler":
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener = False
+            self._hilo = threading.Thread(target=self._trabajar, name="mantenimiento", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self, timeout: float = 5) -> None:
+        self._detener = True
+        self._despertar.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=timeout)
+
+    def _trabajar(self):
+        while not self._detener:
+            self._despertar.clear()
+            ahora = datetime.now()
+            proximas = sorted((self.proxima(nombre, ahora), nombre) for nombre in self._tareas)
+            vencidas = [nombre for momento, nombre in proximas if momento <= ahora]
+            for nombre in vencidas:
+                if self._detener:
+                    return
+                try:
+                    self.ejecutar(nombre, en_segundo_plano=True)
+                except Exception as e:
+                    logging.error(f"Mantenimiento: error en {nombre}: {e}")
+            if vencidas:
+                continue  # recalcular con las horas nuevas
+            # Se despierta antes por escrituras, tareas nuevas o al detener. La espera
+            # tiene tope: el plazo es de reloj de pared (suspensión, cambio de hora)
+            espera = MANTENIMIENTO_CONFIG["espera_max_minutos"] * 60
+            if proximas:
+                espera = min(espera, (proximas[0][0] - ahora).total_seconds())
+            self._despertar.wait(espera)
+
+    # ── Estado persistente ─────────────────────────────────────────────────
+    def _leer_estado(self) -> Dict[str, Dict]:
+        try:
+            with open(self.archivo_estado, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Mantenimiento: estado ilegible ({e}); se empieza de cero")
+            return {}
+
+    def _guardar_estado(self) -> None:
+        temporal = self.archivo_estado.with_suffix('.tmp')
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(self._estado, f, indent=2, ensure_ascii=False)
+        temporal.replace(self.archivo_estado)
+
+    def resumen(self) -> List[Dict]:
+        """Última y próxima ejecución de cada tarea con su último resultado
+        (línea de comandos y panel de diagnóstico)"""
+        ahora = datetime.now()
+        return [{'tarea': nombre, 'ultimo': self._estado.get(nombre, {}).get('ultimo'),
+                 'segundos': self._estado.get(nombre, {}).get('segundos'),
+                 'proxima': self.proxima(nombre, ahora).isoformat(timespec='seconds'),
+                 'escrituras': self._escrituras[nombre],
+                 'pendiente': nombre in self._pendientes,
+                 **{c: self._estado.get(nombre, {}).get(c) for c in ('resultado', 'tramos', 'error')}}
+                for nombre in self._tareas]
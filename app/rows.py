@@ -0,0 +1,54 @@
+"""Filas compactas para listados grandes.
+
+``iterar(cursor)`` devuelve las filas de una consulta como ``Registro``: una
+tupla con nombre (sin ``__dict__`` por fila) que además acepta
+``fila['columna']`` y ``fila.get('columna')``, así el código que recibía
+dicts sigue funcionando. Las filas se leen de a bloques con ``fetchmany``
+en lugar de materializar toda la lista.
+"""
+import sqlite3
+from collections import namedtuple
+from functools import lru_cache
+from typing import Dict, Iterator, Tuple
+
+_BLOQUE = 500
+
+
+@lru_cache(maxsize=64)
+def tipo_registro(campos: Tuple[str, ...]) -> type:
+    """Clase de registro para un conjunto de columnas (una por forma de consulta)"""
+    base = namedtuple('Registro', campos, rename=True)
+    indice = {campo: i for i, campo in enumerate(campos)}
+
+    class Registro(base):
+        __slots__ = ()
+        columnas = indice
+
+        def __getitem__(self, clave):
+            if clave.__class__ is str:
+                return tuple.__getitem__(self, indice[clave])
+            return tuple.__getitem__(self, clave)
+
+        def get(self, clave: str, defecto=None):
+            i = indice.get(clave)
+            return defecto if i is None else tuple.__getitem__(self, i)
+
+        def keys(self):
+            return campos
+
+    return Registro
+
+
+def columnas(cursor: sqlite3.Cursor) -> Dict[str, int]:
+    """Posición de cada columna del resultado: {'nombre': índice}"""
+    return {d[0]: i for i, d in enumerate(cursor.description)}
+
+
+def iterar(cursor: sqlite3.Cursor, bloque: int = _BLOQUE) -> Iterator[tuple]:
+    """Recorre el resultado de ``cursor`` como registros, sin armar la lista completa"""
+    crear = tipo_registro(tuple(d[0] for d in cursor.description))._make
+    while True:
+        filas = cursor.fetchmany(bloque)
+        if not filas:
+            return
+        yield from map(crear, filas)
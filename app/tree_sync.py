@@ -0,0 +1,111 @@
+"""Sincronización de un ttk.Treeview por clave de fila.
+
+En lugar de borrar y reinsertar todas las filas después de cada cambio, las
+ventanas usan ``TreeSync.upsert``/``eliminar`` para tocar solo las filas
+afectadas. Se conserva la selección y la posición del scroll. ``cargar``
+sigue disponible como recarga completa.
+"""
+from bisect import bisect_left, insort
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+
+class TreeSync:
+    def __init__(self, tree, sort_key: Callable[[Any, Sequence], Any], reverse: bool = False):
+        """sort_key(clave, valores) debe reproducir el ORDER BY de la consulta."""
+        self.tree = tree
+        self.sort_key = sort_key
+        self.reverse = reverse
+        self._valores: Dict[str, Tuple] = {}
+        self._claves: Dict[str, Any] = {}
+        self._orden: list = []  # [(sort_key, iid)] siempre ascendente
+
+    # ── Recarga completa ───────────────────────────────────────────────────
+    def cargar(self, filas: Iterable[Tuple[Any, Sequence]],
+               sort_key: Optional[Callable[[Any, Sequence], Any]] = None, reverse: Optional[bool] = None):
+        """Reemplaza todas las filas. ``filas`` = [(clave, valores), ...].
+
+        ``sort_key``/``reverse`` cambian el orden cuando la consulta cambió su ORDER BY.
+        """
+        if sort_key is not None:
+            self.sort_key = sort_key
+        if reverse is not None:
+            self.reverse = reverse
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self._valores.clear()
+        self._claves.clear()
+        self._orden = []
+        for clave, valores in filas:
+            iid = str(clave)
+            valores = tuple(valores)
+            self._valores[iid] = valores
+            self._claves[iid] = clave
+            self._orden.append((self.sort_key(clave, valores), iid))
+        self._orden.sort()
+        secuencia = reversed(self._orden) if self.reverse else self._orden
+        for _, iid in secuencia:
+            self.tree.insert("", "end", iid=iid, values=self._valores[iid])
+
+    # ── Parches ────────────────────────────────────────────────────────────
+    def upsert(self, clave, valores: Sequence) -> None:
+        iid = str(clave)
+        valores = tuple(valores)
+        nueva_key = (self.sort_key(clave, valores), iid)
+        if iid in self._valores:
+            vieja_key = (self.sort_key(clave, self._valores[iid]), iid)
+            if vieja_key == nueva_key:
+                if self._valores[iid] != valores:
+                    self._valores[iid] = valores
+                    self.tree.item(iid, values=valores)
+                return
+            self._quitar_orden(vieja_key)
+            self._valores[iid] = valores
+            self.tree.item(iid, values=valores)
+            self.tree.move(iid, "", self._insertar_orden(nueva_key))
+        else:
+            self._valores[iid] = valores
+            self._claves[iid] = clave
+            self.tree.insert("", self._insertar_orden(nueva_key), iid=iid, values=valores)
+
+    def eliminar(self, clave) -> bool:
+        iid = str(clave)
+        valores = self._valores.pop(iid, None)
+        if valores is None:
+            return False
+        self._claves.pop(iid, None)
+        self._quitar_orden((self.sort_key(clave, valores), iid))
+        self.tree.delete(iid)
+        return True
+
+    def reordenar(self, sort_key: Callable[[Any, Sequence], Any], reverse: bool = False) -> None:
+        """Cambia el criterio de orden y mueve las filas cargadas, sin volver a leerlas"""
+        self.sort_key = sort_key
+        self.reverse = reverse
+        self._orden = sorted((sort_key(self._claves[iid], valores), iid) for iid, valores in self._valores.items())
+        secuencia = reversed(self._orden) if reverse else self._orden
+        for pos, (_, iid) in enumerate(secuencia):
+            self.tree.move(iid, "", pos)
+
+    def contiene(self, clave) -> bool:
+        return str(clave) in self._valores
+
+    def valores(self, clave) -> Optional[Tuple]:
+        return self._valores.get(str(clave))
+
+    def claves(self):
+        return list(self._valores.keys())
+
+    def __len__(self):
+        return len(self._valores)
+
+    # ── Orden ──────────────────────────────────────────────────────────────
+    def _insertar_orden(self, key) -> int:
+        insort(self._orden, key)
+        pos = bisect_left(self._orden, key)
+        return len(self._orden) - 1 - pos if self.reverse else pos
+
+    def _quitar_orden(self, key):
+        pos = bisect_left(self._orden, key)
+        if pos < len(self._orden) and self._orden[pos] == key:
+            del self._orden[pos]
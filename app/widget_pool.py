@@ -0,0 +1,75 @@
+"""Reutilización de widgets en listas que se refrescan seguido.
+
+El dashboard vuelve a dibujar alertas, acciones rápidas y actividad reciente
+en cada actualización. Crear widgets de CustomTkinter es caro, así que
+``WidgetPool`` arma cada fila una sola vez y en los refrescos siguientes solo
+la reconfigura; las filas sobrantes se ocultan (``pack_forget``) y quedan
+para la próxima vez. ``configurar`` evita el redibujo cuando el valor no
+cambió y ``fuente`` comparte las ``CTkFont`` entre todos los widgets.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import customtkinter as ctk
+
+_fuentes: Dict[tuple, ctk.CTkFont] = {}
+_FALTA = object()
+
+
+def fuente(**opciones) -> ctk.CTkFont:
+    """CTkFont compartida para ``opciones`` (size, weight, family...)"""
+    clave = tuple(sorted(opciones.items()))
+    f = _fuentes.get(clave)
+    if f is None:
+        f = _fuentes[clave] = ctk.CTkFont(**opciones)
+    return f
+
+
+def configurar(widget, **opciones) -> None:
+    """``widget.configure`` solo con las opciones que cambiaron desde la última vez"""
+    previas = widget.__dict__.setdefault('_opciones_pool', {})
+    cambios = {k: v for k, v in opciones.items() if previas.get(k, _FALTA) != v}
+    if cambios:
+        widget.configure(**cambios)
+        previas.update(cambios)
+
+
+class WidgetPool:
+    def __init__(self, contenedor, crear: Callable[[Any], Any], actualizar: Callable[[Any, Any], None],
+                 pack: Optional[Dict] = None, vacio=None, vacio_pack: Optional[Dict] = None):
+        """``crear(contenedor)`` arma una fila; ``actualizar(fila, dato)`` la reconfigura.
+
+        ``vacio`` (opcional, sin empaquetar) es el widget que se muestra cuando no hay datos.
+        """
+        self.contenedor = contenedor
+        self.crear = crear
+        self.actualizar = actualizar
+        self.pack = pack or {}
+        self.vacio = vacio
+        self.vacio_pack = vacio_pack or {}
+        self.filas: List[Any] = []
+        self.visibles = 0
+        self.creadas = 0  # filas construidas desde el inicio (no crece en refrescos estables)
+        self._vacio_visible = False
+        self.mostrar(())
+
+    def mostrar(self, datos: Iterable) -> None:
+        """Muestra una fila por dato, reutilizando las existentes"""
+        n = 0
+        for dato in datos:
+            if n == len(self.filas):
+                self.filas.append(self.crear(self.contenedor))
+                self.creadas += 1
+            fila = self.filas[n]
+            self.actualizar(fila, dato)
+            if n >= self.visibles:
+                fila.pack(**self.pack)  # las ocultas vuelven al final, en orden
+            n += 1
+        for fila in self.filas[n:self.visibles]:
+            fila.pack_forget()
+        if self.vacio is not None and (n == 0) != self._vacio_visible:
+            if n == 0:
+                self.vacio.pack(**self.vacio_pack)
+            else:
+                self.vacio.pack_forget()
+            self._vacio_visible = n == 0
+        self.visibles = n
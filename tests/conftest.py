@@ -0,0 +1,26 @@
+import time
+
+import pytest
+
+from app.db import DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Base nueva en un directorio temporal (backups/ y diario/ quedan ahí)"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    db = DatabaseManager("data/prueba.db", auto_backup=False)
+    yield db
+    if db.diario is not None:
+        db.diario.cerrar()
+
+
+def esperar(condicion, timeout: float = 5) -> bool:
+    """Espera hasta que ``condicion()`` sea verdadera (o venza ``timeout``)"""
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicion():
+            return True
+        time.sleep(0.01)
+    return condicion()
@@ -0,0 +1,84 @@
+"""AudioEngine: una pasada nueva corta el sonido en curso y descarta el que espera."""
+import sys
+import threading
+
+from app.audio import AudioEngine, ComandoBackend, NullBackend
+from conftest import esperar
+
+SONIDOS = {'OK': (880, 10), 'VENCIDO': (440, 10), 'ERROR': (220, 10)}
+
+
+class BackendRetenido(NullBackend):
+    """NullBackend cuyo primer sonido no termina hasta ``soltar``"""
+
+    def __init__(self):
+        super().__init__()
+        self.sonando = threading.Event()
+        self.soltar = threading.Event()
+        self.detenidos = 0
+
+    def reproducir(self, nombre, wav, vigente=None):
+        super().reproducir(nombre, wav, vigente)
+        self.sonando.set()
+        self.soltar.wait(5)
+
+    def detener(self):
+        self.detenidos += 1
+
+
+def test_reproducir_cancela_el_sonido_en_espera():
+    backend = BackendRetenido()
+    motor = AudioEngine(backend, SONIDOS)
+    motor.reproducir('OK')
+    assert backend.sonando.wait(5)
+
+    motor.reproducir('VENCIDO')  # queda en espera detrás de OK
+    motor.reproducir('ERROR')    # lo descarta
+    backend.soltar.set()
+    # La cola es FIFO: cuando suena ERROR, VENCIDO ya se descartó
+    assert esperar(lambda: backend.reproducidos[-1] == 'ERROR')
+    motor.cerrar()
+
+    assert backend.reproducidos == ['OK', 'ERROR']
+    assert backend.detenidos >= 2  # cada pasada cortó lo que sonaba
+
+
+def test_sonido_desconocido_no_se_encola():
+    backend = NullBackend()
+    motor = AudioEngine(backend, SONIDOS)
+    motor.reproducir('NO_EXISTE')
+    motor.reproducir('OK')
+    assert esperar(lambda: backend.reproducidos)
+    motor.cerrar()
+    assert backend.reproducidos == ['OK']
+
+
+class BackendTardio(NullBackend):
+    """Una pasada nueva llega después de que el motor sacó el pedido de la
+    cola pero antes de que el backend empiece a sonar"""
+
+    def __init__(self):
+        super().__init__()
+        self.motor = None
+
+    def reproducir(self, nombre, wav, vigente=None):
+        if nombre == 'OK':
+            self.motor.reproducir('ERROR')
+        super().reproducir(nombre, wav, vigente)
+
+
+def test_cancelacion_antes_de_empezar_a_sonar():
+    backend = BackendTardio()
+    motor = AudioEngine(backend, SONIDOS)
+    backend.motor = motor
+    motor.reproducir('OK')
+    assert esperar(lambda: backend.reproducidos)
+    motor.cerrar()
+    assert backend.reproducidos == ['ERROR']
+
+
+def test_comando_no_arranca_un_pedido_cancelado():
+    backend = ComandoBackend([sys.executable, '-c', 'import time; time.sleep(5)'])
+    backend.preparar({'OK': b''})
+    backend.reproducir('OK', b'', vigente=lambda: False)
+    assert backend._proceso is None
@@ -0,0 +1,90 @@
+"""Diario de cambios: escritura en lote, reintentos y huecos."""
+import sqlite3
+import time
+from datetime import datetime
+
+import pytest
+
+from app.config import JOURNAL_CONFIG
+
+
+def _falla_al_abrir(diario, veces):
+    """Las próximas ``veces`` aperturas del archivo fallan (disco lleno)"""
+    abrir = diario._abrir
+    restantes = [veces]
+
+    def _abrir(ahora):
+        if restantes[0]:
+            restantes[0] -= 1
+            raise OSError(28, "No space left on device")
+        return abrir(ahora)
+
+    diario._abrir = _abrir
+
+
+@pytest.fixture
+def con_base(db):
+    db.agregar_socio(101, "Ana", "", "", "2026-01-01")
+    db.create_incremental_backup("base")
+    time.sleep(1.1)  # el nombre del backup lleva la hora al segundo
+    return db
+
+
+def _socios(ruta):
+    with sqlite3.connect(ruta) as conn:
+        return [dni for (dni,) in conn.execute('SELECT dni FROM socios ORDER BY dni')]
+
+
+def _recuperada(db, resultado):
+    return db.backup_manager.backup_path / resultado['filename']
+
+
+def test_un_lote_por_operacion(db):
+    db.agregar_socio(101, "Ana", "", "", "2026-01-01")
+    db.diario.vaciar()
+    lotes = db.diario.lotes
+    grupo = db.crear_grupo("Familia")
+    db.asignar_socio_a_grupo(101, grupo)
+    db.registrar_pago_grupal(grupo, 9000, "2026-10-01", "efectivo", 1)
+    db.diario.vaciar()
+    assert db.diario.lotes - lotes <= 2
+
+
+def test_lote_fallido_se_reintenta(con_base, monkeypatch):
+    db = con_base
+    monkeypatch.setitem(JOURNAL_CONFIG, "reintento_max_segundos", 0.05)
+    _falla_al_abrir(db.diario, 2)
+    db.agregar_socio(102, "Beto", "", "", "2026-01-01")
+    db.diario.vaciar()
+    time.sleep(0.01)
+    resultado = db.recuperar_hasta(datetime.now().isoformat())
+    assert resultado['success'], resultado
+    assert db.diario.huecos == 0
+    assert _socios(_recuperada(db, resultado)) == [101, 102]
+
+
+def test_hueco_impide_recuperar_a_traves(con_base, monkeypatch):
+    db = con_base
+    monkeypatch.setitem(JOURNAL_CONFIG, "reintentos", 1)
+    monkeypatch.setitem(JOURNAL_CONFIG, "reintento_max_segundos", 0.05)
+    _falla_al_abrir(db.diario, 2)
+    db.agregar_socio(102, "Beto", "", "", "2026-01-01")  # se pierde
+    db.diario.vaciar()
+    db.agregar_socio(103, "Caro", "", "", "2026-01-01")  # anota el hueco
+    db.diario.vaciar()
+    assert db.diario.huecos == 1
+    time.sleep(0.01)
+
+    resultado = db.recuperar_hasta(datetime.now().isoformat())
+    assert not resultado['success']
+    assert "hueco" in resultado['error']
+
+    # Un backup posterior al hueco vuelve a ser un punto de partida válido
+    db.create_incremental_backup("después del hueco")
+    time.sleep(1.1)
+    db.agregar_socio(104, "Dani", "", "", "2026-01-01")
+    db.diario.vaciar()
+    time.sleep(0.01)
+    resultado = db.recuperar_hasta(datetime.now().isoformat())
+    assert resultado['success'], resultado
+    assert _socios(_recuperada(db, resultado)) == [101, 102, 103, 104]
@@ -0,0 +1,149 @@
+"""Servicio de kiosco en proceso (LoopbackKioskClient): escritura en lote,
+repeticiones del anti-passback y restauración con ingresos en la cola; por HTTP,
+el token y el límite del cuerpo."""
+import socket
+import sqlite3
+import time
+
+import pytest
+
+from app.kiosk_service import KioskClient, KioskService, LoopbackKioskClient
+from conftest import esperar
+
+
+def _ingresos(db):
+    with sqlite3.connect(db.db_path) as conn:
+        return conn.execute('SELECT id, dni, repeticiones FROM ingresos ORDER BY id').fetchall()
+
+
+@pytest.fixture
+def servicio(db):
+    for dni in (101, 102, 103):
+        db.agregar_socio(dni, f"Socio {dni}", "", "", "2026-01-01")
+    db.registrar_pago(101, 5000, time.strftime('%Y-%m-%d'), 'efectivo', 1)
+    servicio = KioskService(db, host="127.0.0.1", port=0)
+    servicio.batch_ms = 300
+    lotes = []
+    escribir = db.registrar_ingresos_lote
+
+    def registrar_ingresos_lote(filas):
+        lotes.append(list(filas))
+        if servicio.fallar:
+            servicio.fallar -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return escribir(filas)
+
+    db.registrar_ingresos_lote = registrar_ingresos_lote
+    servicio.lotes = lotes
+    servicio.fallar = 0  # escrituras de ingresos que fallan (base bloqueada)
+    servicio.iniciar()
+    yield servicio
+    servicio.detener()
+
+
+def test_ingresos_de_varias_terminales_en_un_lote(db, servicio):
+    clientes = [LoopbackKioskClient(servicio) for _ in range(3)]
+    for i, dni in enumerate((101, 102, 103, 999)):  # 999 no registrado: también queda en ingresos
+        clientes[i % 3].consultar(dni)
+
+    assert clientes[0].consultar(101)['estado'] == clientes[1].estado(101)['estado']
+    assert esperar(lambda: servicio.ingresos_escritos == 4)
+    assert [len(lote) for lote in servicio.lotes] == [4]
+    assert [dni for _, dni, _ in _ingresos(db)] == [101, 102, 103, None]
+
+
+def test_repeticiones_sobre_el_ingreso_que_repiten(db, servicio):
+    cliente = LoopbackKioskClient(servicio)
+    cliente.consultar(102)
+    cliente.consultar(102)
+    cliente.consultar(102)
+    cliente.consultar(103)
+    # Paga en recepción: sus repeticiones se encolan y la pasada siguiente es un ingreso nuevo,
+    # todo dentro del mismo lote
+    db.registrar_pago(102, 5000, time.strftime('%Y-%m-%d'), 'efectivo', 1)
+    assert cliente.consultar(102)['estado'] == 'Activo'
+    cliente.consultar(103)
+
+    assert esperar(lambda: servicio.ingresos_escritos == 3)
+    servicio.detener()  # vuelca la repetición pendiente de 103
+    assert [(dni, rep) for _, dni, rep in _ingresos(db)] == [(102, 2), (103, 1), (102, 0)]
+    assert servicio.salud()['repeticiones'] == 3
+
+
+def test_lote_que_falla_se_reintenta_en_orden(db, servicio):
+    servicio.fallar = 1
+    cliente = LoopbackKioskClient(servicio)
+    cliente.consultar(102)
+    cliente.consultar(102)
+    db.registrar_pago(102, 5000, time.strftime('%Y-%m-%d'), 'efectivo', 1)  # encola la repetición
+    cliente.consultar(103)
+
+    assert esperar(lambda: servicio.ingresos_escritos == 2)
+    assert servicio.salud()['reintentos'] == 1
+    assert [len(lote) for lote in servicio.lotes] == [1, 1, 1]
+    assert [(dni, rep) for _, dni, rep in _ingresos(db)] == [(102, 1), (103, 0)]
+
+
+def test_pendientes_al_detener_se_escriben_al_iniciar(db, servicio):
+    servicio.fallar = 1000
+    LoopbackKioskClient(servicio).consultar(102)
+    assert esperar(lambda: servicio.reintentos >= 1)
+    servicio.detener()
+    assert servicio.archivo_pendientes.exists()
+    assert _ingresos(db) == []
+
+    servicio.fallar = 0  # la base se desbloqueó
+    otro = KioskService(db, host="127.0.0.1", port=0).iniciar()
+    try:
+        assert esperar(lambda: otro.ingresos_escritos == 1)
+    finally:
+        otro.detener()
+    assert not otro.archivo_pendientes.exists()
+    assert [dni for _, dni, _ in _ingresos(db)] == [102]
+
+
+def test_ingreso_retenido_durante_la_restauracion(db, servicio):
+    backup = db.create_incremental_backup("antes")['filename']
+    time.sleep(1.1)  # el nombre del backup lleva la hora al segundo
+    cliente = LoopbackKioskClient(servicio)
+    cliente.consultar(101)
+    assert esperar(lambda: servicio.ingresos_escritos == 1)
+
+    durante = {}
+    restaurar = db.backup_manager.restore_backup
+
+    def restore_backup(nombre):
+        durante['estado'] = cliente.consultar(102)['estado']
+        time.sleep(servicio.batch_ms * 2 / 1000)
+        durante['escritos'] = servicio.ingresos_escritos
+        durante['filas'] = len(_ingresos(db))
+        return restaurar(nombre)
+
+    db.backup_manager.restore_backup = restore_backup
+    assert db.restore_from_backup(backup)['success']
+
+    assert durante == {'estado': 'Vencido', 'escritos': 1, 'filas': 1}
+    assert esperar(lambda: servicio.ingresos_escritos == 2)
+    # La base restaurada es anterior al primer ingreso; el retenido se escribió sobre ella
+    assert [dni for _, dni, _ in _ingresos(db)] == [102]
+
+
+def test_http_exige_token_y_limita_el_cuerpo(db):
+    servicio = KioskService(db, host="127.0.0.1", port=0, token="secreto").iniciar()
+    try:
+        url = f"http://127.0.0.1:{servicio.port}"
+        assert KioskClient(url, token="secreto").estado(101)['estado'] == 'No registrado'
+        with pytest.raises(ConnectionError, match="401"):
+            KioskClient(url, token="otro").consultar(101)
+        with socket.create_connection(("127.0.0.1", servicio.port)) as conexion:
+            conexion.sendall(b"POST /ingreso HTTP/1.1\r\nX-Kiosk-Token: secreto\r\n"
+                             b"Content-Length: 100000000\r\n\r\n")
+            assert conexion.recv(64).startswith(b"HTTP/1.1 413")
+        assert _ingresos(db) == []
+    finally:
+        servicio.detener()
+
+
+def test_sin_token_no_escucha_en_la_red(db):
+    with pytest.raises(ValueError, match="SOMA_KIOSK_TOKEN"):
+        KioskService(db, host="0.0.0.0", port=0, token="").iniciar()